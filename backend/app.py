@@ -1,9 +1,16 @@
 # FILE: ./backend/app.py
+import asyncio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from db.database import engine, Base
+from db.database import engine, async_engine, Base, pool_stats
+from db.schema_upgrades import ensure_extensions, apply_schema_upgrades
 from constants import PROJECT_NAME, API_V1_STR
 from utils.monitoring import metrics, now, to_dict
+from utils.websocket_manager import manager
+from db.redis_conn import cache_stats
+from utils.backup import backup_writer
+from utils.security import verified_tokens
+from utils.password_hashing import password_hasher
 import uvicorn
 
 # --- Import all models so Base can discover them and create the tables ---
@@ -25,7 +32,9 @@ origins = [
 # --- Create Database Tables ---
 def create_db_tables():
     print("Attempting to create database tables...")
+    ensure_extensions(engine)
     Base.metadata.create_all(bind=engine)
+    apply_schema_upgrades(engine)
     print("Database tables created successfully (or already exist).")
 
 # --- Application Initialization ---
@@ -67,6 +76,15 @@ async def startup_event():
     """Run database table creation on application startup."""
     create_db_tables()
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the shared live-feed subscriber, finish pending backups and stop the hashing pool."""
+    await manager.close()
+    await asyncio.to_thread(backup_writer.stop)
+    await asyncio.to_thread(password_hasher.shutdown)
+    if async_engine is not None:
+        await async_engine.dispose()
+
 @app.get("/")
 def health_check():
     return {"message": "IFPMS Backend is running successfully!"}
@@ -74,7 +92,11 @@ def health_check():
 
 @app.get(f"{API_V1_STR}/system/metrics")
 def system_metrics():
-    return {"metrics": to_dict()}
+    return {
+        "metrics": to_dict(),
+        "cache": {**cache_stats(), "verified_tokens": verified_tokens.stats()},
+        "db_pool": pool_stats(),
+    }
 
 if __name__ == "__main__":
     create_db_tables() 
@@ -19,6 +19,20 @@ celery_app.conf.update(
     result_serializer='json',
     timezone='UTC',
     enable_utc=True,
+    beat_schedule={
+        "compact-floor-plan-versions": {
+            "task": "tasks.compact_floor_plan_versions",
+            "schedule": 24 * 60 * 60, # Daily
+        },
+        "prune-sync-sessions": {
+            "task": "tasks.prune_sync_sessions",
+            "schedule": 24 * 60 * 60, # Daily
+        },
+        "prune-refresh-tokens": {
+            "task": "tasks.prune_refresh_tokens",
+            "schedule": 24 * 60 * 60, # Daily
+        },
+    },
 )
 
 @celery_app.task(name="celery.ping")
@@ -15,6 +15,25 @@ DB_NAME = os.environ.get("DB_NAME", "postgres")
 DATABASE_URL = os.environ.get("DATABASE_URL",
     f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 )
+# Optional asyncpg engine for the async read endpoints. When disabled they run
+# the same queries on the sync engine through the threadpool.
+ASYNC_DB_ENABLED = os.environ.get("ASYNC_DB_ENABLED", "false").lower() in ("1", "true", "yes")
+ASYNC_DATABASE_URL = os.environ.get("ASYNC_DATABASE_URL",
+    f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+)
+
+# --- Connection Pool ---
+# Per engine and per worker process: each holds up to size + overflow connections
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", 20))
+# How long get_db waits for a free connection before failing
+DB_POOL_TIMEOUT_SECONDS = float(os.environ.get("DB_POOL_TIMEOUT_SECONDS", 10))
+# Connections older than this are replaced (keep below server/proxy idle timeouts)
+DB_POOL_RECYCLE_SECONDS = int(os.environ.get("DB_POOL_RECYCLE_SECONDS", 1800))
+# Test each connection on checkout, so ones dropped by the server are replaced
+DB_POOL_PRE_PING = os.environ.get("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+# Set when DATABASE_URL points at PgBouncer in transaction pooling mode
+DB_PGBOUNCER_MODE = os.environ.get("DB_PGBOUNCER_MODE", "false").lower() in ("1", "true", "yes")
 
 # --- NEW: Redis Configuration ---
 REDIS_HOST = os.environ.get("REDIS_HOST", "localhost")
@@ -28,7 +47,65 @@ API_V1_STR = "/api/v1"
 # --- Security Configuration ---
 SECRET_KEY = os.environ.get("SECRET_KEY", "super_secret_key_change_me") 
 ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 
+# Access tokens are short-lived; clients renew them with a refresh token
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.environ.get("ACCESS_TOKEN_EXPIRE_MINUTES", 15))
+# Refresh tokens are single-use: every refresh returns a new one (rotation)
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.environ.get("REFRESH_TOKEN_EXPIRE_DAYS", 14))
+# bcrypt cost factor; hashes stored with another cost are rehashed at login
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", 12))
+# Processes dedicated to password hashing, and how many hashes may be queued
+# for them before callers wait (logins give up after PASSWORD_HASH_WAIT_SECONDS)
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+PASSWORD_HASH_MAX_PENDING = int(os.environ.get("PASSWORD_HASH_MAX_PENDING", 64))
+PASSWORD_HASH_WAIT_SECONDS = float(os.environ.get("PASSWORD_HASH_WAIT_SECONDS", 5))
+# Authenticated identities (id, role, company) are cached this long, in
+# process and in Redis; role and company changes evict them immediately
+IDENTITY_CACHE_SECONDS = int(os.environ.get("IDENTITY_CACHE_SECONDS", 60))
+# Already-verified tokens remembered per process, skipping the signature check
+VERIFIED_TOKEN_CACHE_SIZE = int(os.environ.get("VERIFIED_TOKEN_CACHE_SIZE", 1024))
+
+# --- Recurring Booking Configuration ---
+# Conflict checks for open-ended series look this far ahead
+SERIES_CONFLICT_HORIZON_DAYS = int(os.environ.get("SERIES_CONFLICT_HORIZON_DAYS", 365))
+# "My bookings" lists series occurrences up to this far ahead
+SERIES_LISTING_WINDOW_DAYS = int(os.environ.get("SERIES_LISTING_WINDOW_DAYS", 30))
+
+# --- Floor Plan Version History ---
+# Every Nth version of a plan stores a full snapshot; the rest store a JSON patch
+FP_VERSION_KEYFRAME_INTERVAL = int(os.environ.get("FP_VERSION_KEYFRAME_INTERVAL", 20))
+# Compaction folds patches older than this into keyframes
+FP_VERSION_RETENTION_DAYS = int(os.environ.get("FP_VERSION_RETENTION_DAYS", 90))
+
+# --- Backup Retention ---
+# Every backup is kept this long; older ones are thinned to the newest per hour,
+# then per day, then per week, and dropped after BACKUP_WEEKLY_WEEKS.
+BACKUP_KEEP_ALL_HOURS = int(os.environ.get("BACKUP_KEEP_ALL_HOURS", 24))
+BACKUP_HOURLY_DAYS = int(os.environ.get("BACKUP_HOURLY_DAYS", 7))
+BACKUP_DAILY_DAYS = int(os.environ.get("BACKUP_DAILY_DAYS", 30))
+BACKUP_WEEKLY_WEEKS = int(os.environ.get("BACKUP_WEEKLY_WEEKS", 52))
+# How often (per plan, per process) the background writer applies the policy
+BACKUP_PRUNE_INTERVAL_SECONDS = int(os.environ.get("BACKUP_PRUNE_INTERVAL_SECONDS", 3600))
+
+# --- Cache Serialisation ---
+# "orjson", "msgpack" or "json". Entries carry a codec header, so switching
+# codecs does not require flushing Redis.
+CACHE_CODEC = os.environ.get("CACHE_CODEC", "orjson")
+# Payloads at least this large are compressed (zstd if installed, else zlib); 0 disables
+CACHE_COMPRESS_THRESHOLD_BYTES = int(os.environ.get("CACHE_COMPRESS_THRESHOLD_BYTES", 16384))
+
+# --- Offline Sync ---
+# Most operations accepted in one chunk of an offline sync session
+SYNC_CHUNK_MAX_OPS = int(os.environ.get("SYNC_CHUNK_MAX_OPS", 500))
+# Sync sessions untouched for this long are deleted (clients start a new one)
+SYNC_SESSION_RETENTION_DAYS = int(os.environ.get("SYNC_SESSION_RETENTION_DAYS", 7))
+
+# --- Bulk User Import ---
+# Rows hashed, checked and inserted together by /admin/users/import
+USER_IMPORT_BATCH_SIZE = int(os.environ.get("USER_IMPORT_BATCH_SIZE", 500))
+# Largest accepted upload, in data rows
+USER_IMPORT_MAX_ROWS = int(os.environ.get("USER_IMPORT_MAX_ROWS", 20000))
+# Passwords hashed per process-pool task (about a second of bcrypt at cost 12)
+USER_IMPORT_HASH_CHUNK = int(os.environ.get("USER_IMPORT_HASH_CHUNK", 4))
 
 # --- System Constants ---
 ADMIN_ROLE = "admin"
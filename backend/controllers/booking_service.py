@@ -1,30 +1,78 @@
 # FILE: ./backend/controllers/booking_service.py
 import uuid
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import and_, or_, not_, func, Integer
-from datetime import datetime
+from sqlalchemy import and_, or_, not_, func, Integer, Float, TIMESTAMP, select, literal, true, values, column
+from sqlalchemy.dialects.postgresql import insert, UUID as PG_UUID
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime, timedelta
+from collections import Counter
 import math
-from typing import List, Optional, Dict, Any # --- Add Dict, Any ---
+from typing import List, Optional, Dict, Any, Tuple # --- Add Dict, Any ---
 
 # --- Import floorplan_service to reuse its logic ---
 from controllers import floorplan_service 
 
 # Import ORM Models
 from models.floorplan import Room, FloorPlan
-from models.booking import Booking, UserPreference
+from models.booking import Booking, BookingSeries, UserPreference
 from models.user import User
 # Import Pydantic Schemas
-from models.schemas import BookingCreate, RoomAvailabilityRequest, RoomRecommendationRequest, RecommendedRoomResponse
+from models.schemas import (
+    BookingCreate, RoomAvailabilityRequest, RoomRecommendationRequest, RecommendedRoomResponse, RoomResponse,
+    BatchBookingCreate, BatchBookingItemResult, BookingSeriesCreate, BookingResponse, FloorPlanResponse
+)
 
-from tasks import send_booking_confirmation
+from tasks import send_booking_confirmation, send_batch_booking_confirmation
 from utils.websocket_manager import manager
+from utils.availability_index import availability_engine, to_naive_utc
+from utils.recurrence import (
+    expand, expand_as_bookings, last_occurrence_end, overlapping_indices, query_series_in_window
+)
+from constants import SERIES_CONFLICT_HORIZON_DAYS, SERIES_LISTING_WINDOW_DAYS
 from db.redis_conn import delete_cache
-import asyncio
+from db.database import AnySession, DbRunner, session_runner, run_controller
 
-# --- UPDATED: Now tenant-aware ---
-def get_available_rooms(db: Session, request: RoomAvailabilityRequest, current_user: User) -> List[Room]:
+# SQLSTATE raised when an insert violates an EXCLUDE constraint.
+EXCLUSION_VIOLATION = "23P01"
+
+# --- UPDATED: Served from the in-process availability index ---
+def get_available_rooms(db: Session, request: RoomAvailabilityRequest, current_user: User) -> List[RoomResponse]:
     """
     Finds rooms *within the user's company* that are available and meet capacity.
+    Answered from the tenant's availability index; windows that start before the
+    index horizon fall back to the database.
+    """
+    return _get_available_rooms(session_runner(db), request, current_user)
+
+def _get_available_rooms(run: DbRunner, request: RoomAvailabilityRequest, current_user: User) -> List[RoomResponse]:
+    rooms = availability_engine.find_available_rooms(
+        run,
+        current_user.company_id,
+        request.start_time,
+        request.end_time,
+        request.min_capacity,
+    )
+    if rooms is not None:
+        return rooms
+    return _query_available_rooms(run, request, current_user)
+
+def _query_available_rooms(run: DbRunner, request: RoomAvailabilityRequest, current_user: User) -> List[Room]:
+    """
+    SQL availability search, used for windows the in-process index does not cover.
+    """
+    start, end = to_naive_utc(request.start_time), to_naive_utc(request.end_time)
+    available_rooms, series_list = run(_query_unbooked_rooms, request, current_user.company_id, start, end)
+
+    # Drop rooms taken by an occurrence of a recurring series
+    busy_room_ids = {series.room_id for series in series_list if expand(series, start, end)}
+    return [room for room in available_rooms if room.id not in busy_room_ids]
+
+def _query_unbooked_rooms(
+    db: Session, request: RoomAvailabilityRequest, company_id: uuid.UUID, start: datetime, end: datetime
+) -> Tuple[List[Room], List[BookingSeries]]:
+    """
+    Tenant rooms with enough capacity and no single booking in the window, plus
+    the recurring series of those rooms that may have an occurrence in it.
     """
     
     # 1. Find all Room IDs that are *booked* (conflicting) in the desired slot.
@@ -45,11 +93,15 @@ def get_available_rooms(db: Session, request: RoomAvailabilityRequest, current_u
         and_(
             Room.capacity.cast(Integer) >= request.min_capacity,
             not_(Room.id.in_(conflicting_bookings)),
-            FloorPlan.company_id == current_user.company_id  # --- TENANCY ENFORCED ---
+            FloorPlan.company_id == company_id  # --- TENANCY ENFORCED ---
         )
     ).all()
-    
-    return available_rooms
+    if not available_rooms:
+        return available_rooms, []
+
+    return available_rooms, query_series_in_window(
+        db, start, end, BookingSeries.room_id.in_([room.id for room in available_rooms])
+    )
 
 # --- UPDATED: Now tenant-aware ---
 def get_recommended_rooms(
@@ -58,6 +110,22 @@ def get_recommended_rooms(
     """
     Finds available, tenant-owned rooms and ranks them based on user's weightage.
     """
+    return _get_recommended_rooms(session_runner(db), request, current_user)
+
+def _query_preferences(db: Session, user_id: uuid.UUID, room_ids: List[uuid.UUID]) -> List[UserPreference]:
+    return db.query(UserPreference).filter(
+        and_(
+            UserPreference.user_id == user_id,
+            UserPreference.room_id.in_(room_ids)
+        )
+    ).all()
+
+def _query_room(db: Session, room_id: uuid.UUID) -> Optional[Room]:
+    return db.query(Room).filter(Room.id == room_id).first()
+
+def _get_recommended_rooms(
+    run: DbRunner, request: RoomRecommendationRequest, current_user: User
+) -> List[RecommendedRoomResponse]:
     
     # 1. Find all available rooms (this function is now tenant-aware)
     availability_request = RoomAvailabilityRequest(
@@ -65,7 +133,7 @@ def get_recommended_rooms(
         end_time=request.end_time,
         min_capacity=request.participants
     )
-    available_rooms = get_available_rooms(db, availability_request, current_user)
+    available_rooms = _get_available_rooms(run, availability_request, current_user)
     
     if not available_rooms:
         return []
@@ -73,12 +141,7 @@ def get_recommended_rooms(
     # 2. Get user's preferences for these specific rooms
     available_room_ids = [room.id for room in available_rooms]
     
-    preferences = db.query(UserPreference).filter(
-        and_(
-            UserPreference.user_id == current_user.id,
-            UserPreference.room_id.in_(available_room_ids)
-        )
-    ).all()
+    preferences = run(_query_preferences, current_user.id, available_room_ids)
     
     preference_map = {pref.room_id: pref.weightage for pref in preferences}
     latest_preference = (
@@ -94,7 +157,7 @@ def get_recommended_rooms(
             None,
         )
         if not anchor_room:
-            anchor_room = db.query(Room).filter(Room.id == latest_preference.room_id).first()
+            anchor_room = run(_query_room, latest_preference.room_id)
         if anchor_room:
             anchor_coords = (anchor_room.x_coord, anchor_room.y_coord)
 
@@ -118,21 +181,387 @@ def get_recommended_rooms(
     
     return recommended_rooms
 
-# --- UPDATED: create_new_booking (to dispatch async task) ---
+def _series_conflicts(
+    db: Session, room_ids: List[uuid.UUID], window_start: datetime, window_end: datetime
+) -> Dict[uuid.UUID, List[BookingSeries]]:
+    """
+    Recurring series on the given rooms that may occur in the window, by room.
+    Callers expand them against each requested slot.
+    """
+    series_by_room: Dict[uuid.UUID, List[BookingSeries]] = {}
+    for series in query_series_in_window(db, window_start, window_end, BookingSeries.room_id.in_(room_ids)):
+        series_by_room.setdefault(series.room_id, []).append(series)
+    return series_by_room
+
+def _build_booking_statement(
+    booking_data: BookingCreate, current_user: User, booking_id: uuid.UUID, booked_at: datetime
+):
+    """
+    One round trip: resolve the tenant-owned room, insert the booking and upsert
+    the user's preference for it. Returns (booking_id, floor_plan_id), or no row
+    when the room does not belong to the user's company.
+    """
+    target = select(
+        Room.id.label("room_id"), Room.floor_plan_id
+    ).join(
+        FloorPlan, Room.floor_plan_id == FloorPlan.id
+    ).where(
+        Room.id == booking_data.room_id,
+        FloorPlan.company_id == current_user.company_id  # --- TENANCY ENFORCED ---
+    ).cte("target")
+
+    inserted = insert(Booking).from_select(
+        ["id", "room_id", "user_id", "start_time", "end_time", "participants"],
+        select(
+            literal(booking_id, PG_UUID(as_uuid=True)),
+            target.c.room_id,
+            literal(current_user.id, PG_UUID(as_uuid=True)),
+            literal(booking_data.start_time, TIMESTAMP),
+            literal(booking_data.end_time, TIMESTAMP),
+            literal(booking_data.participants, Integer),
+        ),
+    ).returning(Booking.id).cte("inserted")
+
+    preference = insert(UserPreference).from_select(
+        ["id", "user_id", "room_id", "weightage", "last_booked_at"],
+        select(
+            literal(uuid.uuid4(), PG_UUID(as_uuid=True)),
+            literal(current_user.id, PG_UUID(as_uuid=True)),
+            target.c.room_id,
+            literal(1.1, Float),
+            literal(booked_at, TIMESTAMP),
+        ),
+    )
+    preference = preference.on_conflict_do_update(
+        constraint="uq_user_room_preference",
+        set_={
+            "weightage": UserPreference.weightage + 0.1,
+            "last_booked_at": preference.excluded.last_booked_at,
+        },
+    ).returning(UserPreference.id).cte("preference")
+
+    # Data-modifying CTEs always run, so the preference upsert needs no reference.
+    return select(
+        inserted.c.id, target.c.floor_plan_id
+    ).select_from(inserted).join(target, true()).add_cte(preference)
+
+# --- UPDATED: create_new_booking (single-statement insert) ---
 def create_new_booking(
     db: Session, booking_data: BookingCreate, current_user: User
 ) -> Booking:
     """
     Creates a new booking, dispatches an async task, AND
-    publishes a real-time update.
+    publishes a real-time update. Overlapping bookings are rejected by the
+    database's exclusion constraint rather than a prior SELECT.
     """
     
+    if booking_data.end_time <= booking_data.start_time:
+        raise ValueError("The booking must end after it starts.")
+
+    # 1-4. Tenancy check, insert and preference bump in one statement.
+    # Overlaps are rejected by the exclusion constraint on bookings.
+    try:
+        result = db.execute(
+            _build_booking_statement(booking_data, current_user, uuid.uuid4(), datetime.utcnow())
+        ).first()
+    except IntegrityError as e:
+        db.rollback()
+        if getattr(e.orig, "pgcode", None) == EXCLUSION_VIOLATION:
+            raise ValueError("This room is no longer available for the selected time slot.")
+        raise
+
+    if result is None:
+        db.rollback()
+        raise ValueError("Room not found or you do not have permission to book it.")
+
+    # Recurring series are not covered by the exclusion constraint; expand them for this slot.
+    start, end = to_naive_utc(booking_data.start_time), to_naive_utc(booking_data.end_time)
+    series_by_room = _series_conflicts(db, [booking_data.room_id], start, end)
+    if any(expand(series, start, end) for series in series_by_room.get(booking_data.room_id, [])):
+        db.rollback()
+        raise ValueError("This room is no longer available for the selected time slot.")
+
+    db.commit()
+    booking_id, floor_plan_id = result
+
+    new_booking = db.query(Booking).options(
+        joinedload(Booking.room),
+        joinedload(Booking.user)
+    ).filter(Booking.id == booking_id).one()
+
+    # --- Keep the availability index current ---
+    availability_engine.record_booking(
+        company_id=current_user.company_id,
+        room_id=new_booking.room_id,
+        start_time=new_booking.start_time,
+        end_time=new_booking.end_time,
+        booking_id=new_booking.id,
+    )
+    
+    # --- Dispatch Asynchronous Task ---
+    try:
+        send_booking_confirmation.delay(str(new_booking.id))
+        print(f"Dispatched task for booking {new_booking.id}")
+    except Exception as e:
+        print(f"CRITICAL: Failed to dispatch Celery task: {e}")
+    
+    # --- Invalidate Admin's "Live View" Cache ---
+    delete_cache(f"cache:floor_plan_status:{floor_plan_id}")
+
+    # --- Publish WebSocket Update (with a delta so clients need not refetch) ---
+    manager.enqueue_update(
+        floor_plan_id=str(floor_plan_id),
+        company_id=str(current_user.company_id),
+        event_type="BOOKING_CHANGED",
+        changes=[floorplan_service.build_room_delta(new_booking)]
+    )
+
+    return new_booking
+
+class BatchBookingConflict(ValueError):
+    """Raised when an atomic batch cannot be booked in full; carries the per-item results."""
+
+    def __init__(self, message: str, results: List[BatchBookingItemResult]):
+        super().__init__(message)
+        self.results = results
+
+# --- NEW: Book many rooms/slots in one transaction ---
+def create_bookings_batch(
+    db: Session, batch: BatchBookingCreate, current_user: User
+) -> Tuple[List[BatchBookingItemResult], List[Booking]]:
+    """
+    Validates tenancy and conflicts for the whole batch with set-based queries,
+    inserts the bookable items in bulk and commits once. Side effects are
+    collapsed to one task, plus one cache invalidation and one live-feed event
+    per affected floor plan.
+    """
+    items = batch.bookings
+    results: Dict[int, BatchBookingItemResult] = {}
+
+    # 1. Reject malformed slots up front
+    for index, item in enumerate(items):
+        if item.end_time <= item.start_time:
+            results[index] = BatchBookingItemResult(
+                index=index, status="invalid", detail="The booking must end after it starts."
+            )
+
+    # 2. --- TENANCY CHECK --- for every distinct room in one query
+    room_floor_plans = dict(db.query(Room.id, Room.floor_plan_id).join(
+        FloorPlan, Room.floor_plan_id == FloorPlan.id
+    ).filter(
+        Room.id.in_({item.room_id for item in items}),
+        FloorPlan.company_id == current_user.company_id
+    ).all()) if items else {}
+
+    for index, item in enumerate(items):
+        if index not in results and item.room_id not in room_floor_plans:
+            results[index] = BatchBookingItemResult(
+                index=index, status="forbidden",
+                detail="Room not found or you do not have permission to book it."
+            )
+
+    # 3. Conflicts with existing bookings: join the requested slots against bookings once
+    pending = [index for index in range(len(items)) if index not in results]
+    if pending:
+        requested = values(
+            column("idx", Integer),
+            column("room_id", PG_UUID(as_uuid=True)),
+            column("start_time", TIMESTAMP),
+            column("end_time", TIMESTAMP),
+            name="requested",
+        ).data([
+            (index, items[index].room_id, items[index].start_time, items[index].end_time)
+            for index in pending
+        ])
+        conflicting = set(db.execute(
+            select(requested.c.idx).join(
+                Booking,
+                and_(
+                    Booking.room_id == requested.c.room_id,
+                    Booking.start_time < requested.c.end_time,
+                    Booking.end_time > requested.c.start_time
+                )
+            ).distinct()
+        ).scalars())
+        for index in conflicting:
+            results[index] = BatchBookingItemResult(
+                index=index, status="conflict",
+                detail="This room is no longer available for the selected time slot."
+            )
+
+    # 3b. Conflicts with recurring series: one query for every room still pending
+    pending = [index for index in range(len(items)) if index not in results]
+    if pending:
+        slots = {
+            index: (to_naive_utc(items[index].start_time), to_naive_utc(items[index].end_time))
+            for index in pending
+        }
+        series_by_room = _series_conflicts(
+            db,
+            list({items[index].room_id for index in pending}),
+            min(start for start, _ in slots.values()),
+            max(end for _, end in slots.values()),
+        )
+        for index in pending:
+            start, end = slots[index]
+            if any(expand(series, start, end) for series in series_by_room.get(items[index].room_id, [])):
+                results[index] = BatchBookingItemResult(
+                    index=index, status="conflict",
+                    detail="This room is taken by a recurring booking for the selected time slot."
+                )
+
+    # 4. Conflicts inside the batch: the earlier item in request order wins
+    accepted: Dict[uuid.UUID, List[BookingCreate]] = {}
+    for index in range(len(items)):
+        if index in results:
+            continue
+        item = items[index]
+        taken = accepted.setdefault(item.room_id, [])
+        if any(other.start_time < item.end_time and other.end_time > item.start_time for other in taken):
+            results[index] = BatchBookingItemResult(
+                index=index, status="conflict",
+                detail="Overlaps another booking for the same room in this batch."
+            )
+        else:
+            taken.append(item)
+
+    bookable = [index for index in range(len(items)) if index not in results]
+    if batch.atomic and len(bookable) != len(items):
+        for index in bookable:
+            results[index] = BatchBookingItemResult(
+                index=index, status="skipped", detail="Batch aborted because other items failed."
+            )
+        raise BatchBookingConflict(
+            "Some bookings could not be made; nothing was booked.",
+            [results[index] for index in sorted(results)],
+        )
+
+    if not bookable:
+        return [results[index] for index in sorted(results)], []
+
+    # 5. Bulk insert bookings and upsert preferences, then commit once
+    booking_ids = {index: uuid.uuid4() for index in bookable}
+    current_time = datetime.utcnow()
+    booked_per_room = Counter(items[index].room_id for index in bookable)
+
+    preference_insert = insert(UserPreference).values([
+        {
+            "id": uuid.uuid4(),
+            "user_id": current_user.id,
+            "room_id": room_id,
+            "weightage": 1.0 + 0.1 * count,
+            "last_booked_at": current_time,
+        }
+        for room_id, count in booked_per_room.items()
+    ])
+    preference_upsert = preference_insert.on_conflict_do_update(
+        constraint="uq_user_room_preference",
+        set_={
+            # excluded.weightage is 1.0 plus this batch's bump
+            "weightage": UserPreference.weightage + preference_insert.excluded.weightage - 1.0,
+            "last_booked_at": preference_insert.excluded.last_booked_at,
+        },
+    )
+
+    try:
+        db.execute(insert(Booking), [
+            {
+                "id": booking_ids[index],
+                "room_id": items[index].room_id,
+                "user_id": current_user.id,
+                "start_time": items[index].start_time,
+                "end_time": items[index].end_time,
+                "participants": items[index].participants,
+            }
+            for index in bookable
+        ])
+        db.execute(preference_upsert)
+        db.commit()
+    except IntegrityError as e:
+        db.rollback()
+        if getattr(e.orig, "pgcode", None) != EXCLUSION_VIOLATION:
+            raise
+        # A concurrent request took one of the slots after our conflict check.
+        for index in bookable:
+            results[index] = BatchBookingItemResult(
+                index=index, status="skipped",
+                detail="A concurrent booking overlapped this batch; please retry."
+            )
+        raise BatchBookingConflict(
+            "A concurrent booking overlapped this batch; nothing was booked.",
+            [results[index] for index in sorted(results)],
+        )
+
+    for index in bookable:
+        results[index] = BatchBookingItemResult(index=index, status="created", booking_id=booking_ids[index])
+
+    new_bookings = db.query(Booking).options(
+        joinedload(Booking.room),
+        joinedload(Booking.user)
+    ).filter(
+        Booking.id.in_(list(booking_ids.values()))
+    ).order_by(
+        Booking.start_time.asc()
+    ).all()
+
+    # --- Keep the availability index current ---
+    availability_engine.record_bookings(
+        current_user.company_id,
+        [(b.room_id, b.start_time, b.end_time, b.id) for b in new_bookings],
+    )
+
+    # --- Dispatch one Asynchronous Task for the whole batch ---
+    try:
+        send_batch_booking_confirmation.delay([str(booking_id) for booking_id in booking_ids.values()])
+        print(f"Dispatched batch task for {len(booking_ids)} bookings")
+    except Exception as e:
+        print(f"CRITICAL: Failed to dispatch Celery task: {e}")
+
+    # --- One invalidation and one live-feed event per affected floor plan ---
+    affected_floor_plans = {room_floor_plans[items[index].room_id] for index in bookable}
+    now = datetime.utcnow()
+    changes_by_floor_plan: Dict[uuid.UUID, List[Dict[str, Any]]] = {
+        floor_plan_id: [] for floor_plan_id in affected_floor_plans
+    }
+    for booking in new_bookings:
+        changes_by_floor_plan[room_floor_plans[booking.room_id]].append(
+            floorplan_service.build_room_delta(booking, now)
+        )
+
+    for floor_plan_id, changes in changes_by_floor_plan.items():
+        delete_cache(f"cache:floor_plan_status:{floor_plan_id}")
+        manager.enqueue_update(
+            floor_plan_id=str(floor_plan_id),
+            company_id=str(current_user.company_id),
+            event_type="BOOKING_CHANGED",
+            changes=changes
+        )
+
+    return [results[index] for index in sorted(results)], new_bookings
+
+# --- NEW: Recurring bookings ---
+def create_booking_series(
+    db: Session, series_data: BookingSeriesCreate, current_user: User
+) -> BookingSeries:
+    """
+    Creates a recurring booking. Only the rule is stored; its occurrences are
+    checked against existing bookings and series in one sweep over the
+    series window (bounded series) or the conflict horizon (open-ended).
+    """
+    start = to_naive_utc(series_data.start_time)
+    end = to_naive_utc(series_data.end_time)
+    if end <= start:
+        raise ValueError("The booking must end after it starts.")
+
+    # Raises InvalidRecurrence for unsupported rules
+    series_end = last_occurrence_end(series_data.recurrence, start, end)
+
     # 1. --- TENANCY CHECK ---
     room_to_book = db.query(Room).join(
         FloorPlan, Room.floor_plan_id == FloorPlan.id
     ).filter(
         and_(
-            Room.id == booking_data.room_id,
+            Room.id == series_data.room_id,
             FloorPlan.company_id == current_user.company_id
         )
     ).first()
@@ -140,75 +569,57 @@ def create_new_booking(
     if not room_to_book:
         raise ValueError("Room not found or you do not have permission to book it.")
 
-    # 2. Check for conflicts
-    conflict = db.query(Booking).filter(
-        and_(
-            Booking.room_id == booking_data.room_id,
-            Booking.start_time < booking_data.end_time,
-            Booking.end_time > booking_data.start_time
-        )
-    ).first()
-    
-    if conflict:
-        raise ValueError("This room is no longer available for the selected time slot.")
-
-    # 3. Create the booking
-    new_booking = Booking(
-        room_id=booking_data.room_id,
+    new_series = BookingSeries(
+        room_id=series_data.room_id,
         user_id=current_user.id,
-        start_time=booking_data.start_time,
-        end_time=booking_data.end_time,
-        participants=booking_data.participants
+        start_time=start,
+        end_time=end,
+        participants=series_data.participants,
+        recurrence=series_data.recurrence,
+        series_end=series_end,
     )
-    db.add(new_booking)
-    
-    # 4. Update UserPreference weightage
-    preference = db.query(UserPreference).filter(
+
+    # 2. Expand only inside the window we can check, then sweep against what is booked there
+    window_end = series_end or start + timedelta(days=SERIES_CONFLICT_HORIZON_DAYS)
+    occurrences = expand(new_series, start, window_end)
+    if not occurrences:
+        raise ValueError("The recurrence rule produces no occurrences.")
+
+    existing = db.query(Booking.start_time, Booking.end_time).filter(
         and_(
-            UserPreference.user_id == current_user.id,
-            UserPreference.room_id == booking_data.room_id
+            Booking.room_id == series_data.room_id,
+            Booking.start_time < window_end,
+            Booking.end_time > start
         )
-    ).first()
-    
-    current_time = datetime.utcnow()
-    
-    if preference:
-        preference.weightage += 0.1
-        preference.last_booked_at = current_time
-    else:
-        preference = UserPreference(
-            user_id=current_user.id,
-            room_id=booking_data.room_id,
-            weightage=1.1, 
-            last_booked_at=current_time
+    ).all()
+    for other in _series_conflicts(db, [series_data.room_id], start, window_end).get(series_data.room_id, []):
+        existing.extend(expand(other, start, window_end))
+
+    clashes = overlapping_indices(occurrences, [tuple(slot) for slot in existing])
+    if clashes:
+        raise ValueError(
+            f"This room is not available for {len(clashes)} occurrence(s) of the series, "
+            f"first on {occurrences[clashes[0]][0].isoformat()}."
         )
-        db.add(preference)
-        
+
+    db.add(new_series)
     db.commit()
-    db.refresh(new_booking)
-    
-    # --- Dispatch Asynchronous Task ---
-    try:
-        send_booking_confirmation.delay(str(new_booking.id))
-        print(f"Dispatched task for booking {new_booking.id}")
-    except Exception as e:
-        print(f"CRITICAL: Failed to dispatch Celery task: {e}")
-    
+    db.refresh(new_series)
+
+    # --- Series change availability everywhere; rebuild the tenant's index ---
+    availability_engine.invalidate(current_user.company_id)
+
     # --- Invalidate Admin's "Live View" Cache ---
     delete_cache(f"cache:floor_plan_status:{room_to_book.floor_plan_id}")
 
     # --- Publish WebSocket Update ---
-    try:
-        asyncio.run(manager.publish_update(
-            floor_plan_id=str(room_to_book.floor_plan_id),
-            company_id=str(current_user.company_id),
-            event_type="BOOKING_CHANGED"
-        ))
-        print(f"Published WebSocket update for floor plan {room_to_book.floor_plan_id}")
-    except Exception as e:
-        print(f"CRITICAL: Failed to publish WebSocket update: {e}")
+    manager.enqueue_update(
+        floor_plan_id=str(room_to_book.floor_plan_id),
+        company_id=str(current_user.company_id),
+        event_type="BOOKING_CHANGED"
+    )
 
-    return new_booking
+    return new_series
 
 # --- NEW: Implemented for Admin ---
 def get_all_upcoming_bookings(db: Session, current_user: User) -> List[Booking]:
@@ -237,17 +648,40 @@ def get_all_upcoming_bookings(db: Session, current_user: User) -> List[Booking]:
 def get_my_bookings(db: Session, current_user: User) -> List[Booking]:
     """
     Finds all current and future bookings for the *current user*.
+    Recurring series contribute their occurrences within the listing window.
     """
+    return _get_my_bookings(session_runner(db), current_user)
+
+def _query_my_bookings(
+    db: Session, user_id: uuid.UUID, now: datetime, window_end: datetime
+) -> Tuple[List[Booking], List[BookingSeries]]:
     my_bookings = db.query(Booking).options(
-        joinedload(Booking.room) # Eagerly load the room details
+        joinedload(Booking.room), # Eagerly load the room details
+        joinedload(Booking.user)
     ).filter(
         and_(
-            Booking.user_id == current_user.id,
-            Booking.end_time > datetime.utcnow()
+            Booking.user_id == user_id,
+            Booking.end_time > now
         )
     ).order_by(
         Booking.start_time.asc()
     ).all()
+    return my_bookings, query_series_in_window(
+        db, now, window_end, BookingSeries.user_id == user_id, eager=True
+    )
+
+def _get_my_bookings(run: DbRunner, current_user: User) -> List[Booking]:
+    now = datetime.utcnow()
+    window_end = now + timedelta(days=SERIES_LISTING_WINDOW_DAYS)
+    my_bookings, series_list = run(_query_my_bookings, current_user.id, now, window_end)
+
+    occurrences = [
+        occurrence
+        for series in series_list
+        for occurrence in expand_as_bookings(series, now, window_end)
+    ]
+    if occurrences:
+        my_bookings = sorted(my_bookings + occurrences, key=lambda booking: booking.start_time)
     
     return my_bookings
 
@@ -265,4 +699,36 @@ def get_floor_plan_status_for_user(db: Session, floor_plan_id: uuid.UUID, curren
     Gets the live status of a floor plan for a user.
     This re-uses the logic from floorplan_service.
     """
-    return floorplan_service.get_floor_plan_with_status(db, floor_plan_id, current_user)
\ No newline at end of file
+    return floorplan_service.get_floor_plan_with_status(db, floor_plan_id, current_user)
+
+# --- Async variants ---
+# For async handlers (see db/database.py). The Redis and CPU work (index
+# lookups, recurrence expansion, serialisation) runs in a worker thread and the
+# queries run on the event loop through run_db, so every relationship the
+# responses need is eager-loaded by the query steps.
+
+async def get_available_rooms_async(db: AnySession, request: RoomAvailabilityRequest, current_user: User) -> List[RoomResponse]:
+    return await run_controller(db, lambda run: [
+        RoomResponse.model_validate(room) for room in _get_available_rooms(run, request, current_user)
+    ])
+
+async def get_recommended_rooms_async(
+    db: AnySession, request: RoomRecommendationRequest, current_user: User
+) -> List[RecommendedRoomResponse]:
+    return await run_controller(db, _get_recommended_rooms, request, current_user)
+
+async def get_all_upcoming_bookings_async(db: AnySession, current_user: User) -> List[BookingResponse]:
+    return await run_controller(db, lambda run: [
+        BookingResponse.model_validate(booking) for booking in run(get_all_upcoming_bookings, current_user)
+    ])
+
+async def get_my_bookings_async(db: AnySession, current_user: User) -> List[BookingResponse]:
+    return await run_controller(db, lambda run: [
+        BookingResponse.model_validate(booking) for booking in _get_my_bookings(run, current_user)
+    ])
+
+async def get_all_floor_plans_for_user_async(db: AnySession, current_user: User) -> List[FloorPlanResponse]:
+    return await floorplan_service.get_all_floor_plans_async(db, current_user)
+
+async def get_floor_plan_status_for_user_async(db: AnySession, floor_plan_id: uuid.UUID, current_user: User) -> Dict[str, Any]:
+    return await floorplan_service.get_floor_plan_with_status_async(db, floor_plan_id, current_user)
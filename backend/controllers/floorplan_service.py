@@ -1,64 +1,283 @@
+import base64
+import hashlib
 import uuid
+from sqlalchemy import Float, String, column, insert, tuple_, update, values
+from sqlalchemy.dialects.postgresql import JSONB, UUID as PG_UUID
 from sqlalchemy.orm import Session, joinedload
-from datetime import datetime, timedelta # Import timedelta
-from typing import List, Optional, Any, Dict
-import asyncio
+from datetime import datetime, timedelta, timezone # Import timedelta
+from typing import Callable, List, Optional, Any, Dict, Set, Tuple
 from utils.websocket_manager import manager
-from utils.backup import write_snapshot, load_latest_snapshot
+from utils.backup import schedule_snapshot, load_snapshot_at, backup_writer
 from utils import conflict_resolver
 from utils.fault_tolerance import with_retry
+from utils.availability_index import availability_engine
+from utils.recurrence import expand_as_bookings, query_series_in_window
+from utils.version_history import record_version, record_patch, room_path, load_snapshot, load_snapshot_by_id, diff_snapshots
 
-from db.redis_conn import get_cache, set_cache, delete_cache
-from models.floorplan import FloorPlan, Room, FloorPlanVersion
-from models.booking import Booking 
+from constants import SYNC_CHUNK_MAX_OPS
+from db.database import SessionLocal, AnySession, DbRunner, session_runner, run_controller
+from db.redis_conn import get_or_build, get_pointer, set_pointers, invalidate_tags
+from models.floorplan import FloorPlan, Room, FloorPlanVersion, SyncSession
+from models.booking import Booking, BookingSeries
 from models.user import User
-from models.schemas import FloorPlanCreate, AdminUpdatePayload, RoomUpdate, BookingResponse, UserResponse, FloorPlanResponse
+from models.schemas import (
+    FloorPlanCreate, AdminUpdatePayload, RoomUpdate, BookingResponse, UserResponse, FloorPlanResponse,
+    RoomOperation, RoomPatchPayload, RoomPatchResult, SyncChunk, SyncOperation, SyncOperationAck, SyncAck
+)
 
 
-def _capture_floor_plan_snapshot(fp: FloorPlan, db: Session) -> dict:
-    # ... (this function is unchanged) ...
-    rooms = db.query(Room).filter(Room.floor_plan_id == fp.id).all()
+# How long an expired status payload may be served while it is rebuilt
+STATUS_STALE_SECONDS = 30
+# Lifetime of version-keyed plan entries and their pointer keys
+FLOOR_PLAN_CACHE_SECONDS = 3600
+
+
+# --- Cache keys ---
+# Plan entries are keyed by version and never rewritten. Pointer keys map a plan
+# (or a company's plan list) to its current version and are moved after each
+# commit. Every key carries the company tag, so invalidate_company_cache() can
+# drop a tenant's whole cache at once.
+
+def _company_tag(company_id) -> str:
+    return f"company:{company_id}"
+
+def _plan_pointer_key(floor_plan_id) -> str:
+    return f"cache:floor_plan_version:{floor_plan_id}"
+
+def _plan_cache_key(floor_plan_id, version_id) -> str:
+    return f"cache:floor_plan:{floor_plan_id}:v:{version_id}"
+
+def _plan_list_pointer_key(company_id) -> str:
+    return f"cache:all_floor_plans_version:{company_id}"
+
+def _plan_list_cache_key(company_id, digest) -> str:
+    return f"cache:all_floor_plans:{company_id}:v:{digest}"
+
+def _status_cache_key(floor_plan_id) -> str:
+    return f"cache:floor_plan_status:{floor_plan_id}"
+
+def _digest_versions(pairs) -> str:
+    """Stable digest of (plan id, current version id) pairs."""
+    joined = ",".join(sorted(f"{plan_id}:{version_id}" for plan_id, version_id in pairs))
+    return hashlib.sha1(joined.encode("utf-8")).hexdigest()[:16]
+
+def _plan_list_digest(db: Session, company_id: uuid.UUID) -> str:
+    return _digest_versions(db.query(FloorPlan.id, FloorPlan.current_version_id).filter(
+        FloorPlan.company_id == company_id
+    ).all())
+
+def _publish_floor_plan_version(db: Session, fp: FloorPlan):
+    """
+    Moves the plan and plan-list pointers to the committed version and drops the
+    short-lived status entry, in one Redis round trip. Old version entries are
+    left to expire.
+    """
+    set_pointers(
+        {
+            _plan_pointer_key(fp.id): str(fp.current_version_id),
+            _plan_list_pointer_key(fp.company_id): _plan_list_digest(db, fp.company_id),
+        },
+        ex=FLOOR_PLAN_CACHE_SECONDS,
+        tags=[_company_tag(fp.company_id)],
+        evict=[_status_cache_key(fp.id)],
+    )
+
+def invalidate_company_cache(company_id: uuid.UUID) -> int:
+    """Drops every cached floor plan key of a company with one Redis call."""
+    return invalidate_tags(_company_tag(company_id))
+
+
+
+# Editable room columns, in snapshot order
+ROOM_FIELDS = ("name", "capacity", "features", "x_coord", "y_coord", "width", "height")
+
+
+def _room_values(room: Room) -> dict:
+    return {field: getattr(room, field) for field in ROOM_FIELDS}
+
+def _new_room_values(room_id: uuid.UUID, data: dict) -> dict:
+    """Insert row for a new room, with the column defaults the INSERT would apply."""
+    row = {"id": room_id}
+    for field in ROOM_FIELDS:
+        default = Room.__table__.c[field].default
+        if field in data:
+            row[field] = data[field]
+        elif default is not None and default.is_scalar:
+            row[field] = default.arg
+        else:
+            row[field] = None
+    return row
+
+def _build_floor_plan_snapshot(fp: FloorPlan, rooms: Dict[uuid.UUID, dict]) -> dict:
+    """Snapshot of `fp` with the given room values (room id -> ROOM_FIELDS values)."""
     return {
         "floor_plan": { "id": str(fp.id), "name": fp.name, "width": fp.width, "height": fp.height, "map_data": fp.map_data, },
-        "rooms": [{ "id": str(r.id), "name": r.name, "capacity": r.capacity, "features": r.features, "x_coord": r.x_coord, "y_coord": r.y_coord, "width": r.width, "height": r.height } for r in rooms]
+        "rooms": [{"id": str(room_id), **values} for room_id, values in rooms.items()]
     }
 
-def get_floor_plan_by_id(db: Session, floor_plan_id: uuid.UUID, current_user: User) -> Optional[FloorPlan]:
-    # ... (this function is unchanged) ...
-    cache_key = f"cache:floor_plan:{floor_plan_id}"
-    cached_plan = get_cache(cache_key)
-    if cached_plan:
-        return FloorPlanResponse.model_validate(cached_plan) 
+def _capture_floor_plan_snapshot(fp: FloorPlan, db: Session) -> dict:
+    rooms = db.query(Room).filter(Room.floor_plan_id == fp.id).all()
+    return _build_floor_plan_snapshot(fp, {room.id: _room_values(room) for room in rooms})
+
+def _apply_room_changes(
+    db: Session,
+    fp: FloorPlan,
+    changed_rooms: Dict[uuid.UUID, dict],
+    new_rooms: List[dict],
+    deleted_room_ids: Set[uuid.UUID],
+) -> None:
+    """
+    Writes room changes with at most one UPDATE, one INSERT and one DELETE,
+    whatever the number of rooms. `changed_rooms` holds the full new values
+    (all ROOM_FIELDS) of each changed room; `new_rooms` are Room column dicts
+    including "id". Loaded Room instances are expired afterwards.
+    """
+    if changed_rooms:
+        changed = values(
+            column("id", PG_UUID(as_uuid=True)),
+            column("name", String),
+            column("capacity", String),
+            column("features", JSONB),
+            column("x_coord", Float),
+            column("y_coord", Float),
+            column("width", Float),
+            column("height", Float),
+            name="changed",
+        ).data([
+            (room_id, *(room_values[field] for field in ROOM_FIELDS))
+            for room_id, room_values in changed_rooms.items()
+        ])
+        db.execute(
+            update(Room).where(
+                Room.id == changed.c.id,
+                Room.floor_plan_id == fp.id
+            ).values({field: changed.c[field] for field in ROOM_FIELDS}),
+            execution_options={"synchronize_session": False},
+        )
+
+    if new_rooms:
+        db.execute(insert(Room), [{**row, "floor_plan_id": fp.id} for row in new_rooms])
 
-    db_plan = db.query(FloorPlan).options(
+    if deleted_room_ids:
+        db.query(Room).filter(
+            Room.id.in_(deleted_room_ids),
+            Room.floor_plan_id == fp.id
+        ).delete(synchronize_session=False)
+
+    # The statements above bypass the identity map
+    for room_id in (*changed_rooms, *deleted_room_ids):
+        room = db.identity_map.get(db.identity_key(Room, room_id))
+        if room is not None:
+            db.expire(room)
+    db.expire(fp, ["rooms"])
+
+def _query_plan_version(db: Session, floor_plan_id: uuid.UUID, company_id: uuid.UUID):
+    return db.query(FloorPlan.current_version_id).filter(
+        FloorPlan.id == floor_plan_id,
+        FloorPlan.company_id == company_id
+    ).first()
+
+def _query_plan_with_rooms(db: Session, floor_plan_id: uuid.UUID, company_id: uuid.UUID) -> Optional[FloorPlan]:
+    return db.query(FloorPlan).options(
         joinedload(FloorPlan.rooms)
     ).filter(
         FloorPlan.id == floor_plan_id,
-        FloorPlan.company_id == current_user.company_id
+        FloorPlan.company_id == company_id
     ).first()
 
-    if db_plan:
-        plan_data = FloorPlanResponse.model_validate(db_plan) 
-        set_cache(cache_key, plan_data.model_dump(mode='json'), ex=3600) 
+def _query_company_plans(db: Session, company_id: uuid.UUID) -> List[FloorPlan]:
+    return db.query(FloorPlan).options(
+        joinedload(FloorPlan.rooms)
+    ).filter(
+        FloorPlan.company_id == company_id
+    ).order_by(FloorPlan.name.asc()).all()
+
+def get_floor_plan_by_id(db: Session, floor_plan_id: uuid.UUID, current_user: User) -> Optional[FloorPlanResponse]:
+    """
+    Cached, tenant-checked floor plan. Entries are keyed by the plan's current
+    version, so they never change; a pointer key tracks the current version.
+    """
+    return _get_floor_plan_by_id(session_runner(db), floor_plan_id, current_user)
 
-    return db_plan
+def _get_floor_plan_by_id(run: DbRunner, floor_plan_id: uuid.UUID, current_user: User) -> Optional[FloorPlanResponse]:
+    company_tag = _company_tag(current_user.company_id)
+    pointer_key = _plan_pointer_key(floor_plan_id)
 
-def get_all_floor_plans(db: Session, current_user: User) -> List[FloorPlan]:
-    # ... (this function is unchanged) ...
-    cache_key = f"cache:all_floor_plans:{current_user.company_id}"
-    cached_plans = get_cache(cache_key)
-    if cached_plans:
-        return [FloorPlanResponse.model_validate(plan) for plan in cached_plans]
+    version_id = get_pointer(pointer_key)
+    if version_id is None:
+        row = run(_query_plan_version, floor_plan_id, current_user.company_id)
+        if not row:
+            return None
+        version_id = str(row.current_version_id)
+        set_pointers({pointer_key: version_id}, ex=FLOOR_PLAN_CACHE_SECONDS, tags=[company_tag], only_if_missing=True)
 
-    db_plans = db.query(FloorPlan).filter(
-        FloorPlan.company_id == current_user.company_id
-    ).order_by(FloorPlan.name.asc()).all()
+    loaded = {}
 
-    if db_plans:
-        plan_data_list = [FloorPlanResponse.model_validate(plan).model_dump(mode='json') for plan in db_plans]
-        set_cache(cache_key, plan_data_list, ex=3600)
+    def build():
+        db_plan = run(_query_plan_with_rooms, floor_plan_id, current_user.company_id)
+        if not db_plan:
+            return None
+        plan = FloorPlanResponse.model_validate(db_plan).model_dump(mode='json')
+        if str(db_plan.current_version_id) != version_id:
+            # The plan moved on since the pointer was read; serve it, but never
+            # file newer data under an older version's key.
+            loaded["plan"] = plan
+            return None
+        return plan
 
-    return db_plans
+    cached_plan = get_or_build(
+        _plan_cache_key(floor_plan_id, version_id), build, ex=FLOOR_PLAN_CACHE_SECONDS, tags=[company_tag]
+    ).value or loaded.get("plan")
+    # The pointer and entry keys are shared by all tenants, so check ownership on every hit
+    if not cached_plan or cached_plan.get("company_id") != str(current_user.company_id):
+        return None
+    return FloorPlanResponse.model_validate(cached_plan)
+
+def get_all_floor_plans(db: Session, current_user: User) -> List[FloorPlanResponse]:
+    """
+    Cached list of the company's floor plans, keyed by a digest of every plan's
+    current version. Concurrent misses share one rebuild.
+    """
+    return _get_all_floor_plans(session_runner(db), current_user)
+
+def _get_all_floor_plans(run: DbRunner, current_user: User) -> List[FloorPlanResponse]:
+    company_tag = _company_tag(current_user.company_id)
+    pointer_key = _plan_list_pointer_key(current_user.company_id)
+
+    digest = get_pointer(pointer_key)
+    if digest is None:
+        digest = run(_plan_list_digest, current_user.company_id)
+        set_pointers({pointer_key: digest}, ex=FLOOR_PLAN_CACHE_SECONDS, tags=[company_tag], only_if_missing=True)
+
+    loaded = {}
+
+    def build():
+        db_plans = run(_query_company_plans, current_user.company_id)
+        plans = [FloorPlanResponse.model_validate(plan).model_dump(mode='json') for plan in db_plans]
+        if _digest_versions((plan.id, plan.current_version_id) for plan in db_plans) != digest:
+            loaded["plans"] = plans
+            return None
+        return plans
+
+    cached_plans = get_or_build(
+        _plan_list_cache_key(current_user.company_id, digest), build, ex=FLOOR_PLAN_CACHE_SECONDS, tags=[company_tag]
+    ).value
+    if cached_plans is None:
+        cached_plans = loaded.get("plans", [])
+    return [FloorPlanResponse.model_validate(plan) for plan in cached_plans]
+
+# --- Async variants ---
+# For async handlers (see db/database.py). The Redis and CPU work runs in a
+# worker thread; the queries run on the event loop through run_db.
+
+async def get_floor_plan_by_id_async(db: AnySession, floor_plan_id: uuid.UUID, current_user: User) -> Optional[FloorPlanResponse]:
+    return await run_controller(db, _get_floor_plan_by_id, floor_plan_id, current_user)
+
+async def get_all_floor_plans_async(db: AnySession, current_user: User) -> List[FloorPlanResponse]:
+    return await run_controller(db, _get_all_floor_plans, current_user)
+
+async def get_floor_plan_with_status_async(db: AnySession, floor_plan_id: uuid.UUID, current_user: User) -> dict:
+    return await run_controller(db, _get_floor_plan_with_status, floor_plan_id, current_user)
 
 def create_floor_plan(db: Session, fp_data: FloorPlanCreate, current_user: User) -> FloorPlan:
     # ... (this function is unchanged) ...
@@ -70,144 +289,602 @@ def create_floor_plan(db: Session, fp_data: FloorPlanCreate, current_user: User)
         db.add(room)
     db.flush()
     snapshot_data = _capture_floor_plan_snapshot(new_fp, db)
-    initial_version = FloorPlanVersion(floor_plan_id=new_fp.id, data_snapshot=snapshot_data, committer_id=current_user.id, timestamp=new_fp.last_modified_at)
-    db.add(initial_version)
-    new_fp.current_version_id = initial_version.id
+    initial_version = record_version(db, new_fp, snapshot_data, current_user.id, new_fp.last_modified_at)
     with_retry(db.commit)
     db.refresh(new_fp)
     
-    # Persist initial snapshot for recovery
-    write_snapshot(str(new_fp.id), snapshot_data)
-    delete_cache(f"cache:all_floor_plans:{current_user.company_id}")
+    # Persist initial snapshot for recovery (written in the background)
+    schedule_snapshot(str(new_fp.id), snapshot_data, initial_version.id)
+    _publish_floor_plan_version(db, new_fp)
+    availability_engine.invalidate(current_user.company_id)
 
     # --- NEW: Publish WebSocket update for plan creation ---
-    try:
-        asyncio.run(manager.publish_update(
-            floor_plan_id=str(new_fp.id),
-            company_id=str(current_user.company_id),
-            event_type="FLOOR_PLAN_CHANGED"
-        ))
-        print(f"Published WebSocket update for new floor plan {new_fp.id}")
-    except Exception as e:
-        print(f"CRITICAL: Failed to publish WebSocket update: {e}")
+    manager.enqueue_update(
+        floor_plan_id=str(new_fp.id),
+        company_id=str(current_user.company_id),
+        event_type="FLOOR_PLAN_CHANGED"
+    )
     # --- END NEW ---
 
     return new_fp
 
 def update_floor_plan_and_resolve_conflict(db: Session, payload: AdminUpdatePayload, current_user: User) -> FloorPlan:
     # ... (previous logic for this function is unchanged) ...
-    fp_to_update = db.query(FloorPlan).options(
-        joinedload(FloorPlan.rooms) 
-    ).filter(
-        FloorPlan.id == payload.floor_plan_id, 
-        FloorPlan.company_id == current_user.company_id
-    ).first()
+    # Locked first, so the merge below sees the same head that gets recorded
+    fp_to_update = _lock_floor_plan(db, payload.floor_plan_id, current_user, joinedload(FloorPlan.rooms))
     
     if not fp_to_update:
         raise ValueError(f"Floor Plan not found or you do not have permission to edit it.")
     
-    client_ts_utc = payload.client_last_modified_at.replace(tzinfo=None)
-    db_ts_utc = fp_to_update.last_modified_at.replace(tzinfo=None)
-    
-    conflict_note = None
-    if db_ts_utc > client_ts_utc:
-        resolution = conflict_resolver.should_override(
-            db=db,
-            floor_plan=fp_to_update,
-            current_user=current_user,
-            conflicting_timestamp_utc=db_ts_utc,
-        )
-        if not resolution.allow_override:
-            raise ValueError(resolution.reason)
-        conflict_note = resolution.reason
-        print(f"[CONFLICT] {resolution.reason}")
+    def client_rooms(base_rooms: Dict[str, dict], head_rooms: Dict[str, dict]) -> Dict[str, dict]:
+        # The payload is the client's full room list, edited from the base version
+        rooms = {}
+        for room_update in payload.room_updates:
+            update_data = room_update.model_dump(exclude_unset=True)
+            room_id = str(update_data.pop("room_id"))
+            start = base_rooms.get(room_id) or head_rooms.get(room_id)
+            if start is None:
+                row = _new_room_values(room_id, update_data)
+                start, update_data = {field: row[field] for field in ROOM_FIELDS}, {}
+            rooms[room_id] = {**start, **update_data}
+        return rooms
 
-    existing_room_ids = {str(room.id) for room in fp_to_update.rooms}
-    updated_room_ids = set()
+    merged_operations, conflict_note = _merge_with_head(
+        db, fp_to_update, current_user, payload.client_last_modified_at, payload.base_version_id, client_rooms
+    )
+    if merged_operations is not None:
+        result = _stage_room_operations(db, fp_to_update, merged_operations, current_user, conflict_note)
+        with_retry(db.commit)
+        if result:
+            _announce_room_changes(db, fp_to_update, result.version_id, current_user.company_id)
+        db.refresh(fp_to_update)
+        return fp_to_update
 
-    for update in payload.room_updates:
-        room_id_str = str(update.room_id)
-        updated_room_ids.add(room_id_str)
-        
-        room = db.query(Room).filter(
-            Room.id == update.room_id, 
-            Room.floor_plan_id == fp_to_update.id
-        ).first()
+    # Diff the payload against the rooms already loaded with the plan
+    rooms_by_id = {room.id: room for room in fp_to_update.rooms}
+    changed_rooms: Dict[uuid.UUID, dict] = {}
+    new_rooms: List[dict] = []
+    seen_room_ids = set()
 
-        update_data = update.model_dump(exclude_unset=True) 
-        
-        if room:
-            print(f"Updating room: {update_data.get('name', room.name)}")
-            conflict_resolver.apply_room_updates(room, update_data)
-        else:
-            print(f"Creating new room: {update_data.get('name', 'N/A')}")
-            client_room_id = update_data.pop('room_id', None)
-            if not client_room_id:
-                raise ValueError("New room data is missing 'room_id'")
-
-            new_room = Room(
-                id=client_room_id, 
-                floor_plan_id=fp_to_update.id,
-                **update_data 
-            )
-            db.add(new_room)
-
-    rooms_to_delete = existing_room_ids - updated_room_ids
-    if rooms_to_delete:
-        print(f"Deleting rooms: {rooms_to_delete}")
-        db.query(Room).filter(
-            Room.id.in_([uuid.UUID(rid) for rid in rooms_to_delete]),
-            Room.floor_plan_id == fp_to_update.id
-        ).delete(synchronize_session=False)
+    for room_update in payload.room_updates:
+        update_data = room_update.model_dump(exclude_unset=True)
+        room_id = update_data.pop("room_id")
+        seen_room_ids.add(room_id)
+
+        room = rooms_by_id.get(room_id)
+        if room is None:
+            new_rooms.append(_new_room_values(room_id, update_data))
+            continue
+        changes = {field: value for field, value in update_data.items() if getattr(room, field) != value}
+        if changes:
+            changed_rooms[room_id] = {**_room_values(room), **changes}
+
+    deleted_room_ids = set(rooms_by_id) - seen_room_ids
+
+    # The final room state is known in memory; no need to read it back
+    final_rooms = {
+        room_id: changed_rooms.get(room_id) or _room_values(room)
+        for room_id, room in rooms_by_id.items() if room_id not in deleted_room_ids
+    }
+    for row in new_rooms:
+        final_rooms[row["id"]] = {field: row[field] for field in ROOM_FIELDS}
+
+    print(
+        f"[UPDATE] Floor plan {fp_to_update.id}: {len(changed_rooms)} updated, "
+        f"{len(new_rooms)} created, {len(deleted_room_ids)} deleted"
+    )
+    _apply_room_changes(db, fp_to_update, changed_rooms, new_rooms, deleted_room_ids)
 
     new_modified_at = datetime.utcnow()
     fp_to_update.last_modified_at = new_modified_at
     db.flush() 
     
-    snapshot_data = _capture_floor_plan_snapshot(fp_to_update, db)
+    snapshot_data = _build_floor_plan_snapshot(fp_to_update, final_rooms)
     if conflict_note:
         snapshot_data.setdefault("meta", {})["conflict_resolution"] = conflict_note
-    new_version = FloorPlanVersion(
-        floor_plan_id=fp_to_update.id, 
-        data_snapshot=snapshot_data, 
-        committer_id=current_user.id, 
-        timestamp=new_modified_at
-    )
-    db.add(new_version)
-    fp_to_update.current_version_id = new_version.id
+    new_version = record_version(db, fp_to_update, snapshot_data, current_user.id, new_modified_at)
     
     with_retry(db.commit)
     db.refresh(fp_to_update) 
     
-    # Persist snapshot to disk for disaster recovery
-    write_snapshot(str(fp_to_update.id), snapshot_data)
+    # Persist snapshot to disk for disaster recovery (written in the background)
+    schedule_snapshot(str(fp_to_update.id), snapshot_data, new_version.id)
     
-    delete_cache(f"cache:all_floor_plans:{current_user.company_id}")
-    delete_cache(f"cache:floor_plan:{payload.floor_plan_id}")
-    delete_cache(f"cache:floor_plan_status:{payload.floor_plan_id}")
+    _publish_floor_plan_version(db, fp_to_update)
+    availability_engine.invalidate(current_user.company_id)
     
     # --- NEW: Publish WebSocket update for plan edits ---
-    try:
-        asyncio.run(manager.publish_update(
-            floor_plan_id=str(fp_to_update.id),
-            company_id=str(current_user.company_id),
-            event_type="FLOOR_PLAN_CHANGED" # New event type
-        ))
-        print(f"Published WebSocket update for floor plan {fp_to_update.id}")
-    except Exception as e:
-        print(f"CRITICAL: Failed to publish WebSocket update: {e}")
+    manager.enqueue_update(
+        floor_plan_id=str(fp_to_update.id),
+        company_id=str(current_user.company_id),
+        event_type="FLOOR_PLAN_CHANGED" # New event type
+    )
     # --- END NEW ---
     
     return fp_to_update
 
 
+# Fields an "add" operation must provide; width and height have column defaults
+ROOM_REQUIRED_FIELDS = ("name", "capacity", "x_coord", "y_coord")
+
+
+def _load_version_snapshot(version_id: uuid.UUID) -> Optional[dict]:
+    """Rebuilds a version's snapshot in its own session (runs on the backup thread)."""
+    db = SessionLocal()
+    try:
+        return load_snapshot_by_id(db, version_id)
+    finally:
+        db.close()
+
+def _check_for_conflict(db: Session, fp: FloorPlan, current_user: User, since: datetime) -> Optional[str]:
+    """
+    If the plan changed after `since`, asks the conflict resolver whether this
+    user may override. Returns the resolution note, or None when there was no
+    conflict; raises ValueError when the override is refused.
+    """
+    db_ts_utc = fp.last_modified_at.replace(tzinfo=None)
+    if db_ts_utc <= since.replace(tzinfo=None):
+        return None
+    resolution = conflict_resolver.should_override(
+        db=db,
+        floor_plan=fp,
+        current_user=current_user,
+        conflicting_timestamp_utc=db_ts_utc,
+    )
+    if not resolution.allow_override:
+        raise ValueError(resolution.reason)
+    print(f"[CONFLICT] {resolution.reason}")
+    return resolution.reason
+
+def _find_base_version(
+    db: Session,
+    fp: FloorPlan,
+    since: datetime,
+    base_version_id: Optional[uuid.UUID] = None,
+) -> Optional[FloorPlanVersion]:
+    """The version a client edited: `base_version_id`, or the newest one at or before `since`."""
+    query = db.query(FloorPlanVersion).filter(FloorPlanVersion.floor_plan_id == fp.id)
+    if base_version_id is not None:
+        return query.filter(FloorPlanVersion.id == base_version_id).first()
+    return query.filter(
+        FloorPlanVersion.timestamp <= since.replace(tzinfo=None)
+    ).order_by(FloorPlanVersion.timestamp.desc(), FloorPlanVersion.id.desc()).first()
+
+def _snapshot_rooms(snapshot: dict) -> Dict[str, dict]:
+    return {room["id"]: room for room in snapshot.get("rooms", [])}
+
+def _load_merge_base(
+    db: Session,
+    fp: FloorPlan,
+    since: datetime,
+    base_version_id: Optional[uuid.UUID] = None,
+):
+    """
+    (base version, base rooms, head rooms) for a three-way merge, read from the
+    stored version snapshots; None if either version is unavailable.
+    """
+    base = _find_base_version(db, fp, since, base_version_id)
+    head = db.query(FloorPlanVersion).filter(
+        FloorPlanVersion.id == fp.current_version_id
+    ).first() if fp.current_version_id else None
+    if base is None or head is None:
+        return None
+    return base, _snapshot_rooms(load_snapshot(db, base)), _snapshot_rooms(load_snapshot(db, head))
+
+def _merge_with_head(
+    db: Session,
+    fp: FloorPlan,
+    current_user: User,
+    since: datetime,
+    base_version_id: Optional[uuid.UUID],
+    client_rooms: Callable[[Dict[str, dict], Dict[str, dict]], Dict[str, dict]],
+    merge_base=None,
+) -> Tuple[Optional[List[RoomOperation]], Optional[str]]:
+    """
+    Reconciles a client change with edits committed after `since`. The caller
+    holds the plan lock (_lock_floor_plan), so the head cannot move underneath.
+
+    Returns (None, None) when the plan has not changed since. Otherwise the
+    client's rooms (built by `client_rooms` from the base and head room maps;
+    it may add head rooms to the base map) are merged three-way with the head, and the operations turning the head
+    into the merged plan are returned with the resolution note. Plans without
+    a usable base version fall back to the whole-plan role check, returning
+    (None, note) or raising ValueError.
+    """
+    if fp.last_modified_at.replace(tzinfo=None) <= since.replace(tzinfo=None):
+        return None, None
+
+    merge_base = merge_base or _load_merge_base(db, fp, since, base_version_id)
+    if merge_base is None:
+        return None, _check_for_conflict(db, fp, current_user, since)
+
+    base, base_rooms, head_rooms = merge_base
+    merge = conflict_resolver.merge_changes(
+        db, fp, current_user, base, base_rooms, head_rooms, client_rooms(base_rooms, head_rooms)
+    )
+    print(f"[CONFLICT] {merge.reason}")
+    return [RoomOperation(**operation) for operation in merge.operations], merge.reason
+
+def _apply_operations_to_rooms(
+    base_rooms: Dict[str, dict],
+    head_rooms: Dict[str, dict],
+    operations: List[RoomOperation],
+) -> Dict[str, dict]:
+    """
+    The client's room map: `operations` replayed on the base rooms. Rooms added
+    on the server after the base are treated as part of the base, so edits to
+    them merge field by field.
+    """
+    rooms = dict(base_rooms)
+    for operation in operations:
+        if operation.op == "add" and operation.room_id is None:
+            operation.room_id = uuid.uuid4()
+        room_id = str(operation.room_id)
+        if room_id not in rooms and room_id in head_rooms and operation.op != "add":
+            base_rooms[room_id] = rooms[room_id] = head_rooms[room_id]
+        error = _operation_error(operation, room_id in rooms or room_id in head_rooms)
+        if error:
+            raise ValueError(error)
+        fields = _operation_fields(operation)
+        if operation.op == "add":
+            row = _new_room_values(operation.room_id, fields)
+            rooms[room_id] = {field: row[field] for field in ROOM_FIELDS}
+        elif operation.op == "delete":
+            rooms.pop(room_id, None)
+        elif room_id in rooms:
+            rooms[room_id] = {**rooms[room_id], **fields}
+    return rooms
+
+def _operation_fields(operation: RoomOperation) -> dict:
+    return operation.model_dump(exclude_unset=True, include=set(ROOM_FIELDS))
+
+def _operation_error(operation: RoomOperation, room_exists: bool) -> Optional[str]:
+    """Why `operation` cannot be applied, or None if it can."""
+    fields = _operation_fields(operation)
+    cleared = [field for field, value in fields.items() if value is None and field != "features"]
+    if cleared:
+        return f"Invalid operation: {', '.join(cleared)} cannot be null."
+    if operation.op == "add":
+        if room_exists:
+            return f"Invalid operation: room {operation.room_id} already exists."
+        missing = [field for field in ROOM_REQUIRED_FIELDS if field not in fields]
+        if missing:
+            return f"Invalid operation: add is missing {', '.join(missing)}."
+        return None
+    if operation.room_id is None:
+        return f"Invalid operation: {operation.op} needs a room_id."
+    if not room_exists:
+        return f"Room {operation.room_id} not found on this floor plan."
+    return None
+
+def _stage_room_operations(
+    db: Session,
+    fp: FloorPlan,
+    operations: List[RoomOperation],
+    current_user: User,
+    conflict_note: Optional[str],
+) -> Optional[RoomPatchResult]:
+    """
+    Validates and writes room operations (at most one per room) and records them
+    as a patch version. Only the referenced rooms are read. The caller commits
+    and then calls _announce_room_changes. Returns None, recording nothing, when
+    the operations leave every room as it is.
+    """
+    referenced_ids = [op.room_id for op in operations if op.room_id is not None]
+    existing = {
+        room.id: room
+        for room in db.query(Room).filter(
+            Room.floor_plan_id == fp.id,
+            Room.id.in_(referenced_ids)
+        ).all()
+    } if referenced_ids else {}
+
+    changed_rooms: Dict[uuid.UUID, dict] = {}
+    new_rooms: List[dict] = []
+    deleted_room_ids: Set[uuid.UUID] = set()
+    patch_ops: List[dict] = []
+
+    for operation in operations:
+        error = _operation_error(operation, operation.room_id in existing)
+        if error:
+            raise ValueError(error)
+        fields = _operation_fields(operation)
+
+        if operation.op == "add":
+            row = _new_room_values(operation.room_id or uuid.uuid4(), fields)
+            new_rooms.append(row)
+            patch_ops.append({"op": "add", "path": room_path(row["id"]), "value": {
+                "id": str(row["id"]), **{field: row[field] for field in ROOM_FIELDS}
+            }})
+            continue
+
+        room = existing[operation.room_id]
+        if operation.op == "delete":
+            deleted_room_ids.add(room.id)
+            patch_ops.append({"op": "remove", "path": room_path(room.id)})
+            continue
+
+        changes = {field: value for field, value in fields.items() if getattr(room, field) != value}
+        if not changes:
+            continue
+        changed_rooms[room.id] = {**_room_values(room), **changes}
+        patch_ops.extend(
+            {"op": "replace", "path": room_path(room.id, field), "value": value}
+            for field, value in changes.items()
+        )
+
+    if not (changed_rooms or new_rooms or deleted_room_ids):
+        return None
+
+    # Result rows are built before the bulk statements expire the loaded rooms
+    updated = [
+        {"id": room_id, "floor_plan_id": fp.id, **room_values}
+        for room_id, room_values in changed_rooms.items()
+    ]
+    added = [{**row, "floor_plan_id": fp.id} for row in new_rooms]
+
+    print(
+        f"[PATCH] Floor plan {fp.id}: {len(changed_rooms)} updated, "
+        f"{len(new_rooms)} created, {len(deleted_room_ids)} deleted"
+    )
+    _apply_room_changes(db, fp, changed_rooms, new_rooms, deleted_room_ids)
+
+    new_modified_at = datetime.utcnow()
+    fp.last_modified_at = new_modified_at
+    db.flush()
+
+    # Like full snapshots, a version carries only its own conflict note
+    if conflict_note:
+        patch_ops.append({"op": "add", "path": "/meta", "value": {"conflict_resolution": conflict_note}})
+    else:
+        patch_ops.append({"op": "remove", "path": "/meta"})
+
+    def build_snapshot() -> dict:
+        snapshot = _capture_floor_plan_snapshot(fp, db)
+        if conflict_note:
+            snapshot["meta"] = {"conflict_resolution": conflict_note}
+        return snapshot
+
+    new_version = record_patch(db, fp, patch_ops, current_user.id, new_modified_at, build_snapshot)
+
+    return RoomPatchResult(
+        floor_plan_id=fp.id,
+        version_id=new_version.id,
+        last_modified_at=new_modified_at,
+        added=added,
+        updated=updated,
+        deleted=list(deleted_room_ids),
+    )
+
+def _announce_room_changes(db: Session, fp: FloorPlan, version_id: uuid.UUID, company_id: uuid.UUID):
+    """Post-commit side effects of a room patch: backup, caches and live clients."""
+    # The full snapshot is rebuilt from the version history on the backup thread
+    schedule_snapshot(str(fp.id), lambda: _load_version_snapshot(version_id), version_id)
+
+    _publish_floor_plan_version(db, fp)
+    availability_engine.invalidate(company_id)
+
+    manager.enqueue_update(
+        floor_plan_id=str(fp.id),
+        company_id=str(company_id),
+        event_type="FLOOR_PLAN_CHANGED"
+    )
+
+def _lock_floor_plan(db: Session, floor_plan_id: uuid.UUID, current_user: User, *options) -> Optional[FloorPlan]:
+    """
+    The tenant's plan, row-locked until commit. Room edits take this lock before
+    reading rooms, the merge base or the head version, so the operations they
+    stage and record are computed against the head they are appended to.
+    """
+    return db.query(FloorPlan).options(*options).filter(
+        FloorPlan.id == floor_plan_id,
+        FloorPlan.company_id == current_user.company_id
+    ).with_for_update(of=FloorPlan).populate_existing().first()
+
+def patch_floor_plan_rooms(
+    db: Session,
+    floor_plan_id: uuid.UUID,
+    payload: RoomPatchPayload,
+    current_user: User,
+) -> RoomPatchResult:
+    """
+    Applies explicit add/update/delete room operations. Only the referenced rooms
+    are read and written, and the new version stores just the matching patch
+    operations. Rooms not mentioned in the payload are left alone.
+    """
+    fp = _lock_floor_plan(db, floor_plan_id, current_user)
+
+    if not fp:
+        raise ValueError("Floor Plan not found or you do not have permission to edit it.")
+    if not payload.operations:
+        raise ValueError("Invalid operation: no room operations given.")
+
+    referenced_ids = [op.room_id for op in payload.operations if op.room_id is not None]
+    if len(referenced_ids) != len(set(referenced_ids)):
+        raise ValueError("Invalid operation: each room may appear in only one operation.")
+
+    merged_operations, conflict_note = _merge_with_head(
+        db, fp, current_user, payload.client_last_modified_at, payload.base_version_id,
+        lambda base_rooms, head_rooms: _apply_operations_to_rooms(base_rooms, head_rooms, payload.operations),
+    )
+    operations = merged_operations if merged_operations is not None else payload.operations
+    result = _stage_room_operations(db, fp, operations, current_user, conflict_note)
+    if result is None:
+        # Nothing changed: no version, no broadcast
+        result = RoomPatchResult(
+            floor_plan_id=fp.id,
+            version_id=fp.current_version_id,
+            last_modified_at=fp.last_modified_at,
+            added=[],
+            updated=[],
+            deleted=[],
+        )
+        with_retry(db.commit)
+        return result
+    with_retry(db.commit)
+    _announce_room_changes(db, fp, result.version_id, current_user.company_id)
+    return result
+
+
+# --- Offline sync (chunked operation log) ---
+
+def _sync_ack(session: SyncSession, acks: Optional[List[SyncOperationAck]] = None, result: Optional[RoomPatchResult] = None) -> SyncAck:
+    return SyncAck(
+        session_id=session.id,
+        floor_plan_id=session.floor_plan_id,
+        last_acked_seq=session.last_acked_seq,
+        last_acked_op_id=session.last_acked_op_id,
+        acks=acks or [],
+        version_id=result.version_id if result else None,
+        last_modified_at=result.last_modified_at if result else session.synced_modified_at,
+    )
+
+def _fold_operations(operations: List[SyncOperation]) -> List[RoomOperation]:
+    """
+    Collapses a run of valid log operations into at most one operation per room,
+    e.g. add + update -> add, update + delete -> delete, add + delete -> nothing.
+    """
+    folded: Dict[uuid.UUID, tuple] = {}
+    for operation in operations:
+        fields = _operation_fields(operation)
+        previous = folded.get(operation.room_id)
+        if previous is None:
+            folded[operation.room_id] = (operation.op, fields)
+            continue
+        kind, previous_fields = previous
+        if operation.op == "delete":
+            if kind == "add":
+                del folded[operation.room_id] # Never reached the server
+            else:
+                folded[operation.room_id] = ("delete", {})
+        elif operation.op == "add":
+            # Deleted and re-added: replace the stored room's values
+            row = _new_room_values(operation.room_id, fields)
+            del row["id"]
+            folded[operation.room_id] = ("update", row)
+        else:
+            folded[operation.room_id] = (kind, {**previous_fields, **fields})
+    return [RoomOperation(op=kind, room_id=room_id, **fields) for room_id, (kind, fields) in folded.items()]
+
+def _get_sync_session(db: Session, session_id: uuid.UUID, current_user: User, lock: bool = False) -> Optional[SyncSession]:
+    query = db.query(SyncSession).filter(
+        SyncSession.id == session_id,
+        SyncSession.user_id == current_user.id
+    )
+    if lock:
+        query = query.with_for_update()
+    return query.first()
+
+def get_sync_session(db: Session, session_id: uuid.UUID, current_user: User) -> SyncAck:
+    """Where a sync session stands, so a client can resume after last_acked_seq."""
+    session = _get_sync_session(db, session_id, current_user)
+    if not session:
+        raise ValueError("Sync session not found.")
+    return _sync_ack(session)
+
+def apply_sync_chunk(db: Session, payload: SyncChunk, current_user: User) -> SyncAck:
+    """
+    Applies one chunk of an offline operation log. Operations up to the
+    session's last_acked_seq were applied before and are skipped, so a chunk
+    can be retried safely; the rest must continue the sequence without gaps.
+    Operations that no longer fit the plan (e.g. updating a room that never
+    existed) are acknowledged as rejected instead of blocking the log. If the
+    plan changed since the session's last chunk, the accepted operations are
+    merged three-way with those changes. They become a single patch version,
+    committed together with the session's new acknowledgement.
+    """
+    if len(payload.operations) > SYNC_CHUNK_MAX_OPS:
+        raise ValueError(f"Invalid operation: a chunk holds at most {SYNC_CHUNK_MAX_OPS} operations.")
+    fp = _lock_floor_plan(db, payload.floor_plan_id, current_user)
+    if not fp:
+        raise ValueError("Floor Plan not found or you do not have permission to edit it.")
+
+    session = _get_sync_session(db, payload.session_id, current_user, lock=True)
+    if session is None:
+        session = SyncSession(id=payload.session_id, floor_plan_id=fp.id, user_id=current_user.id, last_acked_seq=0)
+        db.add(session)
+        db.flush()
+    elif session.floor_plan_id != fp.id:
+        raise ValueError("Sync session not found.")
+
+    operations = sorted(payload.operations, key=lambda op: op.seq)
+    pending = [op for op in operations if op.seq > session.last_acked_seq]
+    if not pending: # A retry of chunks that were all applied already
+        ack = _sync_ack(session)
+        with_retry(db.commit)
+        return ack
+    expected = list(range(session.last_acked_seq + 1, session.last_acked_seq + 1 + len(pending)))
+    if [op.seq for op in pending] != expected:
+        raise ValueError(f"Out of order: expected operation {session.last_acked_seq + 1} next.")
+
+    since = session.synced_modified_at or payload.client_last_modified_at
+    changed_since = fp.last_modified_at.replace(tzinfo=None) > since.replace(tzinfo=None)
+    merge_base = _load_merge_base(db, fp, since) if changed_since else None
+
+    # Replay the log against which rooms exist, rejecting what no longer applies.
+    # Rooms deleted on the server since the base still count: the merge decides.
+    room_ids = {op.room_id for op in pending if op.room_id is not None}
+    live_rooms = {
+        row.id for row in db.query(Room.id).filter(
+            Room.floor_plan_id == fp.id,
+            Room.id.in_(room_ids)
+        ).all()
+    } if room_ids else set()
+    if merge_base:
+        live_rooms |= {uuid.UUID(room_id) for room_id in merge_base[1]} & room_ids
+
+    acks: List[SyncOperationAck] = []
+    accepted: List[SyncOperation] = []
+    for operation in pending:
+        if operation.room_id is None:
+            error = "Invalid operation: sync operations need a room_id."
+        else:
+            error = _operation_error(operation, operation.room_id in live_rooms)
+        if error:
+            acks.append(SyncOperationAck(op_id=operation.op_id, seq=operation.seq, status="rejected", detail=error))
+            continue
+        if operation.op == "add":
+            live_rooms.add(operation.room_id)
+        elif operation.op == "delete":
+            live_rooms.discard(operation.room_id)
+        accepted.append(operation)
+        acks.append(SyncOperationAck(op_id=operation.op_id, seq=operation.seq, status="applied"))
+
+    folded = _fold_operations(accepted)
+    merged_operations, conflict_note = _merge_with_head(
+        db, fp, current_user, since, None,
+        lambda base_rooms, head_rooms: _apply_operations_to_rooms(base_rooms, head_rooms, folded),
+        merge_base=merge_base,
+    )
+    if merged_operations is not None:
+        folded = merged_operations
+    result = _stage_room_operations(db, fp, folded, current_user, conflict_note) if folded else None
+
+    now = datetime.utcnow()
+    session.last_acked_seq = pending[-1].seq
+    session.last_acked_op_id = pending[-1].op_id
+    session.synced_modified_at = fp.last_modified_at
+    session.updated_at = now
+    ack = _sync_ack(session, acks, result)
+
+    with_retry(db.commit)
+    print(f"[SYNC] Session {session.id}: acked through {ack.last_acked_seq} ({len(accepted)} applied)")
+    if result:
+        _announce_room_changes(db, fp, result.version_id, current_user.company_id)
+    return ack
+
+
 def restore_floor_plan_from_backup(
     db: Session,
     floor_plan_id: uuid.UUID,
     current_user: User,
+    at: Optional[datetime] = None,
+    version_id: Optional[uuid.UUID] = None,
 ) -> FloorPlan:
     """
-    Rehydrate the most recent floor plan snapshot from disk.
+    Rehydrate a floor plan snapshot from disk: the backup of `version_id`, the
+    newest one taken at or before `at` (UTC), or the most recent one. Backups
+    are located through the plan's manifest.
     """
     fp = db.query(FloorPlan).options(joinedload(FloorPlan.rooms)).filter(
         FloorPlan.id == floor_plan_id,
@@ -217,9 +894,19 @@ def restore_floor_plan_from_backup(
     if not fp:
         raise ValueError("Floor Plan not found or you do not have permission to restore it.")
 
-    snapshot = load_latest_snapshot(str(floor_plan_id))
+    backup_writer.flush() # Include snapshots still queued for writing
+    if at is not None and at.tzinfo is not None:
+        at = at.astimezone(timezone.utc).replace(tzinfo=None)
+    snapshot = load_snapshot_at(str(floor_plan_id), at=at, version_id=version_id)
+    if not snapshot and version_id is not None:
+        # The backup may have been thinned out; the version history still has it
+        version = db.query(FloorPlanVersion).filter(
+            FloorPlanVersion.id == version_id,
+            FloorPlanVersion.floor_plan_id == fp.id
+        ).first()
+        snapshot = load_snapshot(db, version) if version else None
     if not snapshot:
-        raise ValueError("No backup snapshots available for this floor plan.")
+        raise ValueError("No matching backup snapshot available for this floor plan.")
 
     plan_data = snapshot.get("floor_plan", {})
     rooms_data = snapshot.get("rooms", [])
@@ -249,64 +936,220 @@ def restore_floor_plan_from_backup(
     new_snapshot.setdefault("meta", {})["restored_from_backup"] = True
 
     fp.last_modified_at = datetime.utcnow()
-    new_version = FloorPlanVersion(
-        floor_plan_id=fp.id,
-        data_snapshot=new_snapshot,
-        committer_id=current_user.id,
-        timestamp=fp.last_modified_at,
-    )
-    db.add(new_version)
-    fp.current_version_id = new_version.id
+    restored_version = record_version(db, fp, new_snapshot, current_user.id, fp.last_modified_at)
 
     with_retry(db.commit)
     db.refresh(fp)
 
-    write_snapshot(str(fp.id), new_snapshot)
-    delete_cache(f"cache:all_floor_plans:{current_user.company_id}")
-    delete_cache(f"cache:floor_plan:{floor_plan_id}")
-    delete_cache(f"cache:floor_plan_status:{floor_plan_id}")
+    schedule_snapshot(str(fp.id), new_snapshot, restored_version.id)
+    # A restore means cached state can no longer be trusted; start the tenant over
+    invalidate_company_cache(current_user.company_id)
+    _publish_floor_plan_version(db, fp)
+    availability_engine.invalidate(current_user.company_id)
+
+    manager.enqueue_update(
+        floor_plan_id=str(fp.id),
+        company_id=str(current_user.company_id),
+        event_type="FLOOR_PLAN_RESTORED"
+    )
+
+    return fp
+
+# Upper bound on one page of version history
+VERSION_PAGE_MAX = 200
+# Version pairs never change, so their diffs can be kept for a long time
+VERSION_DIFF_CACHE_SECONDS = 86400
+
+
+def _ensure_floor_plan_access(db: Session, floor_plan_id: uuid.UUID, current_user: User) -> None:
+    """Tenancy check that loads nothing but the plan id."""
+    exists = db.query(FloorPlan.id).filter(
+        FloorPlan.id == floor_plan_id,
+        FloorPlan.company_id == current_user.company_id
+    ).first()
+    if not exists:
+        raise ValueError("Floor plan not found or you do not have permission.")
+
+def _encode_version_cursor(timestamp: datetime, version_id: uuid.UUID) -> str:
+    raw = f"{timestamp.isoformat()}|{version_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
 
+def _decode_version_cursor(cursor: str):
     try:
-        asyncio.run(
-            manager.publish_update(
-                floor_plan_id=str(fp.id),
-                company_id=str(current_user.company_id),
-                event_type="FLOOR_PLAN_RESTORED",
-            )
+        timestamp, version_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|")
+        return datetime.fromisoformat(timestamp), uuid.UUID(version_id)
+    except ValueError:
+        raise ValueError("Invalid cursor.")
+
+def list_floor_plan_versions(
+    db: Session,
+    floor_plan_id: uuid.UUID,
+    current_user: User,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+) -> dict:
+    """
+    One newest-first page of version metadata. Pages are keyed on (timestamp, id)
+    and served from ix_fp_versions_plan_timestamp; snapshots are never loaded.
+    """
+    _ensure_floor_plan_access(db, floor_plan_id, current_user)
+    limit = max(1, min(limit, VERSION_PAGE_MAX))
+
+    query = db.query(
+        FloorPlanVersion.id, FloorPlanVersion.version_number,
+        FloorPlanVersion.timestamp, FloorPlanVersion.committer_id
+    ).filter(FloorPlanVersion.floor_plan_id == floor_plan_id)
+    if cursor:
+        after_timestamp, after_id = _decode_version_cursor(cursor)
+        query = query.filter(
+            tuple_(FloorPlanVersion.timestamp, FloorPlanVersion.id) < tuple_(after_timestamp, after_id)
         )
-    except Exception as exc:  # pragma: no cover - defensive guard
-        print(f"CRITICAL: Failed to publish restore update: {exc}")
+    rows = query.order_by(
+        FloorPlanVersion.timestamp.desc(), FloorPlanVersion.id.desc()
+    ).limit(limit + 1).all()
 
-    return fp
+    page = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit:
+        next_cursor = _encode_version_cursor(page[-1].timestamp, page[-1].id)
+    return {
+        "versions": [
+            {
+                "version_id": row.id,
+                "version_number": row.version_number,
+                "timestamp": row.timestamp,
+                "committer_id": row.committer_id,
+            } for row in page
+        ],
+        "next_cursor": next_cursor,
+    }
+
+def get_floor_plan_version(
+    db: Session,
+    floor_plan_id: uuid.UUID,
+    version_id: uuid.UUID,
+    current_user: User,
+) -> dict:
+    """A single version with its snapshot, rebuilt from the patch chain if needed."""
+    _ensure_floor_plan_access(db, floor_plan_id, current_user)
+    version = db.query(FloorPlanVersion).filter(
+        FloorPlanVersion.id == version_id,
+        FloorPlanVersion.floor_plan_id == floor_plan_id
+    ).first()
+    if not version:
+        raise ValueError("Version not found.")
+    return {
+        "version_id": version.id,
+        "version_number": version.version_number,
+        "timestamp": version.timestamp,
+        "committer_id": version.committer_id,
+        "snapshot": load_snapshot(db, version),
+    }
+
+def diff_floor_plan_versions(
+    db: Session,
+    floor_plan_id: uuid.UUID,
+    from_version_id: uuid.UUID,
+    to_version_id: uuid.UUID,
+    current_user: User,
+) -> dict:
+    """
+    Room-level diff between two versions of a tenant-owned plan (see
+    version_history.diff_snapshots). Versions are immutable, so results are cached.
+    """
+    _ensure_floor_plan_access(db, floor_plan_id, current_user)
+    version_ids = {from_version_id, to_version_id}
+    found = db.query(FloorPlanVersion.id).filter(
+        FloorPlanVersion.id.in_(version_ids),
+        FloorPlanVersion.floor_plan_id == floor_plan_id
+    ).count()
+    if found != len(version_ids):
+        raise ValueError("Version not found.")
+
+    def build():
+        versions = {
+            version.id: version for version in db.query(FloorPlanVersion).filter(
+                FloorPlanVersion.id.in_(version_ids)
+            ).all()
+        }
+        diff = diff_snapshots(
+            load_snapshot(db, versions[from_version_id]),
+            load_snapshot(db, versions[to_version_id]),
+        )
+        return {"from_version_id": str(from_version_id), "to_version_id": str(to_version_id), **diff}
+
+    return get_or_build(
+        f"cache:fp_version_diff:{floor_plan_id}:{from_version_id}:{to_version_id}",
+        build,
+        ex=VERSION_DIFF_CACHE_SECONDS,
+        tags=[_company_tag(current_user.company_id)],
+    ).value
+
+def _current_booking_details(booking) -> Dict[str, Any]:
+    """Hover-card details for a room's active booking (user must be loaded)."""
+    return {
+        "user_email": booking.user.email,
+        "user_id": str(booking.user.id),
+        "end_time": booking.end_time.isoformat()
+    }
+
+def build_room_delta(booking, now: Optional[datetime] = None) -> Dict[str, Any]:
+    """
+    Live-feed delta for a room touched by a new booking, shaped like the rooms
+    in get_floor_plan_with_status so clients can patch their state in place.
+    current_status is only sent when the booking is active right now.
+    """
+    now = now or datetime.utcnow()
+    delta = {
+        "room_id": str(booking.room_id),
+        "booking": {
+            "id": str(booking.id),
+            "user_id": str(booking.user_id),
+            "user_email": booking.user.email,
+            "start_time": booking.start_time.isoformat(),
+            "end_time": booking.end_time.isoformat(),
+            "participants": booking.participants,
+        },
+    }
+    if booking.start_time <= now < booking.end_time:
+        delta["current_status"] = "Booked"
+        delta["current_booking_details"] = _current_booking_details(booking)
+    return delta
 
 def get_floor_plan_with_status(db: Session, floor_plan_id: uuid.UUID, current_user: User) -> dict:
     """
     Gets a floor plan with live booking status.
-    Uses caching.
+    Uses caching: while one request rebuilds an expired entry, the others get
+    the previous value with "stale": true instead of rebuilding it themselves.
     """
-    cache_key = f"cache:floor_plan_status:{floor_plan_id}"
-    
-    cached_status = get_cache(cache_key)
-    if cached_status:
-        return cached_status
+    return _get_floor_plan_with_status(session_runner(db), floor_plan_id, current_user)
 
-    db_plan = db.query(FloorPlan).options(
-        joinedload(FloorPlan.rooms)
-    ).filter(
-        FloorPlan.id == floor_plan_id,
-        FloorPlan.company_id == current_user.company_id
-    ).first()
-    
-    if not db_plan:
+def _get_floor_plan_with_status(run: DbRunner, floor_plan_id: uuid.UUID, current_user: User) -> dict:
+    result = get_or_build(
+        _status_cache_key(floor_plan_id),
+        lambda: _build_floor_plan_status(run, floor_plan_id, current_user),
+        ex=10,
+        stale_ex=STATUS_STALE_SECONDS,
+        tags=[_company_tag(current_user.company_id)],
+    )
+    # The key is shared by all tenants, so check ownership on every hit
+    if result.value.get("company_id") != str(current_user.company_id):
         raise ValueError("Floor Plan not found or you do not have permission to view it.")
-    
-    # --- P1 FIX: Use timezone-naive UTC now for comparison ---
-    # Database typically stores timestamps without explicit timezone, so we must match.
-    now = datetime.utcnow().replace(tzinfo=None)
-    # --- END P1 FIX ---
-    
+    return {**result.value, "stale": result.stale}
+
+def _query_plan_status(db: Session, floor_plan_id: uuid.UUID, company_id: uuid.UUID, now: datetime):
+    """
+    The plan with its rooms, the bookings active at `now` and the series that
+    may have an occurrence then, all eager-loaded; (None, [], []) if not found.
+    """
+    db_plan = _query_plan_with_rooms(db, floor_plan_id, company_id)
+    if not db_plan:
+        return None, [], []
+
     room_ids = [room.id for room in db_plan.rooms]
-    
+    if not room_ids:
+        return db_plan, [], []
+
     # Query for actively booked rooms
     active_bookings = db.query(Booking).options(
         joinedload(Booking.user)
@@ -317,8 +1160,30 @@ def get_floor_plan_with_status(db: Session, floor_plan_id: uuid.UUID, current_us
         Booking.start_time <= now,
         Booking.end_time > now 
     ).all()
+    series = query_series_in_window(
+        db, now, now + timedelta(microseconds=1), BookingSeries.room_id.in_(room_ids), eager=True
+    )
+    return db_plan, active_bookings, series
+
+def _build_floor_plan_status(run: DbRunner, floor_plan_id: uuid.UUID, current_user: User) -> dict:
+    """
+    Builds the uncached status payload for get_floor_plan_with_status.
+    """
+    # --- P1 FIX: Use timezone-naive UTC now for comparison ---
+    # Database typically stores timestamps without explicit timezone, so we must match.
+    now = datetime.utcnow().replace(tzinfo=None)
+    # --- END P1 FIX ---
+
+    db_plan, active_bookings, active_series = run(_query_plan_status, floor_plan_id, current_user.company_id, now)
+    if not db_plan:
+        raise ValueError("Floor Plan not found or you do not have permission to view it.")
     
     booking_map = {str(booking.room_id): booking for booking in active_bookings}
+
+    # Recurring series: expand only the instant we are reporting on
+    for series in active_series:
+        for occurrence in expand_as_bookings(series, now, now + timedelta(microseconds=1)):
+            booking_map.setdefault(str(occurrence.room_id), occurrence)
     
     floor_plan_response = FloorPlanResponse.model_validate(db_plan).model_dump(mode='json')
     
@@ -331,11 +1196,7 @@ def get_floor_plan_with_status(db: Session, floor_plan_id: uuid.UUID, current_us
         if booking:
             room['current_status'] = "Booked"
             # --- P1/P4 ENHANCEMENT: Include committer name/email for Admin hover ---
-            room['current_booking_details'] = {
-                "user_email": booking.user.email,
-                "user_id": str(booking.user.id),
-                "end_time": booking.end_time.isoformat()
-            }
+            room['current_booking_details'] = _current_booking_details(booking)
         else:
             room['current_status'] = "Available"
             room['current_booking_details'] = None
@@ -346,6 +1207,4 @@ def get_floor_plan_with_status(db: Session, floor_plan_id: uuid.UUID, current_us
     
     floor_plan_response['current_version_id'] = str(db_plan.current_version_id) if db_plan.current_version_id else None
     
-    set_cache(cache_key, floor_plan_response, ex=10) 
-    
     return floor_plan_response
\ No newline at end of file
@@ -0,0 +1,193 @@
+# FILE: ./backend/controllers/user_import_service.py
+import codecs
+import csv
+import json
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from constants import (
+    STANDARD_ROLE, USER_IMPORT_BATCH_SIZE, USER_IMPORT_MAX_ROWS, USER_IMPORT_HASH_CHUNK
+)
+from models.schemas import UserCreate, UserImportReport, UserImportRow
+from models.user import User, UserRole
+from utils.password_hashing import password_hasher
+
+IMPORT_FORMATS = {
+    "text/csv": "csv",
+    "application/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+}
+
+
+def detect_format(content_type: Optional[str], requested: Optional[str]) -> str:
+    """The upload format: `requested` if given, else from the Content-Type header."""
+    if requested:
+        return requested
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    if media_type not in IMPORT_FORMATS:
+        raise ValueError("Invalid upload: send text/csv or application/x-ndjson, or pass ?format=.")
+    return IMPORT_FORMATS[media_type]
+
+
+async def _numbered_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, str]]:
+    """Splits the streamed body into (line number, text) without buffering it whole."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    pending = ""
+    line_no = 0
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *complete, pending = pending.split("\n")
+        for line in complete:
+            line_no += 1
+            yield line_no, line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield line_no + 1, pending.rstrip("\r")
+
+
+def _csv_fields(line: str) -> List[str]:
+    # Rows are line-based; a quoted field spanning lines is reported as invalid
+    return next(csv.reader([line], strict=True))
+
+
+def _parse_row(fmt: str, line: str, columns: Optional[List[str]]) -> dict:
+    if fmt == "ndjson":
+        row = json.loads(line)
+        if not isinstance(row, dict):
+            raise ValueError("Expected a JSON object.")
+        return row
+    values = _csv_fields(line)
+    if len(values) != len(columns):
+        raise ValueError(f"Expected {len(columns)} columns, got {len(values)}.")
+    return dict(zip(columns, values))
+
+
+def _validate_row(row: dict) -> UserCreate:
+    user = UserCreate(
+        email=row.get("email"),
+        password=row.get("password"),
+        role=row.get("role") or STANDARD_ROLE,
+    )
+    if not user.password:
+        raise ValueError("Password is required.")
+    if user.role not in UserRole.__members__:
+        raise ValueError(f"Unknown role '{user.role}'.")
+    return user
+
+
+def _existing_emails(db: Session, emails: List[str]) -> set:
+    """One set-based lookup for a whole batch."""
+    return {email for (email,) in db.query(User.email).filter(User.email.in_(emails)).all()}
+
+
+def _insert_users(db: Session, rows: List[dict]) -> Dict[str, object]:
+    """
+    Inserts a batch in one multi-row statement. Emails taken by a concurrent
+    insert since the lookup are skipped, not fatal; returns email -> new id.
+    """
+    stmt = insert(User).on_conflict_do_nothing(index_elements=[User.email]).returning(User.id, User.email)
+    inserted = {email: user_id for user_id, email in db.execute(stmt, rows)}
+    db.commit()
+    return inserted
+
+
+async def _import_batch(db: Session, batch: List[Tuple[int, UserCreate]], company_id, report: List[UserImportRow]):
+    existing = await run_in_threadpool(_existing_emails, db, [user.email for _, user in batch])
+    fresh = [(line, user) for line, user in batch if user.email not in existing]
+    for line, user in batch:
+        if user.email in existing:
+            report.append(UserImportRow(line=line, email=user.email, status="exists", detail="Email already registered."))
+    if not fresh:
+        return
+
+    hashes = await password_hasher.hash_many_async([user.password for _, user in fresh], USER_IMPORT_HASH_CHUNK)
+    rows = [
+        {
+            "email": user.email,
+            "hashed_password": hashed,
+            "role": UserRole(user.role),
+            "company_id": company_id,
+        }
+        for (_, user), hashed in zip(fresh, hashes)
+    ]
+    inserted = await run_in_threadpool(_insert_users, db, rows)
+    for line, user in fresh:
+        if user.email in inserted:
+            report.append(UserImportRow(line=line, email=user.email, status="created", user_id=inserted[user.email]))
+        else:
+            report.append(UserImportRow(line=line, email=user.email, status="exists", detail="Email already registered."))
+
+
+async def import_users(db: Session, chunks: AsyncIterator[bytes], fmt: str, current_user: User) -> UserImportReport:
+    """
+    Creates users in the admin's company from a streamed CSV (header row naming
+    email, password and optionally role) or NDJSON upload. Rows are handled in
+    batches of USER_IMPORT_BATCH_SIZE: one email lookup, pooled hashing and one
+    bulk insert each, committed per batch. Bad rows are reported, not fatal.
+    """
+    report: List[UserImportRow] = []
+    batch: List[Tuple[int, UserCreate]] = []
+    seen: Dict[str, int] = {}
+    columns = None
+    data_rows = 0
+
+    async for line_no, line in _numbered_lines(chunks):
+        if not line.strip():
+            continue
+        if fmt == "csv" and columns is None:
+            try:
+                columns = [column.strip().lower() for column in _csv_fields(line)]
+            except csv.Error as e:
+                raise ValueError(f"Invalid upload: unreadable CSV header ({e}).")
+            if "email" not in columns or "password" not in columns:
+                raise ValueError("Invalid upload: the CSV header must name 'email' and 'password' columns.")
+            continue
+
+        data_rows += 1
+        if data_rows > USER_IMPORT_MAX_ROWS:
+            report.append(UserImportRow(
+                line=line_no, status="invalid",
+                detail=f"Import stopped: more than {USER_IMPORT_MAX_ROWS} rows."
+            ))
+            break
+
+        try:
+            user = _validate_row(_parse_row(fmt, line, columns))
+        except ValidationError as e:
+            error = e.errors()[0]
+            field = ".".join(str(part) for part in error["loc"])
+            report.append(UserImportRow(line=line_no, status="invalid", detail=f"{field}: {error['msg']}"))
+            continue
+        except (ValueError, csv.Error) as e:
+            report.append(UserImportRow(line=line_no, status="invalid", detail=str(e)))
+            continue
+
+        if user.email in seen:
+            report.append(UserImportRow(
+                line=line_no, email=user.email, status="invalid",
+                detail=f"Duplicate of line {seen[user.email]}."
+            ))
+            continue
+        seen[user.email] = line_no
+
+        batch.append((line_no, user))
+        if len(batch) >= USER_IMPORT_BATCH_SIZE:
+            await _import_batch(db, batch, current_user.company_id, report)
+            batch = []
+
+    if batch:
+        await _import_batch(db, batch, current_user.company_id, report)
+
+    report.sort(key=lambda row: row.line)
+    return UserImportReport(
+        created=sum(1 for row in report if row.status == "created"),
+        exists=sum(1 for row in report if row.status == "exists"),
+        invalid=sum(1 for row in report if row.status == "invalid"),
+        rows=report,
+    )
@@ -1,18 +1,86 @@
 # FILE: ./backend/db/database.py
 # File: /home/shashank/Desktop/workspace/moveinsync-prod/backend/db/database.py
+import asyncio
+import time
+import uuid
+from contextlib import asynccontextmanager
+from dataclasses import asdict
+from typing import Any, Callable, Union
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
-from constants import DATABASE_URL
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from starlette.concurrency import run_in_threadpool
+from constants import (
+    DATABASE_URL, ASYNC_DB_ENABLED, ASYNC_DATABASE_URL,
+    DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT_SECONDS, DB_POOL_RECYCLE_SECONDS,
+    DB_POOL_PRE_PING, DB_PGBOUNCER_MODE
+)
+from utils.monitoring import PoolWaitMetrics
+
+# --- Connection pools ---
+
+class _TimedCheckout:
+    """Pool mixin recording how long every checkout waited for a connection."""
+    wait_metrics: PoolWaitMetrics
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.wait_metrics.record(time.perf_counter() - start, timed_out=True)
+            raise
+        self.wait_metrics.record(time.perf_counter() - start)
+        return connection
+
+# Metrics live on the class, so they survive the pool being recreated by dispose()
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    wait_metrics = PoolWaitMetrics()
+
+class TimedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    wait_metrics = PoolWaitMetrics()
+
+POOL_OPTIONS = {
+    "pool_size": DB_POOL_SIZE,
+    "max_overflow": DB_MAX_OVERFLOW,
+    "pool_timeout": DB_POOL_TIMEOUT_SECONDS,
+    "pool_recycle": DB_POOL_RECYCLE_SECONDS,
+    "pool_pre_ping": DB_POOL_PRE_PING,
+}
+
+def _asyncpg_connect_args() -> dict:
+    if not DB_PGBOUNCER_MODE:
+        return {}
+    # PgBouncer in transaction mode may run each transaction on a different
+    # server connection, so prepared statements must not be cached or share
+    # names. psycopg2 (the sync engine) does not prepare statements.
+    return {
+        "statement_cache_size": 0,
+        "prepared_statement_cache_size": 0,
+        "prepared_statement_name_func": lambda: f"__asyncpg_{uuid.uuid4()}__",
+    }
 
 # The Engine is the starting point for SQLAlchemy applications. 
 # It serves as a central source of connections to a particular database.
 # `echo=True` is great for debugging to see all SQL queries being generated.
-engine = create_engine(DATABASE_URL, echo=False)
+engine = create_engine(DATABASE_URL, echo=False, poolclass=TimedQueuePool, **POOL_OPTIONS)
 
 # SessionLocal is a configured Session class. Each instance of SessionLocal 
 # will be a database session.
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Optional asyncpg engine (ASYNC_DB_ENABLED). Pure database work in async
+# handlers (run_db) then waits on the event loop instead of holding a thread.
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL, echo=False, poolclass=TimedAsyncQueuePool,
+    connect_args=_asyncpg_connect_args(), **POOL_OPTIONS
+) if ASYNC_DB_ENABLED else None
+AsyncSessionLocal = (
+    async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False) if async_engine else None
+)
+
 # Base is the declarative base class for all of our models. 
 # It provides methods for describing database tables and their relationships.
 Base = declarative_base()
@@ -23,4 +91,89 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+# What get_async_db() yields
+AnySession = Union[AsyncSession, Session]
+
+# Dependency for async handlers: an AsyncSession, or a plain Session when the
+# async engine is disabled. Use it through run_db() or run_controller().
+async def get_async_db():
+    async with async_session_scope() as db:
+        yield db
+
+async def run_db(db: AnySession, fn, *args, **kwargs):
+    """
+    Runs `fn(session, *args)` from async code. `fn` must only do database work:
+    on an AsyncSession it runs on the event loop through SQLAlchemy's greenlet
+    bridge (queries go through asyncpg), so a Redis call or heavy computation
+    in it would stall every request in the worker. Otherwise it runs in the
+    threadpool. Use run_controller() for anything else.
+
+    A transaction opened by `fn` on an AsyncSession is committed straight away,
+    so the connection goes back to the pool between steps instead of being held
+    until the request ends. Loaded objects stay usable (expire_on_commit=False).
+    """
+    if isinstance(db, AsyncSession):
+        began = not db.in_transaction()
+        result = await db.run_sync(fn, *args, **kwargs)
+        if began:
+            await db.commit()
+        return result
+    return await run_in_threadpool(fn, db, *args, **kwargs)
+
+# How a controller runs one database step: run(fn, *args) returns fn(session, *args).
+# Steps must eager-load whatever the controller reads from their results.
+DbRunner = Callable[..., Any]
+
+def session_runner(db: Session) -> DbRunner:
+    """Runs steps directly on a sync Session, for the sync routes."""
+    return lambda fn, *args, **kwargs: fn(db, *args, **kwargs)
+
+async def run_controller(db: AnySession, fn, *args, **kwargs):
+    """
+    Runs a controller `fn(run, *args)` that mixes database steps with Redis or
+    CPU work (caches, availability index, recurrence expansion, serialisation).
+    The controller runs in a worker thread; each step it hands to `run` is sent
+    back to this event loop through run_db, so on an AsyncSession the queries
+    go through asyncpg on the request's own session and only the Redis and CPU
+    work occupies the thread.
+    """
+    if not isinstance(db, AsyncSession):
+        return await run_in_threadpool(fn, session_runner(db), *args, **kwargs)
+
+    loop = asyncio.get_running_loop()
+
+    def run(step, *step_args, **step_kwargs):
+        return asyncio.run_coroutine_threadsafe(run_db(db, step, *step_args, **step_kwargs), loop).result()
+    return await asyncio.to_thread(fn, run, *args, **kwargs)
+
+@asynccontextmanager
+async def async_session_scope():
+    """A short-lived get_async_db() session for code outside a request (WebSockets)."""
+    if AsyncSessionLocal is None:
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            await run_in_threadpool(db.close)
+        return
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def _pool_gauges(pool) -> dict:
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": max(0, pool.overflow()),
+        "max_overflow": DB_MAX_OVERFLOW,
+        **asdict(pool.wait_metrics.snapshot()),
+    }
+
+def pool_stats() -> dict:
+    """Live pool gauges and checkout wait times for /system/metrics."""
+    stats = {"pgbouncer_mode": DB_PGBOUNCER_MODE, "sync": _pool_gauges(engine.pool)}
+    if async_engine is not None:
+        stats["async"] = _pool_gauges(async_engine.sync_engine.pool)
+    return stats
@@ -1,9 +1,12 @@
 # FILE: ./backend/db/redis_conn.py
 import redis
-from constants import REDIS_URL
-import json
-from typing import Any
-from utils.encoders import CustomJSONEncoder # --- NEW: Import the encoder ---
+from constants import REDIS_URL, CACHE_CODEC, CACHE_COMPRESS_THRESHOLD_BYTES
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, NamedTuple, Optional
+from utils.cache_codec import CacheCodec
 
 # Create a Redis connection pool
 try:
@@ -14,38 +17,388 @@ except redis.exceptions.ConnectionError as e:
     print(f"Failed to connect to Redis: {e}")
     redis_conn = None
 
+# Cached payloads are binary (see utils/cache_codec.py), so they go through a
+# client that does not decode responses (it has its own connection pool).
+cache_conn = redis.Redis.from_url(REDIS_URL) if redis_conn else None
+codec = CacheCodec(CACHE_CODEC, compress_threshold=CACHE_COMPRESS_THRESHOLD_BYTES)
+
 def get_redis():
     """Dependency to get the redis connection"""
     if not redis_conn:
         raise Exception("Redis connection not available.")
     return redis_conn
 
+# --- In-process tier (decoded objects, in front of Redis) ---
+
+# Max entries held per worker process
+LOCAL_CACHE_MAX_ENTRIES = int(os.environ.get("LOCAL_CACHE_MAX_ENTRIES", 2048))
+# Local copies never outlive this, even if an invalidation message is lost
+LOCAL_CACHE_MAX_SECONDS = 60
+# delete_cache() broadcasts the key here so every worker evicts its copy
+INVALIDATION_CHANNEL = "cache_invalidation_channel"
+
+
+class LocalLRUCache:
+    """
+    Size-bounded, thread-safe LRU of already-decoded values with per-entry expiry.
+    Cached objects are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str):
+        """Returns (value, fresh_until) or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() >= entry[2]:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0], entry[1]
+
+    def set(self, key: str, value: Any, fresh_until: float, ttl_seconds: float):
+        expires_at = time.monotonic() + min(ttl_seconds, LOCAL_CACHE_MAX_SECONDS)
+        with self._lock:
+            self._entries[key] = (value, fresh_until, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+            }
+
+
+local_cache = LocalLRUCache(LOCAL_CACHE_MAX_ENTRIES)
+_redis_stats = {"hits": 0, "misses": 0}
+_stats_lock = threading.Lock()
+_invalidation_thread = None
+_invalidation_lock = threading.Lock()
+
+
+def _count_redis(hit: bool):
+    with _stats_lock:
+        _redis_stats["hits" if hit else "misses"] += 1
+
+
+def _on_invalidation(message):
+    local_cache.delete(message["data"])
+
+
+def _on_invalidation_error(error, pubsub, thread):
+    # Invalidations may have been missed while disconnected; start over locally.
+    print(f"Cache invalidation listener error: {error}")
+    local_cache.clear()
+    time.sleep(1)
+
+
+def _local_tier_enabled() -> bool:
+    """The local tier is only safe while this process listens for invalidations."""
+    global _invalidation_thread
+    if not redis_conn:
+        return False
+    if _invalidation_thread is not None:
+        return True
+    with _invalidation_lock:
+        if _invalidation_thread is None:
+            try:
+                pubsub = redis_conn.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(**{INVALIDATION_CHANNEL: _on_invalidation})
+                _invalidation_thread = pubsub.run_in_thread(
+                    sleep_time=1, daemon=True, exception_handler=_on_invalidation_error
+                )
+            except Exception as e:
+                print(f"Failed to start cache invalidation listener: {e}")
+                return False
+    return True
+
+
+def _redis_server_evictions() -> Dict[str, int]:
+    """
+    Keys Redis dropped on its own: evicted under maxmemory, or expired. These
+    are server-wide figures (INFO stats), not just this worker's keys.
+    """
+    if not redis_conn:
+        return {}
+    try:
+        info = redis_conn.info("stats")
+    except Exception as e:
+        print(f"Error reading Redis stats: {e}")
+        return {}
+    return {"evictions": int(info.get("evicted_keys", 0)), "expirations": int(info.get("expired_keys", 0))}
+
+
+def cache_stats() -> Dict[str, Dict[str, int]]:
+    """Per-tier hit/miss/eviction counters for /system/metrics."""
+    with _stats_lock:
+        redis_tier = dict(_redis_stats)
+    redis_tier.update(_redis_server_evictions())
+    return {"local": local_cache.stats(), "redis": redis_tier}
+
+
 # --- Helper Functions for Caching ---
 
 def set_cache(key: str, data: Any, ex: int = 3600):
     """Sets data in Redis cache with an expiration time."""
     if redis_conn:
         try:
-            # --- FIX: Use the custom encoder ---
-            redis_conn.set(key, json.dumps(data, cls=CustomJSONEncoder), ex=ex)
+            cache_conn.set(key, codec.encode(data), ex=ex)
         except Exception as e:
             print(f"Error setting cache for key {key}: {e}")
+            return
+        if _local_tier_enabled():
+            local_cache.set(key, data, time.time() + ex, ex)
 
 def get_cache(key: str) -> Any:
-    """Gets data from Redis cache."""
+    """Gets data from the local tier, falling back to Redis."""
     if redis_conn:
+        use_local = _local_tier_enabled()
+        if use_local:
+            entry = local_cache.get(key)
+            if entry:
+                return entry[0]
         try:
-            cached_data = redis_conn.get(key)
+            pipe = cache_conn.pipeline(transaction=False)
+            pipe.get(key)
+            pipe.ttl(key)
+            cached_data, ttl = pipe.execute()
+            _count_redis(bool(cached_data))
             if cached_data:
-                return json.loads(cached_data)
+                data = codec.decode(cached_data)
+                if use_local and ttl and ttl > 0:
+                    local_cache.set(key, data, time.time() + ttl, ttl)
+                return data
         except Exception as e:
             print(f"Error getting cache for key {key}: {e}")
     return None
 
 def delete_cache(key: str):
-    """Deletes a key from Redis cache."""
+    """Deletes a key from Redis and from the local tier of every worker."""
+    local_cache.delete(key)
+    if redis_conn:
+        try:
+            pipe = redis_conn.pipeline(transaction=False)
+            pipe.delete(key)
+            pipe.publish(INVALIDATION_CHANNEL, key)
+            pipe.execute()
+        except Exception as e:
+            print(f"Error deleting cache for key {key}: {e}")
+
+# --- Stale-while-revalidate with single-flight rebuilds ---
+
+# How long a stale value may still be served while one caller rebuilds it
+DEFAULT_STALE_SECONDS = 60
+# Upper bound on a rebuild; the lock expires after this even if the builder dies
+REBUILD_LOCK_SECONDS = 10
+# How long a caller with nothing to serve waits for another worker's rebuild
+MISS_WAIT_SECONDS = 2.0
+MISS_POLL_SECONDS = 0.05
+
+
+class CacheResult(NamedTuple):
+    value: Any
+    stale: bool
+
+
+def _read_entry(key: str):
+    """Returns the (value, fresh_until) envelope stored by get_or_build, or None."""
+    try:
+        raw = cache_conn.get(key)
+        _count_redis(bool(raw))
+        if raw:
+            entry = codec.decode(raw)
+            return entry["value"], entry["fresh_until"]
+    except Exception as e:
+        print(f"Error getting cache for key {key}: {e}")
+    return None
+
+
+def _write_entry(key: str, value: Any, ex: int, stale_ex: int, tags: Iterable[str] = ()):
+    fresh_until = time.time() + ex
+    try:
+        entry = {"value": value, "fresh_until": fresh_until}
+        pipe = cache_conn.pipeline(transaction=False)
+        pipe.set(key, codec.encode(entry), ex=ex + stale_ex)
+        _add_to_tags(pipe, key, tags, ex + stale_ex)
+        pipe.execute()
+    except Exception as e:
+        print(f"Error setting cache for key {key}: {e}")
+        return
+    if _local_tier_enabled():
+        local_cache.set(key, value, fresh_until, ex)
+
+
+def _build_and_store(key: str, builder: Callable[[], Any], ex: int, stale_ex: int, tags: Iterable[str]) -> Any:
+    value = builder()
+    if value is not None:
+        _write_entry(key, value, ex, stale_ex, tags)
+    return value
+
+
+def get_or_build(
+    key: str,
+    builder: Callable[[], Any],
+    ex: int = 3600,
+    stale_ex: int = DEFAULT_STALE_SECONDS,
+    tags: Iterable[str] = (),
+) -> CacheResult:
+    """
+    Returns the cached value for `key`, building it with `builder` when needed.
+    Concurrent misses across all workers are coalesced behind a short Redis lock:
+    one caller rebuilds while the others keep getting the last value (stale=True),
+    or wait briefly for the rebuild when there is nothing to serve. A None result
+    from the builder is returned but not cached. Stored entries are added to
+    each of `tags` (see invalidate_tags).
+    """
+    if not redis_conn:
+        return CacheResult(builder(), False)
+
+    # Local copies are only kept while fresh; staleness is arbitrated in Redis
+    if _local_tier_enabled():
+        local_entry = local_cache.get(key)
+        if local_entry and time.time() < local_entry[1]:
+            return CacheResult(local_entry[0], False)
+
+    entry = _read_entry(key)
+    if entry and time.time() < entry[1]:
+        if _local_tier_enabled():
+            local_cache.set(key, entry[0], entry[1], entry[1] - time.time())
+        return CacheResult(entry[0], False)
+
+    lock = redis_conn.lock(f"lock:{key}", timeout=REBUILD_LOCK_SECONDS, blocking=False)
+    try:
+        acquired = lock.acquire()
+    except Exception as e:
+        print(f"Error acquiring rebuild lock for key {key}: {e}")
+        acquired = False
+
+    if acquired:
+        try:
+            return CacheResult(_build_and_store(key, builder, ex, stale_ex, tags), False)
+        finally:
+            try:
+                lock.release()
+            except Exception:
+                pass # Lock expired mid-build; another caller may already own it
+
+    # Someone else is rebuilding
+    if entry:
+        return CacheResult(entry[0], True)
+
+    deadline = time.monotonic() + MISS_WAIT_SECONDS
+    while time.monotonic() < deadline:
+        time.sleep(MISS_POLL_SECONDS)
+        entry = _read_entry(key)
+        if entry:
+            return CacheResult(entry[0], time.time() >= entry[1])
+
+    # The rebuild is slow or failed; build for ourselves rather than time out
+    return CacheResult(_build_and_store(key, builder, ex, stale_ex, tags), False)
+
+# --- Pointer keys and tag sets ---
+
+# Tag sets are sorted sets scored by each member's expiry time. Every write first
+# trims the members that have already expired, so a set only ever lists live keys.
+TAG_KEY = "tagset:{tag}"
+TAG_TTL_SECONDS = 86400
+
+# Deletes every live key listed in the tag sets KEYS, then the sets themselves,
+# and tells every worker to evict its local copies. ARGV[1] is
+# INVALIDATION_CHANNEL, ARGV[2] the current time.
+INVALIDATE_TAGS_LUA = """
+local dropped = 0
+for _, tag in ipairs(KEYS) do
+    for _, key in ipairs(redis.call('ZRANGEBYSCORE', tag, ARGV[2], '+inf')) do
+        dropped = dropped + redis.call('DEL', key)
+        redis.call('PUBLISH', ARGV[1], key)
+    end
+    redis.call('DEL', tag)
+end
+return dropped
+"""
+_invalidate_tags_script = redis_conn.register_script(INVALIDATE_TAGS_LUA) if redis_conn else None
+
+
+def _add_to_tags(pipe, key: str, tags: Iterable[str], ex: int):
+    now = time.time()
+    for tag in tags:
+        tag_key = TAG_KEY.format(tag=tag)
+        pipe.zremrangebyscore(tag_key, "-inf", now)
+        pipe.zadd(tag_key, {key: now + ex})
+        pipe.expire(tag_key, max(ex, TAG_TTL_SECONDS))
+
+
+def get_pointer(key: str) -> Optional[str]:
+    """Reads a small mutable pointer key (never held in the local tier)."""
     if redis_conn:
         try:
-            redis_conn.delete(key)
+            return redis_conn.get(key)
         except Exception as e:
-            print(f"Error deleting cache for key {key}: {e}")
\ No newline at end of file
+            print(f"Error getting cache pointer {key}: {e}")
+    return None
+
+
+def set_pointers(
+    pointers: Dict[str, str],
+    ex: int = 3600,
+    tags: Iterable[str] = (),
+    only_if_missing: bool = False,
+    evict: Iterable[str] = (),
+):
+    """
+    Points each key at its value and evicts the `evict` keys everywhere, in one
+    round trip. Readers that looked a pointer up themselves pass
+    only_if_missing=True, so they can never overwrite a writer's newer value.
+    """
+    if not redis_conn:
+        return
+    for key in evict:
+        local_cache.delete(key)
+    try:
+        pipe = redis_conn.pipeline(transaction=False)
+        for key, value in pointers.items():
+            pipe.set(key, value, ex=ex, nx=only_if_missing)
+            _add_to_tags(pipe, key, tags, ex)
+        for key in evict:
+            pipe.delete(key)
+            pipe.publish(INVALIDATION_CHANNEL, key)
+        pipe.execute()
+    except Exception as e:
+        print(f"Error setting cache pointers {list(pointers)}: {e}")
+
+
+def invalidate_tags(*tags: str) -> int:
+    """Drops every cached key carrying any of `tags` with one Redis call."""
+    if not _invalidate_tags_script:
+        return 0
+    try:
+        return int(_invalidate_tags_script(
+            keys=[TAG_KEY.format(tag=tag) for tag in tags],
+            args=[INVALIDATION_CHANNEL, time.time()],
+        ))
+    except Exception as e:
+        print(f"Error invalidating cache tags {tags}: {e}")
+        return 0
@@ -1,11 +1,13 @@
 # FILE: ./backend/models/booking.py
 import uuid
-from sqlalchemy import Column, String, TIMESTAMP, ForeignKey, Integer, Float, UniqueConstraint
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, String, TIMESTAMP, ForeignKey, Integer, Float, UniqueConstraint, Index, Computed
+from sqlalchemy.dialects.postgresql import UUID, TSRANGE, ExcludeConstraint
 from sqlalchemy.orm import relationship
 from models.base import Base
 from datetime import datetime
 
+BOOKING_OVERLAP_CONSTRAINT = "excl_bookings_room_overlap"
+
 class Booking(Base):
     """Reservations for a specific room."""
     __tablename__ = "bookings"
@@ -17,6 +19,21 @@ class Booking(Base):
     end_time = Column(TIMESTAMP, nullable=False)
     participants = Column(Integer, nullable=False)
 
+    # --- NEW: Half-open [start, end) range maintained by Postgres ---
+    # Lets the exclusion constraint below reject overlapping bookings atomically.
+    during = Column(TSRANGE, Computed("tsrange(start_time, end_time, '[)')", persisted=True))
+
+    __table_args__ = (
+        # Requires the btree_gist extension (see db/schema_upgrades.py).
+        ExcludeConstraint(
+            ("room_id", "="),
+            ("during", "&&"),
+            using="gist",
+            name=BOOKING_OVERLAP_CONSTRAINT,
+        ),
+        Index("ix_bookings_room_time", "room_id", "start_time", "end_time"),
+    )
+
     # Relationships (pointing back to new models)
     room = relationship("Room", back_populates="bookings")
     user = relationship("User", back_populates="bookings")
@@ -25,6 +42,36 @@ class Booking(Base):
         return f"<Booking(room_id='{self.room_id}', user_id='{self.user_id}', start='{self.start_time}')>"
 
 
+class BookingSeries(Base):
+    """
+    A recurring reservation. Only the rule is stored; occurrences are expanded
+    on read, inside the queried window (see utils/recurrence.py).
+    """
+    __tablename__ = "booking_series"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    room_id = Column(UUID(as_uuid=True), ForeignKey('rooms.id'), nullable=False)
+    user_id = Column(UUID(as_uuid=True), ForeignKey('users.id'), nullable=False)
+    # First occurrence; every occurrence has the same duration.
+    start_time = Column(TIMESTAMP, nullable=False)
+    end_time = Column(TIMESTAMP, nullable=False)
+    participants = Column(Integer, nullable=False)
+    recurrence = Column(String(255), nullable=False) # RRULE, e.g. "FREQ=WEEKLY;BYDAY=MO;COUNT=12"
+    # End of the last occurrence; NULL for open-ended series. Lets SQL skip finished series.
+    series_end = Column(TIMESTAMP, nullable=True)
+    created_at = Column(TIMESTAMP, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        Index("ix_booking_series_room_window", "room_id", "start_time", "series_end"),
+    )
+
+    room = relationship("Room", back_populates="booking_series")
+    user = relationship("User")
+
+    def __repr__(self):
+        return f"<BookingSeries(room_id='{self.room_id}', rule='{self.recurrence}', start='{self.start_time}')>"
+
+
 class UserPreference(Base):
     """Simple engine for weighted recommendations based on past bookings."""
     __tablename__ = "user_preferences"
@@ -1,6 +1,6 @@
 # FILE: ./backend/models/floorplan.py
 import uuid
-from sqlalchemy import Column, String, TIMESTAMP, ForeignKey, Float # Add Float
+from sqlalchemy import Column, String, TIMESTAMP, ForeignKey, Float, Integer, Boolean, Index, true # Add Float
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import relationship
 from models.base import Base
@@ -13,9 +13,20 @@ class FloorPlanVersion(Base):
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     # We now link this to the FloorPlan, which links to the Company
     floor_plan_id = Column(UUID(as_uuid=True), ForeignKey('floor_plans.id'), nullable=False)
-    data_snapshot = Column(JSONB, nullable=False) # This will now store the new geometry
+    # Full snapshot for keyframes; otherwise a JSON patch against the previous version
+    # (see utils/version_history.py)
+    data_snapshot = Column(JSONB, nullable=False)
     timestamp = Column(TIMESTAMP, default=datetime.utcnow, nullable=False)
     committer_id = Column(UUID(as_uuid=True), ForeignKey('users.id'), nullable=True) 
+    # 1, 2, 3... per floor plan
+    version_number = Column(Integer, nullable=True)
+    is_keyframe = Column(Boolean, nullable=False, default=True, server_default=true())
+
+    __table_args__ = (
+        Index("ix_fp_versions_plan_number", "floor_plan_id", "version_number", unique=True),
+        # Newest-first keyset pagination of a plan's history
+        Index("ix_fp_versions_plan_timestamp", floor_plan_id, timestamp.desc(), id.desc()),
+    )
 
     # We can add a simple relationship to the committer
     committer = relationship("User") 
@@ -69,7 +80,34 @@ class Room(Base):
     # --- Relationships ---
     floor_plan = relationship("FloorPlan", back_populates="rooms")
     bookings = relationship("Booking", back_populates="room", cascade="all, delete-orphan")
+    booking_series = relationship("BookingSeries", back_populates="room", cascade="all, delete-orphan")
     preferences = relationship("UserPreference", back_populates="room", cascade="all, delete-orphan")
 
     def __repr__(self):
-        return f"<Room(name='{self.name}', capacity='{self.capacity}')>"
\ No newline at end of file
+        return f"<Room(name='{self.name}', capacity='{self.capacity}')>"
+
+class SyncSession(Base):
+    """
+    Progress of one client's offline operation log for a floor plan. Operations
+    are numbered 1, 2, 3... by the client; everything up to last_acked_seq has
+    been applied, so the client resumes from the operation after it.
+    """
+    __tablename__ = "sync_sessions"
+
+    id = Column(UUID(as_uuid=True), primary_key=True) # Generated by the client
+    floor_plan_id = Column(UUID(as_uuid=True), ForeignKey('floor_plans.id', ondelete='CASCADE'), nullable=False)
+    user_id = Column(UUID(as_uuid=True), ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    last_acked_seq = Column(Integer, nullable=False, default=0)
+    last_acked_op_id = Column(UUID(as_uuid=True), nullable=True)
+    # The plan's last_modified_at after this session's latest chunk; a newer
+    # value means someone else edited the plan in between
+    synced_modified_at = Column(TIMESTAMP, nullable=True)
+    created_at = Column(TIMESTAMP, default=datetime.utcnow, nullable=False)
+    updated_at = Column(TIMESTAMP, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        Index("ix_sync_sessions_updated_at", "updated_at"),
+    )
+
+    def __repr__(self):
+        return f"<SyncSession(id='{self.id}', fp_id='{self.floor_plan_id}', last_acked_seq={self.last_acked_seq})>"
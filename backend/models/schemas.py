@@ -1,6 +1,6 @@
 from pydantic import BaseModel, EmailStr
 from datetime import datetime
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Literal
 import uuid
 
 # --- 1. User/Auth Schemas ---
@@ -9,6 +9,12 @@ class Token(BaseModel):
     """Schema for the returned JWT token."""
     access_token: str
     token_type: str
+    # Single-use; exchange it at /auth/refresh for a new pair
+    refresh_token: Optional[str] = None
+    expires_in: Optional[int] = None # Access token lifetime, in seconds
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
 
 class TokenData(BaseModel):
     """Schema for the JWT payload data."""
@@ -35,6 +41,20 @@ class UserResponse(UserBase):
     class Config:
         from_attributes = True
 
+class UserImportRow(BaseModel):
+    """Outcome of one row of a bulk user import."""
+    line: int
+    email: Optional[str] = None
+    status: Literal["created", "exists", "invalid"]
+    user_id: Optional[uuid.UUID] = None
+    detail: Optional[str] = None
+
+class UserImportReport(BaseModel):
+    created: int
+    exists: int
+    invalid: int
+    rows: List[UserImportRow]
+
 # --- NEW: Schema for creating a new company and its first admin ---
 class CompanyRegister(BaseModel):
     company_name: str
@@ -95,6 +115,7 @@ class FloorPlanResponse(FloorPlanBase):
     id: uuid.UUID
     company_id: uuid.UUID # --- NEW: Added company_id ---
     last_modified_at: datetime
+    current_version_id: Optional[uuid.UUID] = None
     rooms: List[RoomResponse] 
 
     # --- THIS IS THE FIX ---
@@ -111,6 +132,87 @@ class AdminUpdatePayload(BaseModel):
     client_last_modified_at: datetime 
     # Use the new RoomUpdate schema
     room_updates: List[RoomUpdate] 
+    # The version the client edited; located by client_last_modified_at if omitted
+    base_version_id: Optional[uuid.UUID] = None
+
+class RoomOperation(BaseModel):
+    """
+    One room-level change. "add" needs name, capacity, x_coord and y_coord
+    (room_id is optional); "update" needs room_id and the fields to change;
+    "delete" needs only room_id.
+    """
+    op: Literal["add", "update", "delete"]
+    room_id: Optional[uuid.UUID] = None
+    name: Optional[str] = None
+    capacity: Optional[str] = None
+    features: Optional[List[str]] = None
+    x_coord: Optional[float] = None
+    y_coord: Optional[float] = None
+    width: Optional[float] = None
+    height: Optional[float] = None
+
+class RoomPatchPayload(BaseModel):
+    """Explicit room operations for PATCH /floorplans/{id}/rooms."""
+    client_last_modified_at: datetime
+    base_version_id: Optional[uuid.UUID] = None
+    operations: List[RoomOperation]
+
+class RoomPatchResult(BaseModel):
+    """The new version and the rooms it touched, without the rest of the plan."""
+    floor_plan_id: uuid.UUID
+    # The unchanged head when the operations changed nothing
+    version_id: Optional[uuid.UUID]
+    last_modified_at: datetime
+    added: List[RoomResponse]
+    updated: List[RoomResponse]
+    deleted: List[uuid.UUID]
+
+class SyncOperation(RoomOperation):
+    """A room operation from an offline operation log. Every op names its room_id."""
+    op_id: uuid.UUID
+    seq: int # 1, 2, 3... within the sync session
+
+class SyncChunk(BaseModel):
+    """One chunk of an offline operation log, in order."""
+    session_id: uuid.UUID
+    floor_plan_id: uuid.UUID
+    # When the client last saw the plan, before going offline
+    client_last_modified_at: datetime
+    operations: List[SyncOperation]
+
+class SyncOperationAck(BaseModel):
+    op_id: uuid.UUID
+    seq: int
+    status: Literal["applied", "rejected"]
+    detail: Optional[str] = None
+
+class SyncAck(BaseModel):
+    """Server acknowledgement of a chunk. Resume from last_acked_seq + 1."""
+    session_id: uuid.UUID
+    floor_plan_id: uuid.UUID
+    last_acked_seq: int
+    last_acked_op_id: Optional[uuid.UUID] = None
+    acks: List[SyncOperationAck] = []
+    # The version created by this chunk, if it changed anything
+    version_id: Optional[uuid.UUID] = None
+    last_modified_at: Optional[datetime] = None
+
+class FloorPlanVersionSummary(BaseModel):
+    """Version metadata, without the snapshot."""
+    version_id: uuid.UUID
+    version_number: Optional[int] = None
+    timestamp: datetime
+    committer_id: Optional[uuid.UUID] = None
+
+class FloorPlanVersionPage(BaseModel):
+    """One page of a plan's history, newest first."""
+    versions: List[FloorPlanVersionSummary]
+    # Pass back as `cursor` to get the next (older) page; None on the last page
+    next_cursor: Optional[str] = None
+
+class FloorPlanVersionDetail(FloorPlanVersionSummary):
+    """A single version with its full, reconstructed snapshot."""
+    snapshot: Dict[str, Any]
 
 
 # --- 3. Booking & Recommendation Schemas ---
@@ -138,6 +240,8 @@ class BookingResponse(BookingCreate):
     """Schema for returning a created booking."""
     id: uuid.UUID
     user_id: uuid.UUID
+    # Set when this is an expanded occurrence of a recurring series
+    series_id: Optional[uuid.UUID] = None
     # --- NEW: Eager load room and user details ---
     room: RoomResponse
     user: UserResponse
@@ -145,6 +249,37 @@ class BookingResponse(BookingCreate):
     class Config:
         from_attributes = True
 
+class BookingSeriesCreate(BookingCreate):
+    """Schema for a recurring booking; start/end describe the first occurrence."""
+    recurrence: str # RRULE, e.g. "FREQ=WEEKLY;BYDAY=MO,WE;COUNT=10"
+
+class BookingSeriesResponse(BookingSeriesCreate):
+    """Schema for returning a recurring booking series."""
+    id: uuid.UUID
+    user_id: uuid.UUID
+    series_end: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
+
+class BatchBookingCreate(BaseModel):
+    """Schema for booking many rooms/slots in one request."""
+    bookings: List[BookingCreate]
+    # True: all-or-nothing. False: commit the bookable items, report the rest.
+    atomic: bool = True
+
+class BatchBookingItemResult(BaseModel):
+    """Outcome for one item of a batch, by its position in the request."""
+    index: int
+    status: str # 'created', 'conflict', 'forbidden', 'invalid' or 'skipped'
+    booking_id: Optional[uuid.UUID] = None
+    detail: Optional[str] = None
+
+class BatchBookingResponse(BaseModel):
+    """Schema for returning the result of a batch booking."""
+    results: List[BatchBookingItemResult]
+    bookings: List[BookingResponse]
+
 class RecommendedRoomResponse(RoomResponse):
     """Extends RoomResponse to include the recommendation score."""
     recommendation_score: float = 0.0
@@ -1,6 +1,6 @@
 # FILE: ./backend/models/user.py
 import uuid
-from sqlalchemy import Column, String, TIMESTAMP, Enum, ForeignKey # Add ForeignKey
+from sqlalchemy import Column, String, TIMESTAMP, Enum, ForeignKey, Index # Add ForeignKey
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship # Add relationship
 from models.base import Base
@@ -30,4 +30,30 @@ class User(Base):
     preferences = relationship("UserPreference", back_populates="user")
 
     def __repr__(self):
-        return f"<User(email='{self.email}', role='{self.role}')>"
\ No newline at end of file
+        return f"<User(email='{self.email}', role='{self.role}')>"
+
+
+class RefreshToken(Base):
+    """
+    Single-use refresh tokens (only their SHA-256 is stored). Tokens issued by
+    rotation share the family_id of the login that started the chain; reusing
+    an already-rotated token revokes the whole family.
+    """
+    __tablename__ = "refresh_tokens"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id = Column(UUID(as_uuid=True), ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    family_id = Column(UUID(as_uuid=True), nullable=False)
+    token_hash = Column(String(64), unique=True, nullable=False)
+    created_at = Column(TIMESTAMP, default=datetime.utcnow, nullable=False)
+    expires_at = Column(TIMESTAMP, nullable=False)
+    used_at = Column(TIMESTAMP, nullable=True) # Set when rotated
+    revoked_at = Column(TIMESTAMP, nullable=True)
+
+    __table_args__ = (
+        Index("ix_refresh_tokens_family", "family_id"),
+        Index("ix_refresh_tokens_expires_at", "expires_at"),
+    )
+
+    def __repr__(self):
+        return f"<RefreshToken(user_id='{self.user_id}', family_id='{self.family_id}')>"
@@ -1,17 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from sqlalchemy.orm import Session
-from db.database import get_db
+from db.database import get_db, get_async_db, AnySession
 from models.user import User
 # --- UPDATED: Import UserCreate and UserResponse ---
 from models.schemas import (
     FloorPlanCreate, FloorPlanResponse, AdminUpdatePayload, 
-    BookingResponse, UserCreate, UserResponse 
+    BookingResponse, UserCreate, UserResponse,
+    FloorPlanVersionPage, FloorPlanVersionDetail, RoomPatchPayload, RoomPatchResult,
+    UserImportReport
 )
-from utils.security import get_current_admin_user, get_password_hash # --- UPDATED: Import get_password_hash ---
+from utils.security import get_current_admin_user, get_current_admin_user_async, get_password_hash # --- UPDATED: Import get_password_hash ---
 from controllers import floorplan_service, booking_service 
-from typing import List, Dict 
+from controllers import user_import_service
+from typing import List, Dict, Optional, Literal
+from datetime import datetime
 import uuid
-from models.floorplan import FloorPlanVersion
 
 
 router = APIRouter()
@@ -39,41 +42,41 @@ def upload_floor_plan(
         )
 
 @router.get("/floorplans", response_model=List[FloorPlanResponse])
-def get_all_floor_plans_for_company(
-    db: Session = Depends(get_db),
-    current_admin: User = Depends(get_current_admin_user)
+async def get_all_floor_plans_for_company(
+    db: AnySession = Depends(get_async_db),
+    current_admin: User = Depends(get_current_admin_user_async)
 ):
     """
     Retrieves a list of all floor plans for the admin's company.
     """
-    return floorplan_service.get_all_floor_plans(db, current_admin)
+    return await floorplan_service.get_all_floor_plans_async(db, current_admin)
 
 @router.get("/floorplans/{floor_plan_id}", response_model=FloorPlanResponse)
-def get_floor_plan_by_id(
+async def get_floor_plan_by_id(
     floor_plan_id: uuid.UUID,
-    db: Session = Depends(get_db),
-    current_admin: User = Depends(get_current_admin_user)
+    db: AnySession = Depends(get_async_db),
+    current_admin: User = Depends(get_current_admin_user_async)
 ):
     """
     Retrieves a specific floor plan, if it belongs to the admin's company.
     """
-    fp = floorplan_service.get_floor_plan_by_id(db, floor_plan_id, current_admin)
+    fp = await floorplan_service.get_floor_plan_by_id_async(db, floor_plan_id, current_admin)
     if not fp:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Floor plan not found or you do not have permission.")
     return fp
 
 @router.get("/floorplans/{floor_plan_id}/status", response_model=dict)
-def get_floor_plan_live_status(
+async def get_floor_plan_live_status(
     floor_plan_id: uuid.UUID,
-    db: Session = Depends(get_db),
-    current_admin: User = Depends(get_current_admin_user)
+    db: AnySession = Depends(get_async_db),
+    current_admin: User = Depends(get_current_admin_user_async)
 ):
     """
     Retrieves a floor plan and all its rooms, annotated with
     the current booking status ("Available" or "Booked").
     """
     try:
-        status_data = floorplan_service.get_floor_plan_with_status(db, floor_plan_id, current_admin)
+        status_data = await floorplan_service.get_floor_plan_with_status_async(db, floor_plan_id, current_admin)
         return status_data
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
@@ -103,45 +106,99 @@ def update_floor_plan(
         db.rollback()
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to update: {e}")
 
-@router.get("/floorplans/{floor_plan_id}/versions", response_model=List[dict])
+@router.patch("/floorplans/{floor_plan_id}/rooms", response_model=RoomPatchResult)
+def patch_floor_plan_rooms(
+    floor_plan_id: uuid.UUID,
+    payload: RoomPatchPayload,
+    db: Session = Depends(get_db),
+    current_admin: User = Depends(get_current_admin_user)
+):
+    """
+    Applies explicit add/update/delete operations to individual rooms. Rooms not
+    named in the payload are untouched, so moving one room sends one operation.
+    """
+    try:
+        return floorplan_service.patch_floor_plan_rooms(db, floor_plan_id, payload, current_admin)
+    except ValueError as e:
+        error_detail = str(e)
+        if "Conflict detected" in error_detail:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=error_detail)
+        if error_detail.startswith("Invalid operation"):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=error_detail)
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=error_detail)
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to update rooms: {e}")
+
+@router.get("/floorplans/{floor_plan_id}/versions", response_model=FloorPlanVersionPage)
 def list_floor_plan_versions(
     floor_plan_id: uuid.UUID,
+    limit: int = Query(50, ge=1, le=floorplan_service.VERSION_PAGE_MAX),
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
     current_admin: User = Depends(get_current_admin_user)
 ):
     """
-    Retrieves the historical list of versions for a tenant-owned floor plan.
+    Retrieves one page of a tenant-owned floor plan's history, newest first.
+    Pass `next_cursor` from the response as `cursor` to fetch older versions.
     """
-    fp = floorplan_service.get_floor_plan_by_id(db, floor_plan_id, current_admin)
-    if not fp:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Floor plan not found or you do not have permission.")
+    try:
+        return floorplan_service.list_floor_plan_versions(db, floor_plan_id, current_admin, limit, cursor)
+    except ValueError as e:
+        error_detail = str(e)
+        if error_detail == "Invalid cursor.":
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=error_detail)
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=error_detail)
 
-    versions = db.query(FloorPlanVersion)\
-                 .filter(FloorPlanVersion.floor_plan_id == floor_plan_id)\
-                 .order_by(FloorPlanVersion.timestamp.desc())\
-                 .all()
-                 
-    return [
-        {
-            "version_id": version.id,
-            "timestamp": version.timestamp,
-            "committer_id": version.committer_id,
-        } for version in versions
-    ]
+# Declared before /versions/{version_id} so "diff" is not parsed as a version id
+@router.get("/floorplans/{floor_plan_id}/versions/diff", response_model=dict)
+def diff_floor_plan_versions(
+    floor_plan_id: uuid.UUID,
+    from_version: uuid.UUID = Query(..., alias="from"),
+    to_version: uuid.UUID = Query(..., alias="to"),
+    db: Session = Depends(get_db),
+    current_admin: User = Depends(get_current_admin_user)
+):
+    """
+    Room-level changes between two versions of a tenant-owned floor plan:
+    added, removed, moved, resized, renamed and otherwise updated rooms.
+    """
+    try:
+        return floorplan_service.diff_floor_plan_versions(db, floor_plan_id, from_version, to_version, current_admin)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+
+@router.get("/floorplans/{floor_plan_id}/versions/{version_id}", response_model=FloorPlanVersionDetail)
+def get_floor_plan_version(
+    floor_plan_id: uuid.UUID,
+    version_id: uuid.UUID,
+    db: Session = Depends(get_db),
+    current_admin: User = Depends(get_current_admin_user)
+):
+    """
+    Retrieves a single version of a tenant-owned floor plan, including its snapshot.
+    """
+    try:
+        return floorplan_service.get_floor_plan_version(db, floor_plan_id, version_id, current_admin)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
 
 
 @router.post("/floorplans/{floor_plan_id}/restore", response_model=FloorPlanResponse)
 def restore_floor_plan(
     floor_plan_id: uuid.UUID,
+    at: Optional[datetime] = None,
+    version_id: Optional[uuid.UUID] = None,
     db: Session = Depends(get_db),
     current_admin: User = Depends(get_current_admin_user),
 ):
     """
-    Restore the latest backup snapshot for a floor plan.
+    Restore a backup snapshot for a floor plan: the latest one by default, the
+    newest taken at or before `at`, or the one recorded for `version_id`.
     """
     try:
         restored_plan = floorplan_service.restore_floor_plan_from_backup(
-            db, floor_plan_id, current_admin
+            db, floor_plan_id, current_admin, at=at, version_id=version_id
         )
         return restored_plan
     except ValueError as exc:
@@ -154,14 +211,14 @@ def restore_floor_plan(
         )
 
 @router.get("/bookings", response_model=List[BookingResponse])
-def get_all_bookings_admin(
-    db: Session = Depends(get_db),
-    current_admin: User = Depends(get_current_admin_user)
+async def get_all_bookings_admin(
+    db: AnySession = Depends(get_async_db),
+    current_admin: User = Depends(get_current_admin_user_async)
 ):
     """
     Admin-only endpoint to get all upcoming bookings for their company.
     """
-    return booking_service.get_all_upcoming_bookings(db, current_admin)
+    return await booking_service.get_all_upcoming_bookings_async(db, current_admin)
 
 # --- User Management Endpoints ---
 
@@ -212,4 +269,29 @@ def invite_user(
     db.commit()
     db.refresh(new_user)
     
-    return new_user
\ No newline at end of file
+    return new_user
+
+@router.post("/users/import", response_model=UserImportReport)
+async def import_users(
+    request: Request,
+    format: Optional[Literal["csv", "ndjson"]] = None,
+    db: Session = Depends(get_db),
+    current_admin: User = Depends(get_current_admin_user)
+):
+    """
+    Admin-only bulk onboarding. The request body is a CSV file (header row with
+    email, password and an optional role column) or NDJSON, one user per line;
+    the format comes from `format` or the Content-Type. The body is streamed
+    and committed in batches, and the report lists the outcome of every row.
+    """
+    try:
+        fmt = user_import_service.detect_format(request.headers.get("content-type"), format)
+        return await user_import_service.import_users(db, request.stream(), fmt, current_admin)
+    except ValueError as e:
+        error_detail = str(e)
+        if error_detail.startswith("Invalid upload"):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=error_detail)
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=error_detail)
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to import users: {e}")
@@ -2,16 +2,27 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from db.database import get_db
 from models.user import User
 from models.company import Company # --- NEW: Import Company ---
-from models.schemas import UserCreate, UserResponse, Token, CompanyRegister # --- NEW: Import CompanyRegister ---
-from utils.security import get_password_hash, verify_password, create_access_token
-from datetime import timedelta
-from constants import ACCESS_TOKEN_EXPIRE_MINUTES, ADMIN_ROLE, STANDARD_ROLE
+from models.schemas import UserCreate, UserResponse, Token, CompanyRegister, RefreshRequest # --- NEW: Import CompanyRegister ---
+from utils.security import (
+    get_password_hash, create_token_pair, rotate_refresh_token, revoke_refresh_token
+)
+from utils.password_hashing import password_hasher, PasswordHasherBusy
+from constants import ADMIN_ROLE, STANDARD_ROLE, PASSWORD_HASH_WAIT_SECONDS
 
 router = APIRouter()
 
+
+def _hashing_busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many concurrent logins, please retry.",
+        headers={"Retry-After": str(int(PASSWORD_HASH_WAIT_SECONDS))},
+    )
+
 # --- OLD /register ENDPOINT IS REMOVED ---
 
 # --- NEW: Company Registration Endpoint ---
@@ -41,7 +52,11 @@ def register_company(company_data: CompanyRegister, db: Session = Depends(get_db
     db.flush() # Flush to get the new_company.id
 
     # 3. Create the new User (as Admin for this company)
-    hashed_password = get_password_hash(company_data.password)
+    try:
+        hashed_password = get_password_hash(company_data.password)
+    except PasswordHasherBusy:
+        db.rollback()
+        raise _hashing_busy()
     new_user = User(
         email=company_data.email,
         hashed_password=hashed_password,
@@ -55,32 +70,65 @@ def register_company(company_data: CompanyRegister, db: Session = Depends(get_db
     
     return new_user
 
+def _find_user_by_email(db: Session, email: str):
+    return db.query(User).filter(User.email == email).first()
+
+def _save_rehashed_password(db: Session, user: User, new_hash: str):
+    user.hashed_password = new_hash
+    db.commit()
+
+def _issue_token_pair(db: Session, user: User) -> dict:
+    pair = create_token_pair(db, user)
+    db.commit()
+    return pair
+
 @router.post("/token", response_model=Token)
-def login_for_access_token(
+async def login_for_access_token(
     db: Session = Depends(get_db), form_data: OAuth2PasswordRequestForm = Depends()
 ):
     """
-    Handles user login and returns a JWT access token
-    containing user_id, role, and company_id.
+    Handles user login and returns a short-lived JWT access token (containing
+    user_id, role and company_id) plus a refresh token for /auth/refresh.
+    bcrypt runs in the hashing pool, so this handler is async; database work
+    goes to the threadpool.
     """
     # 1. Find user by email (username)
-    user = db.query(User).filter(User.email == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    user = await run_in_threadpool(_find_user_by_email, db, form_data.username)
+    if user:
+        try:
+            verified, new_hash = await password_hasher.verify_and_update_async(
+                form_data.password, user.hashed_password
+            )
+        except PasswordHasherBusy:
+            raise _hashing_busy()
+    else:
+        verified, new_hash = False, None
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    
-    # 2. Create access token with new, richer payload
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={
-            "user_id": str(user.id), 
-            "role": user.role.value, # Use .value for the enum
-            "company_id": str(user.company_id) # --- NEW: Add company_id ---
-        },
-        expires_delta=access_token_expires,
-    )
-    
-    return {"access_token": access_token, "token_type": "bearer"}
\ No newline at end of file
+
+    # 2. Upgrade the stored hash if BCRYPT_ROUNDS changed since it was made
+    if new_hash:
+        await run_in_threadpool(_save_rehashed_password, db, user, new_hash)
+
+    # 3. Issue the access/refresh token pair
+    return await run_in_threadpool(_issue_token_pair, db, user)
+
+@router.post("/refresh", response_model=Token)
+def refresh_access_token(payload: RefreshRequest, db: Session = Depends(get_db)):
+    """
+    Exchanges a refresh token for a new access/refresh pair. Each refresh
+    token works once; replaying a used one revokes the whole chain.
+    """
+    return rotate_refresh_token(db, payload.refresh_token)
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+def logout(payload: RefreshRequest, db: Session = Depends(get_db)):
+    """
+    Revokes the refresh token's chain. Access tokens already issued stay
+    valid until they expire.
+    """
+    revoke_refresh_token(db, payload.refresh_token)
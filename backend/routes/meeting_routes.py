@@ -1,15 +1,18 @@
 # FILE: ./backend/routes/meeting_routes.py
 from fastapi import APIRouter, Depends, HTTPException, status, Body
 from sqlalchemy.orm import Session
-from db.database import get_db
+from db.database import get_db, get_async_db, AnySession
 from models.user import User
 from models.schemas import (
     BookingCreate, BookingResponse, RoomAvailabilityRequest, 
     RoomRecommendationRequest, RoomResponse, RecommendedRoomResponse,
-    FloorPlanResponse # --- NEW: Import FloorPlanResponse ---
+    FloorPlanResponse, # --- NEW: Import FloorPlanResponse ---
+    BatchBookingCreate, BatchBookingResponse,
+    BookingSeriesCreate, BookingSeriesResponse
 )
-from utils.security import get_current_user # Note: Not admin!
+from utils.security import get_current_user, get_current_user_async # Note: Not admin!
 from controllers import booking_service
+from utils.recurrence import InvalidRecurrence
 from typing import List
 import uuid # --- NEW: Import uuid ---
 
@@ -17,56 +20,56 @@ router = APIRouter()
 
 # --- NEW: User endpoint to get all floor plans ---
 @router.get("/floorplans", response_model=List[FloorPlanResponse])
-def get_all_floor_plans_for_user(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+async def get_all_floor_plans_for_user(
+    db: AnySession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async)
 ):
     """
     Gets a list of all floor plans for the user's company.
     """
-    return booking_service.get_all_floor_plans_for_user(db, current_user)
+    return await booking_service.get_all_floor_plans_for_user_async(db, current_user)
 
 # --- NEW: User endpoint for live status ---
 @router.get("/floorplans/{floor_plan_id}/status", response_model=dict)
-def get_floor_plan_live_status_for_user(
+async def get_floor_plan_live_status_for_user(
     floor_plan_id: uuid.UUID,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AnySession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async)
 ):
     """
     Retrieves a floor plan and all its rooms, annotated with
     the current booking status ("Available" or "Booked").
     """
     try:
-        status_data = booking_service.get_floor_plan_status_for_user(db, floor_plan_id, current_user)
+        status_data = await booking_service.get_floor_plan_status_for_user_async(db, floor_plan_id, current_user)
         return status_data
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
 
 # --- UPDATED: Pass current_user ---
 @router.post("/rooms/available", response_model=List[RoomResponse])
-def get_available_rooms(
+async def get_available_rooms(
     request: RoomAvailabilityRequest, 
-    db: Session = Depends(get_db), 
-    current_user: User = Depends(get_current_user)
+    db: AnySession = Depends(get_async_db), 
+    current_user: User = Depends(get_current_user_async)
 ):
     """
     Finds all rooms *in the user's company* that are available.
     """
-    rooms = booking_service.get_available_rooms(db, request, current_user)
+    rooms = await booking_service.get_available_rooms_async(db, request, current_user)
     return rooms
 
 # --- UPDATED: Pass current_user ---
 @router.post("/rooms/recommend", response_model=List[RecommendedRoomResponse])
-def get_recommended_rooms(
+async def get_recommended_rooms(
     request: RoomRecommendationRequest, 
-    db: Session = Depends(get_db), 
-    current_user: User = Depends(get_current_user)
+    db: AnySession = Depends(get_async_db), 
+    current_user: User = Depends(get_current_user_async)
 ):
     """
     Gets a smart list of available, tenant-owned rooms, ranked by preference.
     """
-    rooms = booking_service.get_recommended_rooms(db, request, current_user)
+    rooms = await booking_service.get_recommended_rooms_async(db, request, current_user)
     if not rooms:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -100,13 +103,73 @@ def book_meeting_room(
             detail=f"An error occurred while booking: {e}"
         )
 
-# --- NEW: "My Bookings" Endpoint ---
-@router.get("/my-bookings", response_model=List[BookingResponse])
-def get_my_upcoming_bookings(
+# --- NEW: Batch booking Endpoint ---
+@router.post("/book/batch", response_model=BatchBookingResponse, status_code=status.HTTP_201_CREATED)
+def book_meeting_rooms_batch(
+    batch: BatchBookingCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Books many rooms/slots in one transaction. Tenancy is enforced.
+    Atomic batches are all-or-nothing; otherwise bookable items are
+    committed and the rest reported per item.
+    """
+    try:
+        results, bookings = booking_service.create_bookings_batch(db, batch, current_user)
+        return {"results": results, "bookings": bookings}
+    except booking_service.BatchBookingConflict as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={
+                "message": str(e),
+                "results": [result.model_dump(mode="json") for result in e.results],
+            }
+        )
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"An error occurred while booking: {e}"
+        )
+
+# --- NEW: Recurring booking Endpoint ---
+@router.post("/book/series", response_model=BookingSeriesResponse, status_code=status.HTTP_201_CREATED)
+def book_meeting_room_series(
+    series_data: BookingSeriesCreate,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
+):
+    """
+    Books a room on a daily or weekly recurrence (RRULE). Tenancy is enforced.
+    """
+    try:
+        return booking_service.create_booking_series(db, series_data, current_user)
+    except InvalidRecurrence as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except ValueError as e:
+        # Catch conflicts or tenancy violations
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"An error occurred while booking: {e}"
+        )
+
+# --- NEW: "My Bookings" Endpoint ---
+@router.get("/my-bookings", response_model=List[BookingResponse])
+async def get_my_upcoming_bookings(
+    db: AnySession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async)
 ):
     """
     Gets a list of the current user's upcoming bookings.
     """
-    return booking_service.get_my_bookings(db, current_user)
\ No newline at end of file
+    return await booking_service.get_my_bookings_async(db, current_user)
\ No newline at end of file
@@ -1,9 +1,10 @@
 # FILE: ./backend/routes/sync_routes.py
+import uuid
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from db.database import get_db
 from models.user import User
-from models.schemas import FloorPlanResponse, AdminUpdatePayload
+from models.schemas import FloorPlanResponse, AdminUpdatePayload, SyncChunk, SyncAck
 from utils.security import get_current_admin_user
 from controllers import floorplan_service
 
@@ -32,4 +33,43 @@ def commit_offline_changes(
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=error_detail)
     except Exception as e:
         db.rollback()
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to sync: {e}")
\ No newline at end of file
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to sync: {e}")
+
+
+@router.post("/operations", response_model=SyncAck)
+def sync_operation_chunk(
+    payload: SyncChunk,
+    db: Session = Depends(get_db),
+    current_admin: User = Depends(get_current_admin_user)
+):
+    """
+    Accepts one chunk of an offline operation log. Each operation is acknowledged
+    as applied or rejected; after a failure, fetch the session and resend from
+    last_acked_seq + 1. Resending acknowledged operations is harmless.
+    """
+    try:
+        return floorplan_service.apply_sync_chunk(db, payload, current_admin)
+    except ValueError as e:
+        error_detail = str(e)
+        if "Conflict detected" in error_detail or error_detail.startswith("Out of order"):
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=error_detail)
+        if error_detail.startswith("Invalid operation"):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=error_detail)
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=error_detail)
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to sync: {e}")
+
+@router.get("/sessions/{session_id}", response_model=SyncAck)
+def get_sync_session(
+    session_id: uuid.UUID,
+    db: Session = Depends(get_db),
+    current_admin: User = Depends(get_current_admin_user)
+):
+    """
+    Returns how far a sync session got, so the client can resume after last_acked_seq.
+    """
+    try:
+        return floorplan_service.get_sync_session(db, session_id, current_admin)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
@@ -2,10 +2,15 @@
 from celery_config import celery_app # --- FIX: Import from celery_config ---
 from db.database import SessionLocal
 from models.booking import Booking
-from models.user import User
+from models.user import User, RefreshToken
+from models.floorplan import SyncSession
+from constants import SYNC_SESSION_RETENTION_DAYS
+from sqlalchemy import or_
 from sqlalchemy.orm import joinedload
+from utils.version_history import compact_history
 import uuid
 import time
+from datetime import datetime, timedelta
 
 @celery_app.task(name="tasks.send_booking_confirmation")
 def send_booking_confirmation(booking_id: str):
@@ -38,4 +43,89 @@ def send_booking_confirmation(booking_id: str):
     except Exception as e:
         print(f"[TASK ERROR] Error processing booking {booking_id}: {e}")
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+@celery_app.task(name="tasks.send_batch_booking_confirmation")
+def send_batch_booking_confirmation(booking_ids: list[str]):
+    """
+    Batch variant of send_booking_confirmation: one task and one query per batch.
+    """
+    db = SessionLocal()
+    try:
+        bookings = db.query(Booking).options(
+            joinedload(Booking.user),
+            joinedload(Booking.room)
+        ).filter(Booking.id.in_([uuid.UUID(booking_id) for booking_id in booking_ids])).all()
+
+        if not bookings:
+            print(f"[TASK FAILED] None of {len(booking_ids)} batch bookings were found.")
+            return
+
+        print(f"[TASK STARTED] Simulating sending {len(bookings)} booking emails...")
+
+        # Simulate one slow call to a bulk email API
+        time.sleep(5)
+
+        print(f"[TASK COMPLETE] Emails sent for {len(bookings)} bookings.")
+        return f"Emails sent for {len(bookings)} bookings"
+
+    except Exception as e:
+        print(f"[TASK ERROR] Error processing batch of {len(booking_ids)} bookings: {e}")
+    finally:
+        db.close()
+
+@celery_app.task(name="tasks.compact_floor_plan_versions")
+def compact_floor_plan_versions():
+    """
+    Folds floor plan version patches older than the retention window into keyframes.
+    Scheduled daily by Celery beat (see celery_config.py).
+    """
+    db = SessionLocal()
+    try:
+        removed = compact_history(db)
+        print(f"[TASK COMPLETE] Compacted floor plan history; removed {removed} versions.")
+        return removed
+    except Exception as e:
+        print(f"[TASK ERROR] Error compacting floor plan history: {e}")
+    finally:
+        db.close()
+
+@celery_app.task(name="tasks.prune_sync_sessions")
+def prune_sync_sessions():
+    """
+    Deletes offline sync sessions idle for longer than SYNC_SESSION_RETENTION_DAYS.
+    Scheduled daily by Celery beat (see celery_config.py).
+    """
+    db = SessionLocal()
+    try:
+        cutoff = datetime.utcnow() - timedelta(days=SYNC_SESSION_RETENTION_DAYS)
+        removed = db.query(SyncSession).filter(
+            SyncSession.updated_at < cutoff
+        ).delete(synchronize_session=False)
+        db.commit()
+        print(f"[TASK COMPLETE] Removed {removed} idle sync sessions.")
+        return removed
+    except Exception as e:
+        print(f"[TASK ERROR] Error pruning sync sessions: {e}")
+    finally:
+        db.close()
+
+@celery_app.task(name="tasks.prune_refresh_tokens")
+def prune_refresh_tokens():
+    """
+    Deletes expired and revoked refresh tokens; either kind is already refused
+    by /auth/refresh. Scheduled daily by Celery beat (see celery_config.py).
+    """
+    db = SessionLocal()
+    try:
+        removed = db.query(RefreshToken).filter(or_(
+            RefreshToken.expires_at < datetime.utcnow(),
+            RefreshToken.revoked_at.isnot(None)
+        )).delete(synchronize_session=False)
+        db.commit()
+        print(f"[TASK COMPLETE] Removed {removed} stale refresh tokens.")
+        return removed
+    except Exception as e:
+        print(f"[TASK ERROR] Error pruning refresh tokens: {e}")
+    finally:
+        db.close()
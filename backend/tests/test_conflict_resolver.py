@@ -0,0 +1,119 @@
+from utils.conflict_resolver import merge_rooms
+
+
+def room(**values):
+    base = {"name": "Room", "capacity": "4", "features": [], "x_coord": 0.0, "y_coord": 0.0, "width": 10.0, "height": 10.0}
+    return {**base, **values}
+
+
+def test_untouched_by_client_keeps_server_changes():
+    base = {"r1": room()}
+    head = {"r1": room(name="Server")}
+    client = {"r1": room()}
+    assert merge_rooms(base, head, client, client_wins=False) == ([], 0, 0)
+
+
+def test_client_only_edit_is_applied():
+    base = {"r1": room()}
+    head = {"r1": room()}
+    client = {"r1": room(name="Client")}
+    assert merge_rooms(base, head, client, client_wins=False) == (
+        [{"op": "update", "room_id": "r1", "name": "Client"}], 0, 0
+    )
+
+
+def test_disjoint_field_edits_merge_without_overlap():
+    base = {"r1": room()}
+    head = {"r1": room(name="Server")}
+    client = {"r1": room(name="Server", capacity="8")}
+    assert merge_rooms(base, head, client, client_wins=False) == (
+        [{"op": "update", "room_id": "r1", "capacity": "8"}], 0, 0
+    )
+
+
+def test_same_value_on_both_sides_is_not_an_overlap():
+    base = {"r1": room()}
+    head = {"r1": room(name="Same")}
+    client = {"r1": room(name="Same")}
+    assert merge_rooms(base, head, client, client_wins=False) == ([], 0, 0)
+
+
+def test_field_overlap_client_wins():
+    base = {"r1": room()}
+    head = {"r1": room(name="Server")}
+    client = {"r1": room(name="Client")}
+    assert merge_rooms(base, head, client, client_wins=True) == (
+        [{"op": "update", "room_id": "r1", "name": "Client"}], 1, 0
+    )
+
+
+def test_field_overlap_head_wins():
+    base = {"r1": room()}
+    head = {"r1": room(name="Server", x_coord=5.0)}
+    client = {"r1": room(name="Client", capacity="8")}
+    assert merge_rooms(base, head, client, client_wins=False) == (
+        [{"op": "update", "room_id": "r1", "capacity": "8"}], 1, 1
+    )
+
+
+def test_client_delete_of_unchanged_room():
+    base = {"r1": room()}
+    head = {"r1": room()}
+    assert merge_rooms(base, head, {}, client_wins=False) == (
+        [{"op": "delete", "room_id": "r1"}], 0, 0
+    )
+
+
+def test_client_delete_of_room_already_deleted_on_server():
+    base = {"r1": room()}
+    assert merge_rooms(base, {}, {}, client_wins=False) == ([], 0, 0)
+
+
+def test_client_delete_against_server_edit_client_wins():
+    base = {"r1": room()}
+    head = {"r1": room(name="Server")}
+    assert merge_rooms(base, head, {}, client_wins=True) == (
+        [{"op": "delete", "room_id": "r1"}], 1, 0
+    )
+
+
+def test_client_delete_against_server_edit_head_wins():
+    base = {"r1": room()}
+    head = {"r1": room(name="Server")}
+    assert merge_rooms(base, head, {}, client_wins=False) == ([], 1, 1)
+
+
+def test_client_add_is_applied():
+    client = {"r2": {"id": "r2", **room(name="New")}}
+    assert merge_rooms({}, {}, client, client_wins=False) == (
+        [{"op": "add", "room_id": "r2", **room(name="New")}], 0, 0
+    )
+
+
+def test_client_edit_against_server_delete_client_wins():
+    base = {"r1": room()}
+    client = {"r1": room(name="Client")}
+    assert merge_rooms(base, {}, client, client_wins=True) == (
+        [{"op": "add", "room_id": "r1", **room(name="Client")}], 1, 0
+    )
+
+
+def test_client_edit_against_server_delete_head_wins():
+    base = {"r1": room()}
+    client = {"r1": room(name="Client")}
+    assert merge_rooms(base, {}, client, client_wins=False) == ([], 1, 1)
+
+
+def test_room_added_on_server_is_kept_when_client_omits_it():
+    head = {"r1": room(), "r2": room(name="Server")}
+    base = {"r1": room()}
+    client = {"r1": room()}
+    assert merge_rooms(base, head, client, client_wins=True) == ([], 0, 0)
+
+
+def test_client_edit_of_room_missing_from_base_diffs_against_head():
+    head = {"r2": room(name="Server")}
+    client = {"r2": room(name="Server", capacity="8")}
+    assert merge_rooms({}, head, client, client_wins=False) == (
+        [{"op": "update", "room_id": "r2", "capacity": "8"}], 0, 0
+    )
@@ -0,0 +1,128 @@
+import uuid
+
+import pytest
+
+from controllers.floorplan_service import ROOM_FIELDS, _apply_operations_to_rooms, _fold_operations
+from models.schemas import RoomOperation, SyncOperation
+
+NEW_ROOM = {"name": "New", "capacity": "4", "x_coord": 1.0, "y_coord": 2.0}
+
+
+def room(**values):
+    base = {"name": "Room", "capacity": "4", "features": [], "x_coord": 0.0, "y_coord": 0.0, "width": 10.0, "height": 10.0}
+    return {**base, **values}
+
+
+def sync_op(seq, op, room_id, **fields):
+    return SyncOperation(op_id=uuid.uuid4(), seq=seq, op=op, room_id=room_id, **fields)
+
+
+def folded(operations):
+    return [operation.model_dump(exclude_unset=True) for operation in _fold_operations(operations)]
+
+
+# --- _fold_operations ---
+
+def test_fold_keeps_single_operations():
+    room_id = uuid.uuid4()
+    assert folded([sync_op(1, "update", room_id, name="A")]) == [
+        {"op": "update", "room_id": room_id, "name": "A"}
+    ]
+
+
+def test_fold_merges_updates_later_fields_win():
+    room_id = uuid.uuid4()
+    operations = [
+        sync_op(1, "update", room_id, name="A", capacity="2"),
+        sync_op(2, "update", room_id, name="B"),
+    ]
+    assert folded(operations) == [{"op": "update", "room_id": room_id, "name": "B", "capacity": "2"}]
+
+
+def test_fold_add_then_update_is_an_add():
+    room_id = uuid.uuid4()
+    operations = [sync_op(1, "add", room_id, **NEW_ROOM), sync_op(2, "update", room_id, name="Renamed")]
+    assert folded(operations) == [{"op": "add", "room_id": room_id, **NEW_ROOM, "name": "Renamed"}]
+
+
+def test_fold_update_then_delete_is_a_delete():
+    room_id = uuid.uuid4()
+    operations = [sync_op(1, "update", room_id, name="A"), sync_op(2, "delete", room_id)]
+    assert folded(operations) == [{"op": "delete", "room_id": room_id}]
+
+
+def test_fold_add_then_delete_is_nothing():
+    room_id = uuid.uuid4()
+    operations = [sync_op(1, "add", room_id, **NEW_ROOM), sync_op(2, "delete", room_id)]
+    assert folded(operations) == []
+
+
+def test_fold_delete_then_add_replaces_all_values():
+    room_id = uuid.uuid4()
+    operations = [sync_op(1, "delete", room_id), sync_op(2, "add", room_id, **NEW_ROOM)]
+    [operation] = folded(operations)
+    assert operation["op"] == "update"
+    assert set(operation) == {"op", "room_id", *ROOM_FIELDS}
+    assert {field: operation[field] for field in NEW_ROOM} == NEW_ROOM
+
+
+def test_fold_keeps_rooms_apart():
+    first, second = uuid.uuid4(), uuid.uuid4()
+    operations = [sync_op(1, "update", first, name="A"), sync_op(2, "delete", second)]
+    assert folded(operations) == [
+        {"op": "update", "room_id": first, "name": "A"},
+        {"op": "delete", "room_id": second},
+    ]
+
+
+# --- _apply_operations_to_rooms ---
+
+def test_apply_update_and_delete_on_base():
+    kept, removed = uuid.uuid4(), uuid.uuid4()
+    base = {str(kept): room(), str(removed): room()}
+    operations = [
+        RoomOperation(op="update", room_id=kept, capacity="8"),
+        RoomOperation(op="delete", room_id=removed),
+    ]
+    assert _apply_operations_to_rooms(base, dict(base), operations) == {str(kept): room(capacity="8")}
+
+
+def test_apply_add_fills_column_defaults():
+    room_id = uuid.uuid4()
+    rooms = _apply_operations_to_rooms({}, {}, [RoomOperation(op="add", room_id=room_id, **NEW_ROOM)])
+    assert set(rooms[str(room_id)]) == set(ROOM_FIELDS)
+    assert {field: rooms[str(room_id)][field] for field in NEW_ROOM} == NEW_ROOM
+
+
+def test_apply_add_without_id_assigns_one():
+    operation = RoomOperation(op="add", **NEW_ROOM)
+    rooms = _apply_operations_to_rooms({}, {}, [operation])
+    assert operation.room_id is not None
+    assert list(rooms) == [str(operation.room_id)]
+
+
+def test_apply_edit_of_room_added_on_server_joins_the_base():
+    room_id = uuid.uuid4()
+    base, head = {}, {str(room_id): room(name="Server")}
+    rooms = _apply_operations_to_rooms(base, head, [RoomOperation(op="update", room_id=room_id, capacity="8")])
+    assert base == {str(room_id): room(name="Server")}
+    assert rooms == {str(room_id): room(name="Server", capacity="8")}
+
+
+def test_apply_rejects_unknown_room():
+    with pytest.raises(ValueError, match="not found"):
+        _apply_operations_to_rooms({}, {}, [RoomOperation(op="update", room_id=uuid.uuid4(), name="A")])
+
+
+def test_apply_rejects_add_of_existing_room():
+    room_id = uuid.uuid4()
+    base = {str(room_id): room()}
+    with pytest.raises(ValueError, match="already exists"):
+        _apply_operations_to_rooms(base, dict(base), [RoomOperation(op="add", room_id=room_id, **NEW_ROOM)])
+
+
+def test_apply_rejects_nulled_required_field():
+    room_id = uuid.uuid4()
+    base = {str(room_id): room()}
+    with pytest.raises(ValueError, match="cannot be null"):
+        _apply_operations_to_rooms(base, dict(base), [RoomOperation(op="update", room_id=room_id, name=None)])
@@ -0,0 +1,449 @@
+import bisect
+import json
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from db.database import DbRunner
+from db.redis_conn import redis_conn
+from models.booking import Booking, BookingSeries
+from models.floorplan import FloorPlan, Room
+from models.schemas import RoomResponse
+from utils.recurrence import expand, query_series_in_window
+
+# Redis key holding a per-tenant generation counter. Every booking write bumps it
+# and stores its bookings under DELTA_KEY for that generation, so engines in other
+# worker processes replay the writes they missed instead of rebuilding.
+GENERATION_KEY = "availability:gen:{company_id}"
+DELTA_KEY = "availability:delta:{company_id}:{generation}"
+# How long a delta stays replayable; a worker further behind than this rebuilds
+DELTA_TTL_SECONDS = 300
+# Beyond this many missed generations a rebuild is cheaper than the replay
+MAX_DELTA_REPLAY = 500
+# Only one worker rebuilds a tenant at a time; the lock expires after this
+BUILD_LOCK_KEY = "availability:build:{company_id}"
+BUILD_LOCK_SECONDS = 30
+
+# Bumps the generation and stores the delta for it atomically, so a generation
+# without a delta always means "rebuild" (an invalidation or an expired delta).
+# KEYS[1] is the generation key; ARGV is (delta key prefix, payload, ttl).
+RECORD_DELTA_LUA = """
+local generation = redis.call('INCR', KEYS[1])
+redis.call('SET', ARGV[1] .. generation, ARGV[2], 'EX', ARGV[3])
+return generation
+"""
+_record_delta_script = redis_conn.register_script(RECORD_DELTA_LUA) if redis_conn else None
+
+# Without Redis we cannot see writes made by other workers, so cap the index age.
+LOCAL_MAX_AGE_SECONDS = 30
+
+
+def to_naive_utc(value: datetime) -> datetime:
+    """
+    Normalise a datetime to the timezone-naive UTC form stored in the database.
+    """
+    if value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _encode_delta(bookings: List[Tuple[uuid.UUID, datetime, datetime, uuid.UUID]]) -> str:
+    return json.dumps([
+        [str(room_id), to_naive_utc(start).isoformat(), to_naive_utc(end).isoformat(), str(booking_id)]
+        for room_id, start, end, booking_id in bookings
+    ])
+
+
+def _decode_delta(payload: str) -> List[Tuple[uuid.UUID, datetime, datetime, uuid.UUID]]:
+    return [
+        (uuid.UUID(room_id), datetime.fromisoformat(start), datetime.fromisoformat(end), uuid.UUID(booking_id))
+        for room_id, start, end, booking_id in json.loads(payload)
+    ]
+
+
+def _parse_capacity(capacity: str) -> Optional[int]:
+    try:
+        return int(capacity)
+    except (TypeError, ValueError):
+        return None
+
+
+class RoomIntervalIndex:
+    """
+    Bookings of a single room, ordered by start time.
+
+    `_max_ends[i]` is the latest end time among the first i+1 intervals, which
+    turns "does anything overlap [start, end)?" into one bisect and one lookup.
+    """
+
+    def __init__(self) -> None:
+        self._starts: List[datetime] = []
+        self._ends: List[datetime] = []
+        self._ids: List[uuid.UUID] = []
+        self._max_ends: List[datetime] = []
+
+    def __len__(self) -> int:
+        return len(self._starts)
+
+    def add(self, start: datetime, end: datetime, booking_id: uuid.UUID) -> None:
+        position = bisect.bisect_right(self._starts, start)
+        self._starts.insert(position, start)
+        self._ends.insert(position, end)
+        self._ids.insert(position, booking_id)
+        self._max_ends.insert(position, end)
+        self._refresh_max_ends(position)
+
+    def remove(self, booking_id: uuid.UUID) -> bool:
+        try:
+            position = self._ids.index(booking_id)
+        except ValueError:
+            return False
+        del self._starts[position]
+        del self._ends[position]
+        del self._ids[position]
+        del self._max_ends[position]
+        self._refresh_max_ends(position)
+        return True
+
+    def overlaps(self, start: datetime, end: datetime) -> bool:
+        """True if any booking satisfies booking.start < end and booking.end > start."""
+        candidates = bisect.bisect_left(self._starts, end)
+        if candidates == 0:
+            return False
+        return self._max_ends[candidates - 1] > start
+
+    def _refresh_max_ends(self, position: int) -> None:
+        running = self._max_ends[position - 1] if position > 0 else None
+        for i in range(position, len(self._ends)):
+            running = self._ends[i] if running is None or self._ends[i] > running else running
+            self._max_ends[i] = running
+
+
+@dataclass(frozen=True)
+class SeriesSpec:
+    """The parts of a BookingSeries needed to expand it, detached from the session."""
+    id: uuid.UUID
+    start_time: datetime
+    end_time: datetime
+    recurrence: str
+
+
+@dataclass
+class TenantAvailability:
+    """In-memory availability state for one company."""
+    company_id: uuid.UUID
+    horizon: datetime
+    built_at: float
+    generation: Optional[int]
+    rooms: Dict[uuid.UUID, RoomResponse] = field(default_factory=dict)
+    # (capacity, room_id) pairs sorted ascending so min_capacity is a bisect.
+    by_capacity: List[Tuple[int, uuid.UUID]] = field(default_factory=list)
+    intervals: Dict[uuid.UUID, RoomIntervalIndex] = field(default_factory=dict)
+    # Recurring series are expanded only inside each queried window.
+    series: Dict[uuid.UUID, List[SeriesSpec]] = field(default_factory=dict)
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+def _load_tenant(db: Session, company_id: uuid.UUID, horizon: datetime):
+    """
+    The tenant's rooms with a numeric capacity, plus their bookings and
+    recurring series ending after `horizon`. Database work only.
+    """
+    rooms = [
+        room for room in db.query(Room).join(
+            FloorPlan, Room.floor_plan_id == FloorPlan.id
+        ).filter(
+            FloorPlan.company_id == company_id
+        ).all()
+        if _parse_capacity(room.capacity) is not None
+    ]
+    if not rooms:
+        return rooms, [], []
+
+    room_ids = [room.id for room in rooms]
+    bookings = db.query(
+        Booking.id, Booking.room_id, Booking.start_time, Booking.end_time
+    ).filter(
+        Booking.room_id.in_(room_ids),
+        Booking.end_time > horizon,
+    ).order_by(Booking.start_time.asc()).all()
+    series = query_series_in_window(db, horizon, None, BookingSeries.room_id.in_(room_ids))
+    return rooms, bookings, series
+
+
+class AvailabilityEngine:
+    """
+    Per-tenant availability index answering room searches without scanning bookings.
+
+    Each tenant is loaded lazily from the database on first use and kept current
+    by the booking write path: writes in this worker are applied directly, writes
+    in other workers are replayed from their Redis deltas. A tenant is rebuilt
+    only when a generation has no delta, and only by one caller at a time.
+
+    Queries return None, so the caller can fall back to SQL, when they reach
+    before the index horizon (its build time) or while a rebuild is in flight.
+    """
+
+    def __init__(self) -> None:
+        self._tenants: Dict[uuid.UUID, TenantAvailability] = {}
+        self._build_locks: Dict[uuid.UUID, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    # --- Reads ---
+
+    def find_available_rooms(
+        self,
+        run: DbRunner,
+        company_id: uuid.UUID,
+        start_time: datetime,
+        end_time: datetime,
+        min_capacity: int,
+    ) -> Optional[List[RoomResponse]]:
+        start = to_naive_utc(start_time)
+        end = to_naive_utc(end_time)
+        tenant = self._get_tenant(run, company_id)
+        if tenant is None or start < tenant.horizon:
+            return None
+
+        with tenant.lock:
+            first = bisect.bisect_left(tenant.by_capacity, (min_capacity,))
+            available = []
+            for _, room_id in tenant.by_capacity[first:]:
+                index = tenant.intervals.get(room_id)
+                if index is not None and index.overlaps(start, end):
+                    continue
+                if any(expand(spec, start, end) for spec in tenant.series.get(room_id, ())):
+                    continue
+                available.append(tenant.rooms[room_id])
+        return available
+
+    # --- Writes ---
+
+    def record_booking(
+        self,
+        company_id: uuid.UUID,
+        room_id: uuid.UUID,
+        start_time: datetime,
+        end_time: datetime,
+        booking_id: uuid.UUID,
+    ) -> None:
+        """Apply a committed booking to the local index and announce it to other workers."""
+        self.record_bookings(company_id, [(room_id, start_time, end_time, booking_id)])
+
+    def record_bookings(
+        self,
+        company_id: uuid.UUID,
+        bookings: List[Tuple[uuid.UUID, datetime, datetime, uuid.UUID]],
+    ) -> None:
+        """
+        Apply committed (room_id, start, end, booking_id) tuples; one generation bump
+        and one delta cover the whole set.
+        """
+        generation = self._publish_delta(company_id, bookings)
+        tenant = self._tenants.get(company_id)
+        if tenant is None:
+            return
+
+        with tenant.lock:
+            if generation is not None and tenant.generation is not None:
+                # Replay whatever other workers wrote since our last sync first.
+                if not self._replay(tenant, generation - 1):
+                    self._discard(tenant)
+                    return
+            self._apply(tenant, bookings)
+            tenant.generation = generation
+
+    def invalidate(self, company_id: uuid.UUID, announce: bool = True) -> None:
+        """
+        Drop a tenant's index (e.g. after its rooms or recurring series changed);
+        it is rebuilt on next use.
+        """
+        if announce:
+            # A generation with no delta makes every other worker rebuild.
+            self._bump_generation(company_id)
+        with self._lock:
+            self._tenants.pop(company_id, None)
+
+    # --- Internals ---
+
+    def _get_tenant(self, run: DbRunner, company_id: uuid.UUID) -> Optional[TenantAvailability]:
+        """
+        The tenant's current index, or None while another caller rebuilds it.
+        """
+        tenant = self._tenants.get(company_id)
+        if tenant is not None and self._sync(tenant):
+            return tenant
+
+        with self._lock:
+            build_lock = self._build_locks.setdefault(company_id, threading.Lock())
+        if not build_lock.acquire(blocking=False):
+            return None
+        try:
+            # The caller we raced may have finished the rebuild already.
+            tenant = self._tenants.get(company_id)
+            if tenant is not None and self._sync(tenant):
+                return tenant
+            return self._build_once(run, company_id)
+        finally:
+            build_lock.release()
+
+    def _build_once(self, run: DbRunner, company_id: uuid.UUID) -> Optional[TenantAvailability]:
+        """Rebuilds the tenant unless another worker is already rebuilding it."""
+        lock = None
+        if redis_conn:
+            lock = redis_conn.lock(
+                BUILD_LOCK_KEY.format(company_id=company_id), timeout=BUILD_LOCK_SECONDS, blocking=False
+            )
+            try:
+                if not lock.acquire():
+                    return None
+            except Exception as e:
+                print(f"Error acquiring availability build lock for {company_id}: {e}")
+                lock = None
+
+        try:
+            tenant = self._build(run, company_id)
+        finally:
+            if lock is not None:
+                try:
+                    lock.release()
+                except Exception:
+                    pass # Lock expired mid-build; another worker may already own it
+        with self._lock:
+            self._tenants[company_id] = tenant
+        return tenant
+
+    def _sync(self, tenant: TenantAvailability) -> bool:
+        """
+        Brings the tenant up to the current generation by replaying deltas.
+        False means it cannot be caught up and has been discarded.
+        """
+        if redis_conn is None or tenant.generation is None:
+            if time.monotonic() - tenant.built_at <= LOCAL_MAX_AGE_SECONDS:
+                return True
+            self._discard(tenant)
+            return False
+
+        generation = self._read_generation(tenant.company_id)
+        if generation == tenant.generation:
+            return True
+        with tenant.lock:
+            if generation is not None and self._replay(tenant, generation):
+                return True
+            self._discard(tenant)
+            return False
+
+    def _replay(self, tenant: TenantAvailability, generation: int) -> bool:
+        """
+        Applies other workers' deltas up to `generation`; caller holds tenant.lock.
+        False on a gap: an invalidation, an expired delta or too long a backlog.
+        """
+        missed = range(tenant.generation + 1, generation + 1)
+        if not missed:
+            return generation == tenant.generation
+        if len(missed) > MAX_DELTA_REPLAY:
+            return False
+        try:
+            payloads = redis_conn.mget([
+                DELTA_KEY.format(company_id=tenant.company_id, generation=g) for g in missed
+            ])
+        except Exception as e:
+            print(f"Error reading availability deltas for {tenant.company_id}: {e}")
+            return False
+        if any(payload is None for payload in payloads):
+            return False
+        for payload in payloads:
+            self._apply(tenant, _decode_delta(payload))
+        tenant.generation = generation
+        return True
+
+    def _apply(self, tenant: TenantAvailability, bookings: List[Tuple[uuid.UUID, datetime, datetime, uuid.UUID]]) -> None:
+        for room_id, start_time, end_time, booking_id in bookings:
+            if room_id in tenant.rooms:
+                tenant.intervals.setdefault(room_id, RoomIntervalIndex()).add(
+                    to_naive_utc(start_time), to_naive_utc(end_time), booking_id
+                )
+
+    def _discard(self, tenant: TenantAvailability) -> None:
+        # Only drop this copy; a fresher one may already have replaced it.
+        with self._lock:
+            if self._tenants.get(tenant.company_id) is tenant:
+                del self._tenants[tenant.company_id]
+
+    def _build(self, run: DbRunner, company_id: uuid.UUID) -> TenantAvailability:
+        # Read the generation first so a write racing the load makes us rebuild again.
+        generation = self._read_generation(company_id)
+        horizon = datetime.utcnow()
+        tenant = TenantAvailability(
+            company_id=company_id,
+            horizon=horizon,
+            built_at=time.monotonic(),
+            generation=generation,
+        )
+
+        rooms, bookings, series_list = run(_load_tenant, company_id, horizon)
+        for room in rooms:
+            tenant.rooms[room.id] = RoomResponse.model_validate(room)
+            tenant.by_capacity.append((_parse_capacity(room.capacity), room.id))
+        tenant.by_capacity.sort()
+
+        for booking_id, room_id, start, end in bookings:
+            tenant.intervals.setdefault(room_id, RoomIntervalIndex()).add(start, end, booking_id)
+
+        for series in series_list:
+            tenant.series.setdefault(series.room_id, []).append(SeriesSpec(
+                id=series.id,
+                start_time=series.start_time,
+                end_time=series.end_time,
+                recurrence=series.recurrence,
+            ))
+
+        return tenant
+
+    def _read_generation(self, company_id: uuid.UUID) -> Optional[int]:
+        if not redis_conn:
+            return None
+        try:
+            value = redis_conn.get(GENERATION_KEY.format(company_id=company_id))
+            return int(value) if value is not None else 0
+        except Exception as e:
+            print(f"Error reading availability generation for {company_id}: {e}")
+            return None
+
+    def _publish_delta(
+        self,
+        company_id: uuid.UUID,
+        bookings: List[Tuple[uuid.UUID, datetime, datetime, uuid.UUID]],
+    ) -> Optional[int]:
+        if not _record_delta_script:
+            return None
+        try:
+            return int(_record_delta_script(
+                keys=[GENERATION_KEY.format(company_id=company_id)],
+                args=[
+                    DELTA_KEY.format(company_id=company_id, generation=""),
+                    _encode_delta(bookings),
+                    DELTA_TTL_SECONDS,
+                ],
+            ))
+        except Exception as e:
+            print(f"Error publishing availability delta for {company_id}: {e}")
+            return None
+
+    def _bump_generation(self, company_id: uuid.UUID) -> Optional[int]:
+        if not redis_conn:
+            return None
+        try:
+            return int(redis_conn.incr(GENERATION_KEY.format(company_id=company_id)))
+        except Exception as e:
+            print(f"Error bumping availability generation for {company_id}: {e}")
+            return None
+
+
+# Create a single global instance
+availability_engine = AvailabilityEngine()
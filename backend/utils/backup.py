@@ -1,11 +1,69 @@
+import gzip
+import hashlib
 import json
 import os
-from datetime import datetime
+import queue
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Any, Optional
+from typing import Any, Callable, Iterator, List, Optional, Union
+
+from constants import (
+    BACKUP_KEEP_ALL_HOURS, BACKUP_HOURLY_DAYS, BACKUP_DAILY_DAYS, BACKUP_WEEKLY_WEEKS,
+    BACKUP_PRUNE_INTERVAL_SECONDS,
+)
+
+try:
+    import zstandard
+except ImportError: # Snapshots fall back to gzip
+    zstandard = None
+
+try:
+    import fcntl
+except ImportError: # Not available on Windows; one writer per host is assumed there
+    fcntl = None
 
 BACKUP_ROOT = Path(__file__).resolve().parent.parent / "backups"
 
+# Layout of BACKUP_ROOT/<floor_plan_id>/:
+#   manifest.jsonl                         append-only index, one ManifestEntry per line
+#   <sha256>.json.zst | <sha256>.json.gz   snapshot bodies, stored once per distinct content
+#   <timestamp>.json                       uncompressed snapshots written by older releases
+#   <timestamp>.ref                        pointers to bodies written by older releases
+MANIFEST_NAME = "manifest.jsonl"
+LOCK_NAME = ".manifest.lock"
+REF_SUFFIX = ".ref"
+COMPRESSED_SUFFIXES = (".json.zst", ".json.gz")
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S.%f"
+
+# Snapshots waiting beyond this are dropped (and logged) rather than blocking requests
+BACKUP_QUEUE_SIZE = 1000
+
+
+@dataclass
+class ManifestEntry:
+    """One backup of a floor plan."""
+    timestamp: datetime
+    hash: str
+    size: int
+    file: str
+    version_id: Optional[str] = None
+
+    def to_line(self) -> str:
+        data = asdict(self)
+        data["timestamp"] = self.timestamp.strftime(TIMESTAMP_FORMAT)
+        return json.dumps(data, separators=(",", ":")) + "\n"
+
+    @classmethod
+    def from_line(cls, line: str) -> "ManifestEntry":
+        data = json.loads(line)
+        data["timestamp"] = datetime.strptime(data["timestamp"], TIMESTAMP_FORMAT)
+        return cls(**data)
+
 
 def _ensure_directory(path: Path) -> None:
     """
@@ -14,48 +72,393 @@ def _ensure_directory(path: Path) -> None:
     path.mkdir(parents=True, exist_ok=True)
 
 
-def write_snapshot(floor_plan_id: str, snapshot: dict) -> Optional[Path]:
+def _atomic_write(path: Path, data: bytes) -> None:
+    """
+    Write to a temporary file in the same directory and rename it into place,
+    so readers never see a partially written file.
+    """
+    fd, temp_path = tempfile.mkstemp(dir=path.parent, prefix=".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as temp_file:
+            temp_file.write(data)
+            temp_file.flush()
+            os.fsync(temp_file.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+@contextmanager
+def _manifest_lock(directory: Path) -> Iterator[None]:
+    """Serialises manifest appends and rewrites across worker processes."""
+    if fcntl is None:
+        yield
+        return
+    with open(directory / LOCK_NAME, "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _encode(snapshot: dict) -> bytes:
+    # Canonical form, so equal snapshots always hash the same
+    return json.dumps(snapshot, sort_keys=True, separators=(",", ":"), ensure_ascii=True).encode("ascii")
+
+
+def _compress(data: bytes) -> tuple[bytes, str]:
+    if zstandard is not None:
+        return zstandard.ZstdCompressor(level=10).compress(data), ".json.zst"
+    return gzip.compress(data, compresslevel=6, mtime=0), ".json.gz"
+
+
+def _find_object(directory: Path, digest: str) -> Optional[Path]:
+    for suffix in COMPRESSED_SUFFIXES:
+        candidate = directory / f"{digest}{suffix}"
+        if candidate.exists():
+            return candidate
+    return None
+
+
+# --- Manifest ---
+
+def _legacy_timestamp(path: Path) -> datetime:
+    stem = path.name.split(".json")[0].removesuffix(REF_SUFFIX)
+    for pattern in ("%Y%m%dT%H%M%S.%f", "%Y%m%dT%H%M%S"):
+        try:
+            return datetime.strptime(stem, pattern)
+        except ValueError:
+            continue
+    return datetime.utcfromtimestamp(path.stat().st_mtime)
+
+
+def _migrate_legacy_files(directory: Path) -> List[ManifestEntry]:
+    """
+    Index snapshots written before the manifest existed. Runs once per plan,
+    the first time its manifest is needed.
+    """
+    entries = []
+    for path in directory.glob("*.json"):
+        data = path.read_bytes()
+        entries.append(ManifestEntry(
+            timestamp=_legacy_timestamp(path),
+            hash=hashlib.sha256(data).hexdigest(),
+            size=len(data),
+            file=path.name,
+        ))
+    for path in directory.glob(f"*{REF_SUFFIX}"):
+        digest = path.read_text(encoding="ascii").strip()
+        body = _find_object(directory, digest)
+        if body is not None:
+            entries.append(ManifestEntry(
+                timestamp=_legacy_timestamp(path),
+                hash=digest,
+                size=body.stat().st_size,
+                file=body.name,
+            ))
+    entries.sort(key=lambda entry: entry.timestamp)
+    _atomic_write(directory / MANIFEST_NAME, "".join(entry.to_line() for entry in entries).encode("utf-8"))
+    for path in directory.glob(f"*{REF_SUFFIX}"):
+        path.unlink()
+    return entries
+
+
+def _read_manifest(directory: Path, locked: bool = False) -> List[ManifestEntry]:
+    """All entries of a plan's manifest, oldest first. Pass locked=True under _manifest_lock."""
+    manifest_path = directory / MANIFEST_NAME
+    if not manifest_path.exists():
+        if not directory.exists():
+            return []
+        if locked:
+            return _migrate_legacy_files(directory)
+        with _manifest_lock(directory):
+            if not manifest_path.exists():
+                return _migrate_legacy_files(directory)
+
+    entries = []
+    with open(manifest_path, "r", encoding="utf-8") as manifest:
+        for line in manifest:
+            if not line.strip():
+                continue
+            try:
+                entries.append(ManifestEntry.from_line(line))
+            except (ValueError, TypeError, KeyError):
+                # A line cut short by a crash; everything before it is intact
+                print(f"[BACKUP] Skipping unreadable manifest line in {manifest_path}")
+    return entries
+
+
+def _append_to_manifest(directory: Path, entry: ManifestEntry) -> None:
+    # One write() on an O_APPEND descriptor, so concurrent appends never interleave
+    fd = os.open(directory / MANIFEST_NAME, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, entry.to_line().encode("utf-8"))
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def list_snapshots(floor_plan_id: str) -> List[ManifestEntry]:
+    """
+    Returns the manifest entries (sorted newest first) for a floor plan.
+    """
+    entries = _read_manifest(BACKUP_ROOT / floor_plan_id)
+    return sorted(entries, key=lambda entry: entry.timestamp, reverse=True)
+
+
+def find_snapshot(
+    floor_plan_id: str,
+    at: Optional[datetime] = None,
+    version_id: Optional[str] = None,
+) -> Optional[ManifestEntry]:
+    """
+    The newest backup of `version_id`, or the newest taken at or before `at`,
+    or simply the newest backup when neither is given.
+    """
+    for entry in list_snapshots(floor_plan_id):
+        if version_id is not None and entry.version_id != str(version_id):
+            continue
+        if at is not None and entry.timestamp > at:
+            continue
+        return entry
+    return None
+
+
+def read_snapshot(floor_plan_id: str, entry: ManifestEntry) -> dict[str, Any]:
+    """Load the snapshot body behind a manifest entry."""
+    path = BACKUP_ROOT / floor_plan_id / entry.file
+    data = path.read_bytes()
+    if entry.file.endswith(".json.zst"):
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read this snapshot")
+        data = zstandard.ZstdDecompressor().decompress(data)
+    elif entry.file.endswith(".json.gz"):
+        data = gzip.decompress(data)
+    return json.loads(data)
+
+
+def load_snapshot_at(
+    floor_plan_id: str,
+    at: Optional[datetime] = None,
+    version_id: Optional[str] = None,
+) -> Optional[dict[str, Any]]:
+    """
+    Load the snapshot find_snapshot() selects, if one exists.
+    """
+    entry = find_snapshot(floor_plan_id, at=at, version_id=version_id)
+    if entry is None:
+        return None
+    try:
+        return read_snapshot(floor_plan_id, entry)
+    except Exception as exc:  # pragma: no cover - defensive guard
+        print(f"[BACKUP] Failed to read snapshot {entry.file}: {exc}")
+        return None
+
+
+def load_latest_snapshot(floor_plan_id: str) -> Optional[dict[str, Any]]:
+    """
+    Load the most recent snapshot for a floor plan, if one exists.
+    """
+    return load_snapshot_at(floor_plan_id)
+
+
+# --- Writing ---
+
+def write_snapshot(floor_plan_id: str, snapshot: dict, version_id: Optional[str] = None) -> Optional[Path]:
     """
     Persist a snapshot of a floor plan to disk for disaster recovery.
-    Returns the path to the written file on success.
+    Identical content is stored once; a backup repeating the latest one
+    (same content and version) is skipped. Returns the path to the snapshot
+    body on success.
     """
     try:
-        timestamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S")
         directory = BACKUP_ROOT / floor_plan_id
         _ensure_directory(directory)
-        file_path = directory / f"{timestamp}.json"
-        with open(file_path, "w", encoding="utf-8") as backup_file:
-            json.dump(snapshot, backup_file, separators=(",", ":"), ensure_ascii=True)
-        return file_path
+
+        data = _encode(snapshot)
+        digest = hashlib.sha256(data).hexdigest()
+        version_id = str(version_id) if version_id is not None else None
+
+        # Reusing a body and indexing it happen under one lock, so a concurrent
+        # prune cannot delete the body in between
+        with _manifest_lock(directory):
+            entries = _read_manifest(directory, locked=True)
+            latest = max(entries, key=lambda entry: entry.timestamp, default=None)
+            if latest is not None and latest.hash == digest and latest.version_id == version_id:
+                return directory / latest.file
+
+            object_path = _find_object(directory, digest)
+            if object_path is None:
+                compressed, suffix = _compress(data)
+                object_path = directory / f"{digest}{suffix}"
+                _atomic_write(object_path, compressed)
+
+            entry = ManifestEntry(
+                timestamp=datetime.utcnow(),
+                hash=digest,
+                size=object_path.stat().st_size,
+                file=object_path.name,
+                version_id=version_id,
+            )
+            _append_to_manifest(directory, entry)
+        return object_path
     except Exception as exc:  # pragma: no cover - defensive guard
         print(f"[BACKUP] Failed to persist snapshot for {floor_plan_id}: {exc}")
         return None
 
 
-def list_snapshots(floor_plan_id: str) -> list[Path]:
+# --- Retention ---
+
+def _retention_bucket(entry: ManifestEntry, now: datetime) -> Optional[tuple]:
+    """
+    The bucket an entry competes in (only the newest entry of a bucket is kept),
+    or None if it is past retention. Entries young enough to keep outright get
+    a bucket of their own.
+    """
+    age = now - entry.timestamp
+    if age <= timedelta(hours=BACKUP_KEEP_ALL_HOURS):
+        return ("all", entry.timestamp)
+    if age <= timedelta(days=BACKUP_HOURLY_DAYS):
+        return ("hour", entry.timestamp.strftime("%Y%m%d%H"))
+    if age <= timedelta(days=BACKUP_DAILY_DAYS):
+        return ("day", entry.timestamp.date())
+    if age <= timedelta(weeks=BACKUP_WEEKLY_WEEKS):
+        return ("week", tuple(entry.timestamp.isocalendar()[:2]))
+    return None
+
+
+def prune_snapshots(floor_plan_id: str, now: Optional[datetime] = None) -> int:
     """
-    Returns a list of snapshot file paths (sorted newest first) for a floor plan.
+    Thin a plan's backups per the retention policy: rewrite the manifest and
+    delete bodies no remaining entry refers to. The newest backup is always kept.
+    Returns the number of entries removed.
     """
     directory = BACKUP_ROOT / floor_plan_id
     if not directory.exists():
-        return []
-    snapshots = sorted(directory.glob("*.json"), reverse=True)
-    return snapshots
+        return 0
+    now = now or datetime.utcnow()
 
+    with _manifest_lock(directory):
+        entries = sorted(_read_manifest(directory, locked=True), key=lambda entry: entry.timestamp, reverse=True)
+        kept, seen_buckets = [], set()
+        for index, entry in enumerate(entries):
+            bucket = _retention_bucket(entry, now)
+            if index == 0 or (bucket is not None and bucket not in seen_buckets):
+                kept.append(entry)
+            if bucket is not None:
+                seen_buckets.add(bucket)
+        if len(kept) == len(entries):
+            return 0
 
-def load_latest_snapshot(floor_plan_id: str) -> Optional[dict[str, Any]]:
+        kept.reverse()
+        _atomic_write(directory / MANIFEST_NAME, "".join(entry.to_line() for entry in kept).encode("utf-8"))
+
+        referenced = {entry.file for entry in kept}
+        for entry in entries:
+            if entry.file not in referenced:
+                try:
+                    (directory / entry.file).unlink()
+                    referenced.add(entry.file) # Shared bodies are only deleted once
+                except FileNotFoundError:
+                    pass
+    return len(entries) - len(kept)
+
+
+class BackupWriter:
     """
-    Load the most recent snapshot for a floor plan, if one exists.
+    Writes snapshots on a daemon thread so request handlers only enqueue them.
+    Snapshots are written in submission order; retention is applied to each
+    plan at most once per BACKUP_PRUNE_INTERVAL_SECONDS. A snapshot may also be
+    submitted as a callable, which is then built on the writer thread.
     """
-    snapshots = list_snapshots(floor_plan_id)
-    if not snapshots:
-        return None
-    latest_file = snapshots[0]
-    try:
-        with open(latest_file, "r", encoding="utf-8") as backup_file:
-            return json.load(backup_file)
-    except Exception as exc:  # pragma: no cover - defensive guard
-        print(f"[BACKUP] Failed to read snapshot {latest_file}: {exc}")
-        return None
+
+    def __init__(self):
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue(maxsize=BACKUP_QUEUE_SIZE)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._last_pruned: dict[str, float] = {}
+
+    def submit(self, floor_plan_id: str, snapshot: Union[dict, Callable[[], Optional[dict]]], version_id: Optional[str] = None):
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((floor_plan_id, snapshot, version_id))
+        except queue.Full:
+            print(f"[BACKUP] Writer queue full; dropping snapshot for {floor_plan_id}")
+
+    def flush(self):
+        """Blocks until every submitted snapshot has been written."""
+        if self._thread is not None:
+            self._queue.join()
+
+    def stop(self, timeout: float = 10.0):
+        """Writes what is queued and stops the worker thread."""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread:
+            try:
+                self._queue.put(None, timeout=timeout)
+            except queue.Full:
+                return
+            thread.join(timeout)
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="backup-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                floor_plan_id, snapshot, version_id = item
+                if callable(snapshot):
+                    snapshot = self._build(floor_plan_id, snapshot)
+                    if snapshot is None:
+                        continue
+                write_snapshot(floor_plan_id, snapshot, version_id)
+                self._maybe_prune(floor_plan_id)
+            finally:
+                self._queue.task_done()
+
+    def _build(self, floor_plan_id: str, build: Callable[[], Optional[dict]]) -> Optional[dict]:
+        try:
+            return build()
+        except Exception as exc:  # pragma: no cover - defensive guard
+            print(f"[BACKUP] Failed to build snapshot for {floor_plan_id}: {exc}")
+            return None
+
+    def _maybe_prune(self, floor_plan_id: str):
+        last = self._last_pruned.get(floor_plan_id)
+        if last is not None and time.monotonic() - last < BACKUP_PRUNE_INTERVAL_SECONDS:
+            return
+        self._last_pruned[floor_plan_id] = time.monotonic()
+        try:
+            removed = prune_snapshots(floor_plan_id)
+            if removed:
+                print(f"[BACKUP] Pruned {removed} old snapshots of {floor_plan_id}")
+        except Exception as exc:  # pragma: no cover - defensive guard
+            print(f"[BACKUP] Failed to prune snapshots of {floor_plan_id}: {exc}")
+
+
+# Create a single global instance
+backup_writer = BackupWriter()
 
 
+def schedule_snapshot(
+    floor_plan_id: str,
+    snapshot: Union[dict, Callable[[], Optional[dict]]],
+    version_id: Optional[str] = None,
+) -> None:
+    """Queue a snapshot for the background writer (used on request paths)."""
+    backup_writer.submit(floor_plan_id, snapshot, version_id)
@@ -0,0 +1,162 @@
+import json
+import threading
+import uuid
+import zlib
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from utils.encoders import CustomJSONEncoder
+
+# Optional accelerators; the JSON codec and zlib always work without them.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Every encoded entry starts with MAGIC, FORMAT_VERSION, codec id and compression id.
+# JSON text never starts with a NUL byte, so entries written before the header
+# existed are still read (as plain JSON).
+MAGIC = b"\x00"
+FORMAT_VERSION = 1
+HEADER_SIZE = 4
+
+CODEC_IDS = {"json": 1, "orjson": 2, "msgpack": 3}
+COMPRESSION_NONE, COMPRESSION_ZLIB, COMPRESSION_ZSTD = 0, 1, 2
+
+
+class CodecUnavailable(Exception):
+    """An entry was written with a codec this process cannot load; treat as a miss."""
+
+
+def _msgpack_default(obj):
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not msgpack serializable")
+
+
+def _json_dumps(data: Any) -> bytes:
+    return json.dumps(data, cls=CustomJSONEncoder, separators=(",", ":")).encode("utf-8")
+
+
+def _orjson_dumps(data: Any) -> bytes:
+    # orjson handles UUID and datetime natively, matching CustomJSONEncoder's output
+    return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+
+
+def _msgpack_dumps(data: Any) -> bytes:
+    return msgpack.packb(data, default=_msgpack_default, use_bin_type=True)
+
+
+def _msgpack_loads(payload: bytes) -> Any:
+    return msgpack.unpackb(payload, raw=False)
+
+
+_ENCODERS: Dict[str, Callable[[Any], bytes]] = {
+    "json": _json_dumps,
+    "orjson": _orjson_dumps,
+    "msgpack": _msgpack_dumps,
+}
+
+_DECODERS: Dict[int, Callable[[bytes], Any]] = {
+    CODEC_IDS["json"]: json.loads,
+    CODEC_IDS["orjson"]: lambda payload: orjson.loads(payload),
+    CODEC_IDS["msgpack"]: _msgpack_loads,
+}
+
+_AVAILABLE = {
+    "json": True,
+    "orjson": orjson is not None,
+    "msgpack": msgpack is not None,
+}
+
+
+def resolve_codec(name: Optional[str]) -> str:
+    """
+    Picks the configured codec, falling back to orjson (if installed) and then json.
+    """
+    if name and _AVAILABLE.get(name):
+        return name
+    if name and name not in _AVAILABLE:
+        print(f"Unknown cache codec '{name}', falling back.")
+    elif name:
+        print(f"Cache codec '{name}' is not installed, falling back.")
+    return "orjson" if _AVAILABLE["orjson"] else "json"
+
+
+class CacheCodec:
+    """
+    Serialises cache payloads with a self-describing header, so entries written
+    with another codec (or before the header existed) still decode.
+
+    zstandard compressors must not be shared between threads, so each thread
+    gets its own pair on first use.
+    """
+
+    def __init__(self, name: Optional[str] = None, compress_threshold: int = 16384, compression_level: int = 3):
+        self.name = resolve_codec(name)
+        self.codec_id = CODEC_IDS[self.name]
+        self.compress_threshold = compress_threshold
+        self.compression_level = compression_level
+        self._zstd = threading.local()
+
+    def encode(self, data: Any) -> bytes:
+        payload = _ENCODERS[self.name](data)
+        compression = COMPRESSION_NONE
+        if self.compress_threshold and len(payload) >= self.compress_threshold:
+            payload, compression = self._compress(payload)
+        return MAGIC + bytes((FORMAT_VERSION, self.codec_id, compression)) + payload
+
+    def decode(self, raw: Any) -> Any:
+        if isinstance(raw, str):
+            raw = raw.encode("utf-8")
+        if not raw.startswith(MAGIC):
+            return json.loads(raw) # Legacy, header-less JSON entry
+
+        version, codec_id, compression = raw[1], raw[2], raw[3]
+        if version != FORMAT_VERSION or codec_id not in _DECODERS:
+            raise CodecUnavailable(f"Unsupported cache entry format {version}/{codec_id}")
+        payload = self._decompress(raw[HEADER_SIZE:], compression)
+        try:
+            return _DECODERS[codec_id](payload)
+        except (AttributeError, NameError) as e: # Codec module not installed here
+            raise CodecUnavailable(str(e))
+
+    def _zstd_compressor(self):
+        compressor = getattr(self._zstd, "compressor", None)
+        if compressor is None:
+            compressor = self._zstd.compressor = zstandard.ZstdCompressor(level=self.compression_level)
+        return compressor
+
+    def _zstd_decompressor(self):
+        decompressor = getattr(self._zstd, "decompressor", None)
+        if decompressor is None:
+            decompressor = self._zstd.decompressor = zstandard.ZstdDecompressor()
+        return decompressor
+
+    def _compress(self, payload: bytes) -> Tuple[bytes, int]:
+        if zstandard is not None:
+            return self._zstd_compressor().compress(payload), COMPRESSION_ZSTD
+        return zlib.compress(payload, self.compression_level), COMPRESSION_ZLIB
+
+    def _decompress(self, payload: bytes, compression: int) -> bytes:
+        if compression == COMPRESSION_NONE:
+            return payload
+        if compression == COMPRESSION_ZLIB:
+            return zlib.decompress(payload)
+        if compression == COMPRESSION_ZSTD:
+            if zstandard is None:
+                raise CodecUnavailable("zstandard is not installed")
+            return self._zstd_decompressor().decompress(payload)
+        raise CodecUnavailable(f"Unknown compression id {compression}")
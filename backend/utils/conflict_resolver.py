@@ -1,7 +1,7 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Dict, Iterable, Optional
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
 from constants import ROLE_PRIORITIES, ADMIN_ROLE
 from models.floorplan import FloorPlan, Room, FloorPlanVersion
@@ -70,6 +70,140 @@ def should_override(
     )
 
 
+@dataclass
+class MergeResult:
+    """
+    Outcome of a three-way merge. `operations` turn the server head into the
+    merged plan: {"op": "add" | "update" | "delete", "room_id": ..., **fields}.
+    """
+    operations: List[Dict[str, Any]] = field(default_factory=list)
+    overlaps: int = 0
+    kept_head: int = 0
+    reason: str = ""
+    overridden_role: Optional[str] = None
+
+
+def _priority(role: Optional[str]) -> int:
+    return ROLE_PRIORITIES.get(role, 0)
+
+
+def _highest_role_since(db: Session, floor_plan: FloorPlan, base_version: FloorPlanVersion) -> Optional[str]:
+    """
+    The highest-priority role among the committers of versions after `base_version`.
+    """
+    roles = (
+        db.query(User.role)
+        .join(FloorPlanVersion, FloorPlanVersion.committer_id == User.id)
+        .filter(
+            FloorPlanVersion.floor_plan_id == floor_plan.id,
+            FloorPlanVersion.timestamp > base_version.timestamp,
+        )
+        .distinct()
+        .all()
+    )
+    return max((row.role for row in roles), key=_priority, default=None)
+
+
+def merge_rooms(
+    base: Dict[Any, Dict[str, Any]],
+    head: Dict[Any, Dict[str, Any]],
+    client: Dict[Any, Dict[str, Any]],
+    client_wins: bool,
+) -> Tuple[List[Dict[str, Any]], int, int]:
+    """
+    Three-way merge of room maps (room id -> values). Whatever only one side
+    changed is kept; `client_wins` settles fields (or whole rooms, for a
+    delete against an edit) that both sides changed differently. Returns the
+    operations against `head`, the number of overlaps and how many of them
+    kept the head's value.
+    """
+    operations: List[Dict[str, Any]] = []
+    overlaps = kept_head = 0
+
+    for room_id in list(head) + [room_id for room_id in client if room_id not in head]:
+        before, theirs, ours = base.get(room_id), head.get(room_id), client.get(room_id)
+        if ours == before:
+            continue # Untouched by the client
+
+        if ours is None: # Deleted by the client
+            if theirs is None:
+                continue
+            if theirs != before:
+                overlaps += 1
+                if not client_wins:
+                    kept_head += 1
+                    continue
+            operations.append({"op": "delete", "room_id": room_id})
+            continue
+
+        values = {key: value for key, value in ours.items() if key != "id"}
+        if theirs is None:
+            if before is not None: # Edited by the client, deleted on the server
+                overlaps += 1
+                if not client_wins:
+                    kept_head += 1
+                    continue
+            operations.append({"op": "add", "room_id": room_id, **values})
+            continue
+
+        if before is None: # Added on the server after the base; the client edited the head's copy
+            before = theirs
+        changes = {}
+        for key, value in values.items():
+            if value == before.get(key) or value == theirs.get(key):
+                continue
+            if theirs.get(key) != before.get(key):
+                overlaps += 1
+                if not client_wins:
+                    kept_head += 1
+                    continue
+            changes[key] = value
+        if changes:
+            operations.append({"op": "update", "room_id": room_id, **changes})
+
+    return operations, overlaps, kept_head
+
+
+def merge_changes(
+    db: Session,
+    floor_plan: FloorPlan,
+    current_user: User,
+    base_version: FloorPlanVersion,
+    base_rooms: Dict[Any, Dict[str, Any]],
+    head_rooms: Dict[Any, Dict[str, Any]],
+    client_rooms: Dict[Any, Dict[str, Any]],
+) -> MergeResult:
+    """
+    Merge a change made against `base_version` into the current head, room by
+    room and field by field. Role priority only decides fields both sides
+    changed; everything else from both sides is kept.
+    """
+    previous_role = _highest_role_since(db, floor_plan, base_version)
+    client_wins = _priority(current_user.role) >= _priority(previous_role)
+    operations, overlaps, kept_head = merge_rooms(base_rooms, head_rooms, client_rooms, client_wins)
+
+    if not overlaps:
+        reason = "Merged with newer changes; no overlapping edits."
+    elif client_wins:
+        reason = (
+            f"Merged with newer changes; incoming values kept for {overlaps} overlapping "
+            "edits because the author has equal or higher priority."
+        )
+    else:
+        reason = (
+            f"Merged with newer changes; {kept_head} overlapping edits kept from a "
+            f"higher-priority update. Last update role: {previous_role or 'unknown'}, "
+            f"incoming role: {current_user.role}."
+        )
+    return MergeResult(
+        operations=operations,
+        overlaps=overlaps,
+        kept_head=kept_head,
+        reason=reason,
+        overridden_role=previous_role,
+    )
+
+
 def apply_room_updates(room: Room, update_data: Dict) -> None:
     """
     Mutate the room instance with the provided update data,
@@ -1,7 +1,7 @@
 import threading
 import time
 from dataclasses import dataclass, asdict
-from typing import Dict
+from typing import Dict, Tuple
 
 
 @dataclass
@@ -48,6 +48,60 @@ class RequestMetrics:
 metrics = RequestMetrics()
 
 
+# Upper bounds (ms) of the connection-wait histogram buckets; a last,
+# open-ended "+Inf" bucket catches the rest
+POOL_WAIT_BUCKETS_MS: Tuple[int, ...] = (1, 5, 10, 50, 100, 500, 1000, 5000)
+
+
+@dataclass
+class PoolWaitSnapshot:
+    checkouts: int
+    timeouts: int
+    average_wait_ms: float
+    max_wait_ms: float
+    wait_histogram_ms: Dict[str, int]
+
+
+class PoolWaitMetrics:
+    """How long checkouts from a connection pool waited, including timeouts."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._buckets = [0] * (len(POOL_WAIT_BUCKETS_MS) + 1)
+        self._checkouts = 0
+        self._timeouts = 0
+        self._total_wait_ms = 0.0
+        self._max_wait_ms = 0.0
+
+    def record(self, duration_seconds: float, timed_out: bool = False) -> None:
+        wait_ms = duration_seconds * 1000
+        index = next(
+            (i for i, bound in enumerate(POOL_WAIT_BUCKETS_MS) if wait_ms <= bound),
+            len(POOL_WAIT_BUCKETS_MS),
+        )
+        with self._lock:
+            self._buckets[index] += 1
+            if timed_out:
+                self._timeouts += 1
+            else:
+                self._checkouts += 1
+            self._total_wait_ms += wait_ms
+            if wait_ms > self._max_wait_ms:
+                self._max_wait_ms = wait_ms
+
+    def snapshot(self) -> PoolWaitSnapshot:
+        with self._lock:
+            attempts = self._checkouts + self._timeouts
+            labels = [str(bound) for bound in POOL_WAIT_BUCKETS_MS] + ["+Inf"]
+            return PoolWaitSnapshot(
+                checkouts=self._checkouts,
+                timeouts=self._timeouts,
+                average_wait_ms=round(self._total_wait_ms / attempts, 2) if attempts else 0.0,
+                max_wait_ms=round(self._max_wait_ms, 2),
+                wait_histogram_ms=dict(zip(labels, self._buckets)),
+            )
+
+
 def now() -> float:
     return time.perf_counter()
 
@@ -0,0 +1,149 @@
+import asyncio
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional, Tuple
+
+from passlib.context import CryptContext
+
+from constants import (
+    BCRYPT_ROUNDS, PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_PENDING, PASSWORD_HASH_WAIT_SECONDS
+)
+
+# Hashes made with another cost than BCRYPT_ROUNDS are reported by
+# verify_and_update (and rehashed by the login route).
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+
+class PasswordHasherBusy(Exception):
+    """Every hashing slot stayed taken for PASSWORD_HASH_WAIT_SECONDS."""
+
+
+# Module-level so the worker processes can unpickle them
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _hash_many(passwords: List[str]) -> List[str]:
+    return [pwd_context.hash(password) for password in passwords]
+
+
+def _verify_and_update(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    return pwd_context.verify_and_update(password, hashed_password)
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt in a small dedicated process pool, so a wave of logins uses
+    PASSWORD_HASH_WORKERS cores instead of the request threadpool. At most
+    `max_pending` hashes are queued; async callers wait for a slot on the
+    event loop, sync callers block. The pool starts on first use and is
+    restarted if a worker dies.
+    """
+
+    def __init__(self, workers: int, max_pending: int, wait_seconds: float):
+        self.workers = workers
+        self.wait_seconds = wait_seconds
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    # --- Sync API (threadpool routes, scripts) ---
+
+    def hash(self, password: str) -> str:
+        return self._call_sync(_hash, password)
+
+    def verify_and_update(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        return self._call_sync(_verify_and_update, password, hashed_password)
+
+    def verify(self, password: str, hashed_password: str) -> bool:
+        return self.verify_and_update(password, hashed_password)[0]
+
+    # --- Async API ---
+
+    async def hash_async(self, password: str) -> str:
+        return await self._call_async(_hash, password)
+
+    async def verify_and_update_async(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        return await self._call_async(_verify_and_update, password, hashed_password)
+
+    async def hash_many_async(self, passwords: List[str], chunk_size: int) -> List[str]:
+        """
+        Hashes a batch (bulk imports) in order, `chunk_size` passwords per pool
+        task. At most one chunk per worker is in flight and chunks wait for a
+        slot without a deadline, so logins queue behind one chunk, not the batch.
+        """
+        in_flight = asyncio.Semaphore(self.workers)
+
+        async def run(chunk: List[str]) -> List[str]:
+            async with in_flight:
+                return await self._call_async(_hash_many, chunk, give_up=False)
+
+        chunks = [passwords[i:i + chunk_size] for i in range(0, len(passwords), chunk_size)]
+        results = await asyncio.gather(*(run(chunk) for chunk in chunks))
+        return [hashed for chunk in results for hashed in chunk]
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    # --- Internals ---
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    # Spawned, not forked: the server process runs threads (Redis
+                    # listeners, background writers) that must not be copied
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context("spawn"),
+                    )
+        return self._executor
+
+    def _reset_executor(self, broken: ProcessPoolExecutor):
+        with self._lock:
+            if self._executor is broken:
+                self._executor = None
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def _call_sync(self, fn, *args):
+        if not self._slots.acquire(timeout=self.wait_seconds):
+            raise PasswordHasherBusy()
+        try:
+            executor = self._get_executor()
+            try:
+                return executor.submit(fn, *args).result()
+            except BrokenProcessPool:
+                self._reset_executor(executor)
+                return self._get_executor().submit(fn, *args).result()
+        finally:
+            self._slots.release()
+
+    async def _acquire_slot(self, give_up: bool):
+        deadline = time.monotonic() + self.wait_seconds
+        while not self._slots.acquire(blocking=False):
+            if give_up and time.monotonic() >= deadline:
+                raise PasswordHasherBusy()
+            await asyncio.sleep(0.01)
+
+    async def _call_async(self, fn, *args, give_up: bool = True):
+        await self._acquire_slot(give_up)
+        try:
+            loop = asyncio.get_running_loop()
+            executor = self._get_executor()
+            try:
+                return await loop.run_in_executor(executor, fn, *args)
+            except BrokenProcessPool:
+                self._reset_executor(executor)
+                return await loop.run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            self._slots.release()
+
+
+# Create a single global instance
+password_hasher = PasswordHasher(PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_PENDING, PASSWORD_HASH_WAIT_SECONDS)
@@ -0,0 +1,146 @@
+import heapq
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, List, Optional, Sequence, Tuple
+
+from dateutil.rrule import DAILY, WEEKLY, rrule, rrulestr
+from sqlalchemy import or_
+from sqlalchemy.orm import Session, joinedload
+
+from models.booking import BookingSeries
+
+ALLOWED_FREQUENCIES = {DAILY: "DAILY", WEEKLY: "WEEKLY"}
+
+Interval = Tuple[datetime, datetime]
+
+
+class InvalidRecurrence(ValueError):
+    """Raised when a recurrence rule cannot be parsed or is not supported."""
+
+
+@dataclass
+class BookingOccurrence:
+    """
+    One expanded occurrence of a BookingSeries. Never persisted; it mirrors the
+    Booking attributes so it can be serialised with BookingResponse.
+    """
+    id: uuid.UUID
+    series_id: uuid.UUID
+    room_id: uuid.UUID
+    user_id: uuid.UUID
+    start_time: datetime
+    end_time: datetime
+    participants: int
+    room: Any = None
+    user: Any = None
+
+
+@lru_cache(maxsize=1024)
+def parse_rule(recurrence: str, dtstart: datetime) -> rrule:
+    """
+    Parse an RRULE string (e.g. "FREQ=WEEKLY;BYDAY=MO,WE;COUNT=10") anchored at dtstart.
+    Only daily and weekly frequencies are supported.
+    """
+    rule_text = recurrence.strip()
+    if rule_text.upper().startswith("RRULE:"):
+        rule_text = rule_text[len("RRULE:"):]
+    try:
+        rule = rrulestr(rule_text, dtstart=dtstart)
+    except (ValueError, TypeError) as e:
+        raise InvalidRecurrence(f"Invalid recurrence rule: {e}")
+    if not isinstance(rule, rrule) or rule._freq not in ALLOWED_FREQUENCIES:
+        raise InvalidRecurrence("Only DAILY and WEEKLY recurrence rules are supported.")
+    return rule
+
+
+def is_bounded(recurrence: str, dtstart: datetime) -> bool:
+    rule = parse_rule(recurrence, dtstart)
+    return rule._count is not None or rule._until is not None
+
+
+def last_occurrence_end(recurrence: str, start_time: datetime, end_time: datetime) -> Optional[datetime]:
+    """End of the final occurrence, or None for open-ended series."""
+    if not is_bounded(recurrence, start_time):
+        return None
+    last = None
+    for last in parse_rule(recurrence, start_time):
+        pass
+    return last + (end_time - start_time) if last else None
+
+
+def expand(series: Any, window_start: datetime, window_end: datetime) -> List[Interval]:
+    """
+    (start, end) of every occurrence of `series` overlapping [window_start, window_end).
+    `series` needs start_time, end_time and recurrence attributes.
+    """
+    duration = series.end_time - series.start_time
+    rule = parse_rule(series.recurrence, series.start_time)
+    # between() is exclusive: start > window_start - duration means end > window_start.
+    return [
+        (start, start + duration)
+        for start in rule.between(window_start - duration, window_end, inc=False)
+    ]
+
+
+def expand_as_bookings(series: Any, window_start: datetime, window_end: datetime) -> List[BookingOccurrence]:
+    """Expand a loaded BookingSeries into booking-shaped occurrences."""
+    return [
+        BookingOccurrence(
+            id=uuid.uuid5(series.id, start.isoformat()),
+            series_id=series.id,
+            room_id=series.room_id,
+            user_id=series.user_id,
+            start_time=start,
+            end_time=end,
+            participants=series.participants,
+            room=series.room,
+            user=series.user,
+        )
+        for start, end in expand(series, window_start, window_end)
+    ]
+
+
+def overlapping_indices(candidates: Sequence[Interval], existing: Sequence[Interval]) -> List[int]:
+    """
+    Indices of `candidates` that overlap any interval in `existing`, found in one
+    sweep over both lists. `candidates` must be sorted by start with non-decreasing
+    ends (true for occurrences of a single series).
+    """
+    existing_sorted = sorted(existing)
+    active_ends: List[datetime] = []
+    position = 0
+    overlapping = []
+    for index, (start, end) in enumerate(candidates):
+        while position < len(existing_sorted) and existing_sorted[position][0] < end:
+            heapq.heappush(active_ends, existing_sorted[position][1])
+            position += 1
+        while active_ends and active_ends[0] <= start:
+            heapq.heappop(active_ends)
+        if active_ends:
+            overlapping.append(index)
+    return overlapping
+
+
+def query_series_in_window(
+    db: Session,
+    window_start: datetime,
+    window_end: Optional[datetime],
+    *criteria,
+    eager: bool = False,
+) -> List[BookingSeries]:
+    """
+    Series that may have occurrences in [window_start, window_end); pass
+    window_end=None for no upper bound. Extra filter criteria are ANDed in.
+    """
+    query = db.query(BookingSeries)
+    if eager:
+        query = query.options(joinedload(BookingSeries.room), joinedload(BookingSeries.user))
+    query = query.filter(
+        *criteria,
+        or_(BookingSeries.series_end.is_(None), BookingSeries.series_end > window_start)
+    )
+    if window_end is not None:
+        query = query.filter(BookingSeries.start_time < window_end)
+    return query.all()
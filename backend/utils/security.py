@@ -1,25 +1,35 @@
-from passlib.context import CryptContext
 from datetime import datetime, timedelta, timezone
 from typing import Any, Optional, Union
 from jose import jwt, JWTError
-from constants import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES, ADMIN_ROLE, STANDARD_ROLE
+from constants import (
+    SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES, REFRESH_TOKEN_EXPIRE_DAYS, ADMIN_ROLE, STANDARD_ROLE,
+    IDENTITY_CACHE_SECONDS, VERIFIED_TOKEN_CACHE_SIZE
+)
 from models.schemas import TokenData
-# --- FIX: Import WebSocketDisconnect and SessionLocal ---
+# --- FIX: Import WebSocketDisconnect ---
 from fastapi import Depends, HTTPException, status, WebSocket, Query, WebSocketDisconnect
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import event, inspect
 from sqlalchemy.orm import Session, joinedload
-from db.database import get_db, SessionLocal # --- Import SessionLocal ---
-from models.user import User
+from db.database import get_db, get_async_db, run_db, async_session_scope, AnySession
+from db.redis_conn import LocalLRUCache, get_cache, set_cache, delete_cache
+from models.user import User, UserRole, RefreshToken
+from utils.password_hashing import password_hasher
+import asyncio
+import hashlib
+import secrets
+import time
 import uuid
 
 # --- Password Hashing ---
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt runs in a dedicated process pool (see utils/password_hashing.py).
+# Async routes should await password_hasher.*_async instead of these.
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return password_hasher.verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return password_hasher.hash(password)
 
 # --- JWT Token Generation & Validation ---
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/token") 
@@ -35,8 +45,15 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+# Tokens whose signature was already checked, mapped to their TokenData. The
+# whole token is the key, so a tampered payload never matches an entry.
+verified_tokens = LocalLRUCache(VERIFIED_TOKEN_CACHE_SIZE)
+
 def decode_access_token(token: str) -> Optional[TokenData]:
-    # ... (this function is unchanged) ...
+    entry = verified_tokens.get(token)
+    if entry and time.time() < entry[1]: # entry[1] is the token's own expiry
+        return entry[0]
+
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -51,7 +68,7 @@ def decode_access_token(token: str) -> Optional[TokenData]:
         if user_id is None or role is None or company_id is None:
             raise credentials_exception
         
-        return TokenData(
+        token_data = TokenData(
             user_id=uuid.UUID(user_id), 
             role=role, 
             company_id=uuid.UUID(company_id)
@@ -59,20 +76,196 @@ def decode_access_token(token: str) -> Optional[TokenData]:
     except JWTError:
         raise credentials_exception
 
+    expires_at = payload.get("exp")
+    if expires_at:
+        verified_tokens.set(token, token_data, expires_at, expires_at - time.time())
+    return token_data
+
+# --- Identity cache ---
+# get_current_user runs on every request. The identity it needs (id, role,
+# company) is cached in process and in Redis (see db/redis_conn.py), so hot
+# clients skip the User query. Users returned from the cache are detached
+# instances carrying only those columns; relationships are not loaded.
+
+IDENTITY_FIELDS = ("email", "role", "company_id")
+
+def _identity_key(user_id) -> str:
+    return f"cache:identity:{user_id}"
+
+def _identity_of(user: User) -> dict:
+    return {
+        "id": str(user.id),
+        "email": user.email,
+        "role": UserRole(user.role).value,
+        "company_id": str(user.company_id),
+        "created_at": user.created_at.isoformat() if user.created_at else None,
+    }
+
+def _user_from_identity(identity: dict) -> User:
+    created_at = identity.get("created_at")
+    return User(
+        id=uuid.UUID(identity["id"]),
+        email=identity["email"],
+        role=UserRole(identity["role"]),
+        company_id=uuid.UUID(identity["company_id"]),
+        created_at=datetime.fromisoformat(created_at) if created_at else None,
+    )
+
+def _query_identity(db: Session, user_id: uuid.UUID) -> Optional[User]:
+    return db.query(User).options(
+        joinedload(User.company) 
+    ).filter(
+        User.id == user_id
+    ).first()
+
+def load_identity(db: Session, user_id: uuid.UUID) -> Optional[User]:
+    """The user for `user_id`, from the identity cache when possible."""
+    identity = get_cache(_identity_key(user_id))
+    if identity:
+        return _user_from_identity(identity)
+
+    user = _query_identity(db, user_id)
+    if user is not None:
+        set_cache(_identity_key(user_id), _identity_of(user), ex=IDENTITY_CACHE_SECONDS)
+    return user
+
+async def load_identity_async(db: AnySession, user_id: uuid.UUID) -> Optional[User]:
+    """
+    load_identity for async callers. The (blocking) Redis calls run in a worker
+    thread; only the query goes through run_db, i.e. asyncpg when enabled.
+    """
+    identity = await asyncio.to_thread(get_cache, _identity_key(user_id))
+    if identity:
+        return _user_from_identity(identity)
+
+    user = await run_db(db, _query_identity, user_id)
+    if user is not None:
+        await asyncio.to_thread(set_cache, _identity_key(user_id), _identity_of(user), ex=IDENTITY_CACHE_SECONDS)
+    return user
+
+def invalidate_identity(user_id: uuid.UUID):
+    """Evicts a cached identity from Redis and from every worker's local tier."""
+    delete_cache(_identity_key(user_id))
+
+# Identity changes are evicted once they are committed; evicting at flush
+# time would let a concurrent request re-cache the old row before the commit.
+# Bulk query.update() calls bypass these events and must call
+# invalidate_identity themselves.
+
+@event.listens_for(User, "after_update")
+def _track_identity_change(mapper, connection, target):
+    state = inspect(target)
+    if any(state.attrs[field].history.has_changes() for field in IDENTITY_FIELDS):
+        state.session.info.setdefault("stale_identities", set()).add(target.id)
+
+@event.listens_for(User, "after_delete")
+def _track_identity_delete(mapper, connection, target):
+    inspect(target).session.info.setdefault("stale_identities", set()).add(target.id)
+
+@event.listens_for(Session, "after_commit")
+def _evict_stale_identities(session):
+    for user_id in session.info.pop("stale_identities", ()):
+        invalidate_identity(user_id)
+
+@event.listens_for(Session, "after_rollback")
+def _forget_stale_identities(session):
+    session.info.pop("stale_identities", None)
+
+# --- Refresh Tokens ---
+# Opaque random strings; only their SHA-256 is stored. Renewing an access
+# token costs one indexed lookup instead of a bcrypt verification.
+
+def _refresh_token_hash(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+def _refresh_error() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid or expired refresh token",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+def issue_refresh_token(db: Session, user_id: uuid.UUID, family_id: Optional[uuid.UUID] = None) -> str:
+    """Stores a new refresh token (a new family unless one is given). The caller commits."""
+    token = secrets.token_urlsafe(32)
+    db.add(RefreshToken(
+        user_id=user_id,
+        family_id=family_id or uuid.uuid4(),
+        token_hash=_refresh_token_hash(token),
+        expires_at=datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+    ))
+    return token
+
+def create_token_pair(db: Session, user: User, family_id: Optional[uuid.UUID] = None) -> dict:
+    """A short-lived access token plus a refresh token, as returned by /auth/token."""
+    access_token = create_access_token(
+        data={
+            "user_id": str(user.id),
+            "role": UserRole(user.role).value,
+            "company_id": str(user.company_id),
+        },
+        expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES),
+    )
+    return {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "refresh_token": issue_refresh_token(db, user.id, family_id),
+        "expires_in": ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+    }
+
+def rotate_refresh_token(db: Session, token: str) -> dict:
+    """
+    Exchanges a refresh token for a new token pair and retires it. Presenting a
+    token that was already rotated means it leaked, so its whole family is
+    revoked and the legitimate holder has to log in again.
+    """
+    now = datetime.utcnow()
+    row = db.query(RefreshToken).filter(
+        RefreshToken.token_hash == _refresh_token_hash(token)
+    ).with_for_update().first()
+    if row is None or row.revoked_at is not None or row.expires_at <= now:
+        raise _refresh_error()
+
+    if row.used_at is not None:
+        db.query(RefreshToken).filter(
+            RefreshToken.family_id == row.family_id,
+            RefreshToken.revoked_at.is_(None)
+        ).update({RefreshToken.revoked_at: now}, synchronize_session=False)
+        db.commit()
+        print(f"[AUTH] Refresh token reuse for user {row.user_id}; revoked family {row.family_id}")
+        raise _refresh_error()
+
+    user = load_identity(db, row.user_id)
+    if user is None:
+        raise _refresh_error()
+
+    row.used_at = now
+    pair = create_token_pair(db, user, family_id=row.family_id)
+    db.commit()
+    return pair
+
+def revoke_refresh_token(db: Session, token: str) -> None:
+    """Logs a refresh-token chain out: revokes every token of its family."""
+    row = db.query(RefreshToken).filter(RefreshToken.token_hash == _refresh_token_hash(token)).first()
+    if row is None:
+        return
+    db.query(RefreshToken).filter(
+        RefreshToken.family_id == row.family_id,
+        RefreshToken.revoked_at.is_(None)
+    ).update({RefreshToken.revoked_at: datetime.utcnow()}, synchronize_session=False)
+    db.commit()
+
 # --- FastAPI Dependency Functions ---
 
 def get_current_user(
     db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)
 ) -> User:
     """
-    Dependency for HTTP requests.
+    Dependency for HTTP requests. Hot clients are served from the verified-token
+    and identity caches without a signature check or a database query.
     """
     token_data = decode_access_token(token)
-    user = db.query(User).options(
-        joinedload(User.company) 
-    ).filter(
-        User.id == token_data.user_id
-    ).first()
+    user = load_identity(db, token_data.user_id)
     
     if user is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
@@ -81,6 +274,20 @@ def get_current_user(
         
     return user
 
+async def get_current_user_async(
+    db: AnySession = Depends(get_async_db), token: str = Depends(oauth2_scheme)
+) -> User:
+    """get_current_user for async handlers; shares the handler's get_async_db session."""
+    token_data = decode_access_token(token)
+    user = await load_identity_async(db, token_data.user_id)
+
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+    if user.company_id != token_data.company_id:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User does not belong to this company.")
+
+    return user
+
 def get_current_admin_user(current_user: User = Depends(get_current_user)) -> User:
     """Dependency that ensures the user is an Admin (for HTTP requests)."""
     if current_user.role != ADMIN_ROLE:
@@ -90,6 +297,15 @@ def get_current_admin_user(current_user: User = Depends(get_current_user)) -> Us
         )
     return current_user
 
+async def get_current_admin_user_async(current_user: User = Depends(get_current_user_async)) -> User:
+    """get_current_admin_user for async handlers."""
+    if current_user.role != ADMIN_ROLE:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Operation requires administrator privileges",
+        )
+    return current_user
+
 # --- UPDATED: WebSocket Authentication Dependency ---
 async def get_websocket_user(
     token: str = Query(...), # Get token from query param: ?token=...
@@ -104,13 +320,10 @@ async def get_websocket_user(
         # This catches token decode errors (expired, invalid)
         raise WebSocketDisconnect(code=status.WS_1008_POLICY_VIOLATION, reason=e.detail)
 
-    db = SessionLocal() # Create a new, independent session
     try:
-        user = db.query(User).options(
-            joinedload(User.company) 
-        ).filter(
-            User.id == token_data.user_id
-        ).first()
+        # Its own short-lived session; nothing here blocks the event loop
+        async with async_session_scope() as db:
+            user = await load_identity_async(db, token_data.user_id)
         
         if user is None:
             raise WebSocketDisconnect(code=status.WS_1008_POLICY_VIOLATION, reason="User not found")
@@ -124,8 +337,6 @@ async def get_websocket_user(
         if hasattr(e, 'detail'):
             reason = e.detail
         raise WebSocketDisconnect(code=status.WS_1008_POLICY_VIOLATION, reason=reason)
-    finally:
-        db.close() # --- CRITICAL: Always close the session ---
 
 # --- NEW: WebSocket Admin Authentication Dependency ---
 async def get_websocket_admin_user(
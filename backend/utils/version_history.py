@@ -0,0 +1,363 @@
+import copy
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from constants import FP_VERSION_KEYFRAME_INTERVAL, FP_VERSION_RETENTION_DAYS
+from models.floorplan import FloorPlan, FloorPlanVersion
+
+# Floor plan versions are stored as a chain: every FP_VERSION_KEYFRAME_INTERVAL-th
+# version (and the first) keeps a full snapshot, the others an RFC 6902 JSON patch
+# against the version before them. Patches are computed on a "document" form of the
+# snapshot in which rooms are keyed by id, so moving one room out of 600 is a
+# one-operation patch instead of a rewrite of the room list.
+
+
+class VersionHistoryError(ValueError):
+    """Raised when a version cannot be reconstructed from the stored chain."""
+
+
+# --- Snapshot <-> document ---
+
+def _to_document(snapshot: Dict[str, Any]) -> Dict[str, Any]:
+    document = dict(snapshot)
+    document["rooms"] = {room["id"]: room for room in snapshot.get("rooms", [])}
+    return document
+
+
+def _to_snapshot(document: Dict[str, Any]) -> Dict[str, Any]:
+    snapshot = dict(document)
+    snapshot["rooms"] = list(document.get("rooms", {}).values())
+    return snapshot
+
+
+# --- JSON patch (the add/remove/replace subset of RFC 6902) ---
+
+def _escape(token: str) -> str:
+    return token.replace("~", "~0").replace("/", "~1")
+
+
+def _unescape(token: str) -> str:
+    return token.replace("~1", "/").replace("~0", "~")
+
+
+def make_patch(old: Dict[str, Any], new: Dict[str, Any], path: str = "") -> List[Dict[str, Any]]:
+    """Operations turning `old` into `new`. Nested objects are diffed; anything else is replaced whole."""
+    ops = []
+    for key in old:
+        if key not in new:
+            ops.append({"op": "remove", "path": f"{path}/{_escape(key)}"})
+    for key, value in new.items():
+        child = f"{path}/{_escape(key)}"
+        if key not in old:
+            ops.append({"op": "add", "path": child, "value": value})
+        elif isinstance(old[key], dict) and isinstance(value, dict):
+            ops.extend(make_patch(old[key], value, child))
+        elif old[key] != value:
+            ops.append({"op": "replace", "path": child, "value": value})
+    return ops
+
+
+def apply_patch(document: Dict[str, Any], ops: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Applies `ops` to `document` in place and returns it. An operation whose
+    parent path does not exist raises VersionHistoryError.
+    """
+    for op in ops:
+        *parents, last = [_unescape(token) for token in op["path"].split("/")[1:]]
+        target = document
+        for token in parents:
+            if not isinstance(target, dict) or token not in target:
+                raise VersionHistoryError(f"Patch path {op['path']} does not exist.")
+            target = target[token]
+        if not isinstance(target, dict):
+            raise VersionHistoryError(f"Patch path {op['path']} does not exist.")
+        if op["op"] == "remove":
+            target.pop(last, None)
+        elif op["op"] in ("add", "replace"):
+            target[last] = copy.deepcopy(op["value"])
+        else:
+            raise VersionHistoryError(f"Unsupported patch operation: {op['op']}")
+    return document
+
+
+# --- Reading ---
+
+def load_snapshot(db: Session, version: FloorPlanVersion) -> Dict[str, Any]:
+    """
+    Full snapshot of `version`, rebuilt from the nearest earlier keyframe with one query.
+    """
+    if version.is_keyframe:
+        return version.data_snapshot
+
+    keyframe_number = select(func.max(FloorPlanVersion.version_number)).where(
+        FloorPlanVersion.floor_plan_id == version.floor_plan_id,
+        FloorPlanVersion.is_keyframe.is_(True),
+        FloorPlanVersion.version_number <= version.version_number,
+    ).correlate(None).scalar_subquery()
+
+    chain = db.query(
+        FloorPlanVersion.version_number, FloorPlanVersion.is_keyframe, FloorPlanVersion.data_snapshot
+    ).filter(
+        FloorPlanVersion.floor_plan_id == version.floor_plan_id,
+        FloorPlanVersion.version_number >= keyframe_number,
+        FloorPlanVersion.version_number <= version.version_number,
+    ).order_by(FloorPlanVersion.version_number.asc()).all()
+
+    if not chain or not chain[0].is_keyframe:
+        raise VersionHistoryError(f"No keyframe found for version {version.id}.")
+    expected = list(range(chain[0].version_number, version.version_number + 1))
+    if [link.version_number for link in chain] != expected:
+        raise VersionHistoryError(f"Version history of {version.id} has gaps.")
+
+    document = _to_document(copy.deepcopy(chain[0].data_snapshot))
+    for link in chain[1:]:
+        apply_patch(document, link.data_snapshot)
+    return _to_snapshot(document)
+
+
+def load_snapshot_by_id(db: Session, version_id: uuid.UUID) -> Optional[Dict[str, Any]]:
+    version = db.query(FloorPlanVersion).filter(FloorPlanVersion.id == version_id).first()
+    return load_snapshot(db, version) if version else None
+
+
+# --- Diffing ---
+
+POSITION_FIELDS = ("x_coord", "y_coord")
+SIZE_FIELDS = ("width", "height")
+PLAN_FIELDS = ("name", "width", "height", "map_data")
+
+
+def _field_changes(old: Dict[str, Any], new: Dict[str, Any], fields) -> Dict[str, Dict[str, Any]]:
+    return {
+        field: {"from": old.get(field), "to": new.get(field)}
+        for field in fields
+        if old.get(field) != new.get(field)
+    }
+
+
+def diff_snapshots(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Room-level diff between two snapshots, matched by room id in one pass over each.
+    A room can appear under several of moved/resized/renamed/updated.
+    """
+    old_rooms = {room["id"]: room for room in old.get("rooms", [])}
+    new_rooms = {room["id"]: room for room in new.get("rooms", [])}
+
+    diff = {
+        "floor_plan": _field_changes(old.get("floor_plan", {}), new.get("floor_plan", {}), PLAN_FIELDS),
+        "added": [room for room_id, room in new_rooms.items() if room_id not in old_rooms],
+        "removed": [room for room_id, room in old_rooms.items() if room_id not in new_rooms],
+        "moved": [],
+        "resized": [],
+        "renamed": [],
+        "updated": [],
+    }
+    for room_id, room in new_rooms.items():
+        before = old_rooms.get(room_id)
+        if before is None:
+            continue
+        if any(before.get(field) != room.get(field) for field in POSITION_FIELDS):
+            diff["moved"].append({
+                "room_id": room_id,
+                "name": room.get("name"),
+                "from": {field: before.get(field) for field in POSITION_FIELDS},
+                "to": {field: room.get(field) for field in POSITION_FIELDS},
+            })
+        if any(before.get(field) != room.get(field) for field in SIZE_FIELDS):
+            diff["resized"].append({
+                "room_id": room_id,
+                "name": room.get("name"),
+                "from": {field: before.get(field) for field in SIZE_FIELDS},
+                "to": {field: room.get(field) for field in SIZE_FIELDS},
+            })
+        if before.get("name") != room.get("name"):
+            diff["renamed"].append({"room_id": room_id, "from": before.get("name"), "to": room.get("name")})
+        other_changes = _field_changes(before, room, ("capacity", "features"))
+        if other_changes:
+            diff["updated"].append({"room_id": room_id, "name": room.get("name"), "changes": other_changes})
+    return diff
+
+
+# --- Writing ---
+
+def _lock_head(db: Session, floor_plan_id: uuid.UUID) -> Optional[FloorPlanVersion]:
+    """
+    Locks the plan row until commit, so concurrent writers number their versions
+    one after another, and returns the current (head) version, or None if the
+    plan has no versions yet.
+    """
+    head_id = db.execute(
+        select(FloorPlan.current_version_id).where(FloorPlan.id == floor_plan_id).with_for_update()
+    ).scalar()
+    if head_id is None:
+        # Plans last written by older releases have versions but no pointer to them.
+        return db.query(FloorPlanVersion).filter(
+            FloorPlanVersion.floor_plan_id == floor_plan_id
+        ).order_by(
+            FloorPlanVersion.version_number.desc().nullslast(),
+            FloorPlanVersion.timestamp.desc(),
+            FloorPlanVersion.id.desc(),
+        ).first()
+    return db.query(FloorPlanVersion).filter(FloorPlanVersion.id == head_id).first()
+
+
+def _next_version(head: Optional[FloorPlanVersion]):
+    """Number of the version after `head`, and whether it must be a keyframe."""
+    number = (head.version_number or 0) + 1 if head else 1
+    is_keyframe = (
+        head is None
+        or head.version_number is None
+        or (number - 1) % FP_VERSION_KEYFRAME_INTERVAL == 0
+    )
+    return number, is_keyframe
+
+
+def _add_version(
+    db: Session,
+    floor_plan: FloorPlan,
+    data: Any,
+    committer_id: Optional[uuid.UUID],
+    timestamp: datetime,
+    number: int,
+    is_keyframe: bool,
+) -> FloorPlanVersion:
+    version = FloorPlanVersion(
+        id=uuid.uuid4(),
+        floor_plan_id=floor_plan.id,
+        data_snapshot=data,
+        committer_id=committer_id,
+        timestamp=timestamp,
+        version_number=number,
+        is_keyframe=is_keyframe,
+    )
+    db.add(version)
+    db.flush()
+    floor_plan.current_version_id = version.id
+    return version
+
+
+def record_version(
+    db: Session,
+    floor_plan: FloorPlan,
+    snapshot: Dict[str, Any],
+    committer_id: Optional[uuid.UUID],
+    timestamp: datetime,
+) -> FloorPlanVersion:
+    """
+    Adds the next version of `floor_plan` (as a keyframe or a patch against the
+    current head) and makes it current. The caller commits.
+    """
+    head = _lock_head(db, floor_plan.id)
+    number, is_keyframe = _next_version(head)
+
+    if is_keyframe:
+        data = snapshot
+    else:
+        data = make_patch(_to_document(load_snapshot(db, head)), _to_document(snapshot))
+
+    return _add_version(db, floor_plan, data, committer_id, timestamp, number, is_keyframe)
+
+
+def record_patch(
+    db: Session,
+    floor_plan: FloorPlan,
+    ops: List[Dict[str, Any]],
+    committer_id: Optional[uuid.UUID],
+    timestamp: datetime,
+    build_snapshot: Callable[[], Dict[str, Any]],
+) -> FloorPlanVersion:
+    """
+    Like record_version, for callers that already know the change as patch
+    operations against the head's document form. Unless a keyframe is due the
+    head is not reconstructed and `ops` are stored as they are. `build_snapshot`
+    is only called for plans that have no version history yet.
+    """
+    head = _lock_head(db, floor_plan.id)
+    number, is_keyframe = _next_version(head)
+
+    if not is_keyframe:
+        data = ops
+    elif head is None or head.version_number is None:
+        data = build_snapshot()
+    else:
+        data = _to_snapshot(apply_patch(_to_document(copy.deepcopy(load_snapshot(db, head))), ops))
+
+    return _add_version(db, floor_plan, data, committer_id, timestamp, number, is_keyframe)
+
+
+def room_path(room_id: Any, field: Optional[str] = None) -> str:
+    """Patch path of a room (or one of its fields) in the document form."""
+    path = f"/rooms/{_escape(str(room_id))}"
+    return f"{path}/{_escape(field)}" if field else path
+
+
+# --- Compaction ---
+
+def _compact_plan(db: Session, floor_plan_id: uuid.UUID, cutoff: datetime) -> int:
+    head = _lock_head(db, floor_plan_id)
+    if head is None:
+        return 0
+
+    versions = db.query(
+        FloorPlanVersion.id, FloorPlanVersion.version_number,
+        FloorPlanVersion.is_keyframe, FloorPlanVersion.timestamp
+    ).filter(
+        FloorPlanVersion.floor_plan_id == floor_plan_id,
+        FloorPlanVersion.version_number.isnot(None),
+    ).order_by(FloorPlanVersion.version_number.asc()).all()
+
+    # The oldest version still inside the retention window, or the head if none is
+    boundary = next((v for v in versions if v.timestamp >= cutoff), None)
+    boundary_number = boundary.version_number if boundary else head.version_number
+    if boundary_number is None:
+        return 0
+
+    doomed = [v.id for v in versions if not v.is_keyframe and v.version_number < boundary_number]
+    if not doomed:
+        return 0
+
+    # The boundary loses the patches it was built on, so it becomes a keyframe
+    boundary_version = db.query(FloorPlanVersion).filter(
+        FloorPlanVersion.floor_plan_id == floor_plan_id,
+        FloorPlanVersion.version_number == boundary_number,
+    ).one()
+    if not boundary_version.is_keyframe:
+        boundary_version.data_snapshot = load_snapshot(db, boundary_version)
+        boundary_version.is_keyframe = True
+
+    db.query(FloorPlanVersion).filter(FloorPlanVersion.id.in_(doomed)).delete(synchronize_session=False)
+    return len(doomed)
+
+
+def compact_history(
+    db: Session,
+    retention_days: int = FP_VERSION_RETENTION_DAYS,
+    floor_plan_id: Optional[uuid.UUID] = None,
+) -> int:
+    """
+    Drops patch versions older than the retention window, keeping their keyframes
+    as coarser history. Each plan is compacted and committed separately.
+    Returns the number of versions removed.
+    """
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    if floor_plan_id is not None:
+        plan_ids = [floor_plan_id]
+    else:
+        plan_ids = [row.floor_plan_id for row in db.query(FloorPlanVersion.floor_plan_id).filter(
+            FloorPlanVersion.is_keyframe.is_(False),
+            FloorPlanVersion.timestamp < cutoff,
+        ).distinct().all()]
+
+    removed = 0
+    for plan_id in plan_ids:
+        try:
+            removed += _compact_plan(db, plan_id, cutoff)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"[VERSIONS] Failed to compact history of floor plan {plan_id}: {e}")
+    return removed
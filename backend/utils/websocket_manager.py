@@ -1,78 +1,362 @@
+import asyncio
 import json
-from typing import Dict, List
-from fastapi import WebSocket
+import queue
+import threading
+import time
+from typing import Dict, List, Optional, Set
+from fastapi import WebSocket, status
 # --- UPDATED: Import async redis and REDIS_URL ---
 from db.redis_conn import redis_conn, get_redis
+import redis
 import redis.asyncio as aioredis
 from constants import REDIS_URL
 
+try:
+    import msgpack
+except ImportError: # Binary frames are optional; clients fall back to JSON
+    msgpack = None
+
 # We will use a Redis Pub/Sub channel to broadcast messages
 # This allows multiple, separate server processes to communicate
 REDIS_CHANNEL = "live_feed_channel"
 
+# Per-floor-plan event counter; clients detect missed events by a gap in "seq"
+SEQUENCE_KEY = "live_feed:seq:{floor_plan_id}"
+
+# Supported frame encodings for live-feed sockets
+FRAME_JSON = "json"
+FRAME_MSGPACK = "msgpack"
+
+# Assigns the next sequence number and publishes in one atomic step, so numbers
+# reach subscribers in order. ARGV[1] is the JSON message minus its closing brace.
+PUBLISH_WITH_SEQUENCE_LUA = """
+local seq = redis.call('INCR', KEYS[1])
+redis.call('PUBLISH', ARGV[2], ARGV[1] .. ',"seq":' .. seq .. '}')
+return seq
+"""
+
+# Delay before re-subscribing after the Redis connection drops
+RESUBSCRIBE_BACKOFF_SECONDS = 1.0
+
+# --- Per-socket delivery ---
+# Frames waiting for one socket; a client this far behind is disconnected
+# (it refetches on reconnect) instead of slowing the fan-out for everyone
+SOCKET_QUEUE_SIZE = 256
+# A single send taking longer than this means the client is stuck
+SOCKET_SEND_TIMEOUT_SECONDS = 5.0
+
+# --- Publisher tuning ---
+PUBLISH_QUEUE_SIZE = 10000 # Events beyond this are dropped rather than blocking requests
+PUBLISH_BATCH_SIZE = 200 # Max events sent in one pipeline round trip
+PUBLISH_RETRY_SECONDS = 1.0
+
+class LiveFeedPublisher:
+    """
+    Publishes live-feed events through one pooled Redis client. Callers only
+    append to an in-memory queue; a daemon thread drains it and sends each batch
+    as a single pipeline, so request handlers never wait on Redis.
+    """
+
+    def __init__(self):
+        self._queue: "queue.Queue[Optional[dict]]" = queue.Queue(maxsize=PUBLISH_QUEUE_SIZE)
+        self._client: Optional[redis.Redis] = None
+        self._publish_script = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def enqueue(self, message: dict):
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(message)
+        except queue.Full:
+            print(f"CRITICAL: Live-feed queue full; dropping {message.get('event')} for {message.get('floor_plan_id')}")
+
+    def stop(self, timeout: float = 5.0):
+        """Flushes what is queued and stops the worker thread."""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread:
+            try:
+                self._queue.put(None, timeout=timeout)
+            except queue.Full:
+                return
+            thread.join(timeout)
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="live-feed-publisher", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < PUBLISH_BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stopping = None in batch
+            messages = [message for message in batch if message is not None]
+            if messages:
+                self._flush(messages)
+            if stopping:
+                return
+
+    def _flush(self, messages: List[dict]):
+        for attempt in range(2):
+            try:
+                if self._client is None:
+                    self._client = redis.Redis.from_url(REDIS_URL)
+                    self._publish_script = self._client.register_script(PUBLISH_WITH_SEQUENCE_LUA)
+                pipe = self._client.pipeline(transaction=False)
+                for message in messages:
+                    self._publish_script(
+                        keys=[SEQUENCE_KEY.format(floor_plan_id=message["floor_plan_id"])],
+                        args=[json.dumps(message)[:-1], REDIS_CHANNEL],
+                        client=pipe,
+                    )
+                pipe.execute()
+                return
+            except Exception as e:
+                print(f"CRITICAL: Failed to publish {len(messages)} WebSocket update(s) to Redis: {e}")
+                self._client = None
+                if attempt == 0:
+                    time.sleep(PUBLISH_RETRY_SECONDS)
+
 class ConnectionManager:
     def __init__(self):
         # --- UPDATED: We now manage two separate connection pools ---
         # For floor-plan-specific feeds (e.g., /ws/live-feed/user/{id})
-        self.floor_plan_connections: Dict[str, List[WebSocket]] = {}
+        self.floor_plan_connections: Dict[str, Set[WebSocket]] = {}
         # For company-wide feeds (e.g., /ws/admin/live-feed/company)
-        self.company_connections: Dict[str, List[WebSocket]] = {}
+        self.company_connections: Dict[str, Set[WebSocket]] = {}
         # --- END UPDATE ---
+        # Owning company of each floor-plan socket, so events never cross tenants
+        self.connection_companies: Dict[WebSocket, str] = {}
+        # Frame encoding requested by each socket (json or msgpack)
+        self.connection_formats: Dict[WebSocket, str] = {}
+        # Bounded outgoing queue and sender task of each socket; the shared
+        # subscriber only enqueues, it never waits on socket I/O
+        self.outboxes: Dict[WebSocket, asyncio.Queue] = {}
+        self.sender_tasks: Dict[WebSocket, asyncio.Task] = {}
+        # --- NEW: One pub/sub subscription shared by every socket in this process ---
+        self._listener_task: Optional[asyncio.Task] = None
+        # --- NEW: Long-lived, pooled publisher shared by sync and async callers ---
+        self.publisher = LiveFeedPublisher()
 
     # --- NEW: Connect for a specific floor plan ---
-    async def connect_floor_plan(self, websocket: WebSocket, floor_plan_id: str):
+    async def connect_floor_plan(
+        self, websocket: WebSocket, floor_plan_id: str, company_id: str, frame_format: str = FRAME_JSON
+    ):
         """Accepts a new WebSocket connection for a specific floor plan."""
         await websocket.accept()
-        if floor_plan_id not in self.floor_plan_connections:
-            self.floor_plan_connections[floor_plan_id] = []
-        self.floor_plan_connections[floor_plan_id].append(websocket)
+        self.floor_plan_connections.setdefault(floor_plan_id, set()).add(websocket)
+        self.connection_companies[websocket] = str(company_id)
+        self._set_format(websocket, frame_format)
+        self._start_sender(websocket)
+        self._ensure_listener()
         print(f"New connection for floor plan {floor_plan_id}. Total: {len(self.floor_plan_connections[floor_plan_id])}")
 
     # --- NEW: Disconnect from a specific floor plan ---
     def disconnect_floor_plan(self, websocket: WebSocket, floor_plan_id: str):
         """Removes a WebSocket connection from a floor plan."""
-        if floor_plan_id in self.floor_plan_connections:
-            self.floor_plan_connections[floor_plan_id].remove(websocket)
-            print(f"Disconnected from floor plan {floor_plan_id}. Remaining: {len(self.floor_plan_connections[floor_plan_id])}")
+        self.connection_companies.pop(websocket, None)
+        self.connection_formats.pop(websocket, None)
+        self._stop_sender(websocket)
+        connections = self.floor_plan_connections.get(floor_plan_id)
+        if connections is not None:
+            connections.discard(websocket)
+            print(f"Disconnected from floor plan {floor_plan_id}. Remaining: {len(connections)}")
+            if not connections:
+                del self.floor_plan_connections[floor_plan_id]
 
     # --- NEW: Connect for a whole company ---
-    async def connect_company(self, websocket: WebSocket, company_id: str):
+    async def connect_company(self, websocket: WebSocket, company_id: str, frame_format: str = FRAME_JSON):
         """Accepts a new WebSocket connection for a company-wide feed."""
         await websocket.accept()
-        if company_id not in self.company_connections:
-            self.company_connections[company_id] = []
-        self.company_connections[company_id].append(websocket)
+        self.company_connections.setdefault(company_id, set()).add(websocket)
+        self._set_format(websocket, frame_format)
+        self._start_sender(websocket)
+        self._ensure_listener()
         print(f"New connection for company {company_id}. Total: {len(self.company_connections[company_id])}")
 
     # --- NEW: Disconnect from a whole company ---
     def disconnect_company(self, websocket: WebSocket, company_id: str):
         """Removes a WebSocket connection from a company-wide feed."""
-        if company_id in self.company_connections:
-            self.company_connections[company_id].remove(websocket)
-            print(f"Disconnected from company {company_id}. Remaining: {len(self.company_connections[company_id])}")
+        self.connection_formats.pop(websocket, None)
+        self._stop_sender(websocket)
+        connections = self.company_connections.get(company_id)
+        if connections is not None:
+            connections.discard(websocket)
+            print(f"Disconnected from company {company_id}. Remaining: {len(connections)}")
+            if not connections:
+                del self.company_connections[company_id]
+
+    def _set_format(self, websocket: WebSocket, frame_format: str):
+        if frame_format == FRAME_MSGPACK and msgpack is None:
+            print("msgpack is not installed; sending JSON frames instead.")
+            frame_format = FRAME_JSON
+        if frame_format != FRAME_JSON:
+            self.connection_formats[websocket] = frame_format
+
+    # --- Per-socket senders ---
+    def _start_sender(self, websocket: WebSocket):
+        outbox = asyncio.Queue(maxsize=SOCKET_QUEUE_SIZE)
+        self.outboxes[websocket] = outbox
+        self.sender_tasks[websocket] = asyncio.get_running_loop().create_task(self._sender(websocket, outbox))
 
-    # --- UNCHANGED: This function is perfect as-is ---
-    async def publish_update(self, floor_plan_id: str, company_id: str, event_type: str = "BOOKING_CHANGED"):
+    def _stop_sender(self, websocket: WebSocket):
+        self.outboxes.pop(websocket, None)
+        task = self.sender_tasks.pop(websocket, None)
+        if task and task is not asyncio.current_task():
+            task.cancel()
+
+    def _drop(self, websocket: WebSocket, reason: str):
         """
-        Publishes an update to the Redis channel using an ASYNC client.
-        This will be received by ALL server instances.
+        Stops delivering to a socket that fell behind or got stuck and closes it
+        in the background. Its endpoint's receive loop then unregisters it.
         """
-        r = None
+        print(f"Dropping live-feed client: {reason}")
+        self._stop_sender(websocket)
+        asyncio.get_running_loop().create_task(self._close_socket(websocket))
+
+    async def _close_socket(self, websocket: WebSocket):
         try:
-            r = await aioredis.from_url(REDIS_URL)
-            
-            message = {
-                "floor_plan_id": str(floor_plan_id),
-                "company_id": str(company_id),
-                "event": event_type
-            }
-            await r.publish(REDIS_CHANNEL, json.dumps(message))
-            
-        except Exception as e:
-            print(f"CRITICAL: Failed to publish WebSocket update to Redis: {e}")
-        finally:
-            if r:
-                await r.close()
+            await asyncio.wait_for(
+                websocket.close(code=status.WS_1013_TRY_AGAIN_LATER), SOCKET_SEND_TIMEOUT_SECONDS
+            )
+        except Exception:
+            pass # Already gone
+
+    async def _sender(self, websocket: WebSocket, outbox: asyncio.Queue):
+        while True:
+            text, packed = await outbox.get()
+            try:
+                if packed is not None:
+                    await asyncio.wait_for(websocket.send_bytes(packed), SOCKET_SEND_TIMEOUT_SECONDS)
+                else:
+                    await asyncio.wait_for(websocket.send_text(text), SOCKET_SEND_TIMEOUT_SECONDS)
+            except asyncio.TimeoutError:
+                self._drop(websocket, f"send took over {SOCKET_SEND_TIMEOUT_SECONDS}s")
+                return
+            except Exception as e:
+                # The endpoint's receive loop notices the disconnect and unregisters the socket
+                print(f"Failed to deliver live-feed message: {e}")
+                self._stop_sender(websocket)
+                return
+
+    # --- NEW: Shared subscriber ---
+    def _ensure_listener(self):
+        """Starts the process-wide Redis subscriber on the running loop, if not already running."""
+        if self._listener_task is None or self._listener_task.done():
+            self._listener_task = asyncio.get_running_loop().create_task(self._listen())
+
+    async def _listen(self):
+        """
+        Subscribes once to REDIS_CHANNEL and routes every message to the
+        sockets registered for its floor plan and company.
+        """
+        while True:
+            r = None
+            try:
+                r = aioredis.from_url(REDIS_URL)
+                async with r.pubsub() as pubsub:
+                    await pubsub.subscribe(REDIS_CHANNEL)
+                    async for message in pubsub.listen():
+                        if message.get("type") == "message":
+                            self._dispatch(message["data"])
+            except asyncio.CancelledError:
+                print("Redis listener cancelled.")
+                raise
+            except Exception as e:
+                print(f"Redis listener error: {e}")
+                await asyncio.sleep(RESUBSCRIBE_BACKOFF_SECONDS)
+            finally:
+                if r:
+                    await r.close()
+
+    def _dispatch(self, raw):
+        """
+        Parses a pub/sub message once and queues the original text for matching
+        sockets. Never waits: a socket whose queue is full is dropped.
+        """
+        text = raw.decode("utf-8") if isinstance(raw, bytes) else raw
+        try:
+            data = json.loads(text)
+        except ValueError:
+            print(f"Ignoring malformed live-feed message: {text[:200]}")
+            return
+
+        company_id = str(data.get("company_id"))
+        floor_plan_id = str(data.get("floor_plan_id"))
+
+        targets = set(self.company_connections.get(company_id, ()))
+        for websocket in self.floor_plan_connections.get(floor_plan_id, ()):
+            if self.connection_companies.get(websocket) == company_id:
+                targets.add(websocket)
+        if not targets:
+            return
+
+        # Encode each format at most once per message, not once per socket
+        packed = None
+        if msgpack is not None and any(self.connection_formats.get(ws) == FRAME_MSGPACK for ws in targets):
+            packed = msgpack.packb(data, use_bin_type=True)
+
+        for websocket in targets:
+            outbox = self.outboxes.get(websocket)
+            if outbox is None:
+                continue # Dropped or failed; waiting for its endpoint to unregister it
+            frame = packed if self.connection_formats.get(websocket) == FRAME_MSGPACK else None
+            try:
+                outbox.put_nowait((text, frame))
+            except asyncio.QueueFull:
+                self._drop(websocket, f"more than {SOCKET_QUEUE_SIZE} frames behind")
+
+    async def close(self):
+        """Stops the shared subscriber and flushes pending updates (application shutdown)."""
+        await asyncio.to_thread(self.publisher.stop)
+        for websocket in list(self.sender_tasks):
+            self._stop_sender(websocket)
+        if self._listener_task:
+            self._listener_task.cancel()
+            try:
+                await self._listener_task
+            except asyncio.CancelledError:
+                pass
+            self._listener_task = None
+
+    # --- UPDATED: Non-blocking; the publisher flushes to Redis in the background ---
+    async def publish_update(
+        self, floor_plan_id: str, company_id: str, event_type: str = "BOOKING_CHANGED",
+        changes: Optional[List[dict]] = None
+    ):
+        """
+        Queues an update for the Redis channel. This will be received by ALL
+        server instances. Kept async for existing callers; it never waits on Redis.
+        """
+        self.enqueue_update(floor_plan_id, company_id, event_type, changes)
+
+    def enqueue_update(
+        self, floor_plan_id: str, company_id: str, event_type: str = "BOOKING_CHANGED",
+        changes: Optional[List[dict]] = None
+    ):
+        """
+        Sync entry point for threadpool handlers: queue an update and return immediately.
+        `changes` carries per-room deltas; events without it tell clients to refetch.
+        """
+        message = {
+            "floor_plan_id": str(floor_plan_id),
+            "company_id": str(company_id),
+            "event": event_type
+        }
+        if changes is not None:
+            message["changes"] = changes
+        self.publisher.enqueue(message)
 
 # Create a single global instance
-manager = ConnectionManager()
\ No newline at end of file
+manager = ConnectionManager()
@@ -51,12 +51,50 @@ export const adminApi = {
   },
 
   /**
-   * Lists all historical versions of a floor plan.
+   * Applies explicit room operations without resending the whole plan.
    * @param {string} floorPlanId - The UUID of the floor plan
-   * @returns {Promise<Array>} A list of version objects
+   * @param {object} payload - RoomPatchPayload: { client_last_modified_at, operations: [{ op, room_id, ...fields }] }
+   * @returns {Promise<object>} The new version id and the rooms it touched
    */
-  getFloorPlanVersions: async (floorPlanId) => {
-    const { data } = await apiClient.get(`/admin/floorplans/${floorPlanId}/versions`);
+  patchFloorPlanRooms: async (floorPlanId, payload) => {
+    const { data } = await apiClient.patch(`/admin/floorplans/${floorPlanId}/rooms`, payload);
+    return data;
+  },
+
+  /**
+   * Lists one page of a floor plan's versions, newest first.
+   * @param {string} floorPlanId - The UUID of the floor plan
+   * @param {string|null} cursor - `next_cursor` from the previous page, or null for the first page
+   * @returns {Promise<object>} { versions: Array, next_cursor: string|null }
+   */
+  getFloorPlanVersions: async (floorPlanId, cursor = null) => {
+    const params = cursor ? { cursor } : {};
+    const { data } = await apiClient.get(`/admin/floorplans/${floorPlanId}/versions`, { params });
+    return data;
+  },
+
+  /**
+   * Fetches one version of a floor plan, including its full snapshot.
+   * @param {string} floorPlanId - The UUID of the floor plan
+   * @param {string} versionId - The UUID of the version
+   * @returns {Promise<object>} The version with its snapshot
+   */
+  getFloorPlanVersion: async (floorPlanId, versionId) => {
+    const { data } = await apiClient.get(`/admin/floorplans/${floorPlanId}/versions/${versionId}`);
+    return data;
+  },
+
+  /**
+   * Fetches the room-level diff between two versions of a floor plan.
+   * @param {string} floorPlanId - The UUID of the floor plan
+   * @param {string} fromVersionId - The older version
+   * @param {string} toVersionId - The newer version
+   * @returns {Promise<object>} added/removed/moved/resized/renamed/updated rooms
+   */
+  getFloorPlanVersionDiff: async (floorPlanId, fromVersionId, toVersionId) => {
+    const { data } = await apiClient.get(`/admin/floorplans/${floorPlanId}/versions/diff`, {
+      params: { from: fromVersionId, to: toVersionId },
+    });
     return data;
   },
 
@@ -89,6 +127,26 @@ export const adminApi = {
     return data;
   },
 
+  /**
+   * Sends one chunk of the offline operation log.
+   * @param {object} payload - SyncChunk: { session_id, floor_plan_id, client_last_modified_at, operations }
+   * @returns {Promise<object>} SyncAck: last_acked_seq and a per-op applied/rejected ack
+   */
+  syncOperations: async (payload) => {
+    const { data } = await apiClient.post('/sync/operations', payload);
+    return data;
+  },
+
+  /**
+   * Fetches how far a sync session got, to resume after last_acked_seq.
+   * @param {string} sessionId - The client-generated session UUID
+   * @returns {Promise<object>} SyncAck without per-op acks
+   */
+  getSyncSession: async (sessionId) => {
+    const { data } = await apiClient.get(`/sync/sessions/${sessionId}`);
+    return data;
+  },
+
   // --- NEW: Get all users for the admin's company ---
   /**
    * Fetches all users for the admin's company.
@@ -109,4 +167,19 @@ export const adminApi = {
     const { data } = await apiClient.post('/admin/invite-user', payload);
     return data;
   },
+
+  /**
+   * Bulk-creates users from a CSV (email,password,role header) or NDJSON file.
+   * The file is sent as the raw request body so the server can stream it.
+   * @param {File} file - A .csv or .ndjson/.jsonl file
+   * @returns {Promise<object>} UserImportReport: created/exists/invalid counts and per-row results
+   */
+  importUsers: async (file) => {
+    const format = /\.(ndjson|jsonl)$/i.test(file.name) ? 'ndjson' : 'csv';
+    const { data } = await apiClient.post('/admin/users/import', file, {
+      params: { format },
+      headers: { 'Content-Type': format === 'csv' ? 'text/csv' : 'application/x-ndjson' },
+    });
+    return data;
+  },
 };
\ No newline at end of file
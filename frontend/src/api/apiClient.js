@@ -28,8 +28,24 @@ apiClient.interceptors.response.use(
   (response) => {
     return response;
   },
-  (error) => {
-    if (error.response && error.response.status === 401) {
+  async (error) => {
+    const original = error.config;
+    if (
+      error.response &&
+      error.response.status === 401 &&
+      original &&
+      !original._retried &&
+      !original.url?.startsWith('/auth/')
+    ) {
+      // The short-lived access token expired: renew it once and replay the request
+      original._retried = true;
+      const token = await useAuthStore.getState().refresh();
+      if (token) {
+        original.headers['Authorization'] = `Bearer ${token}`;
+        return apiClient(original);
+      }
+    }
+    if (error.response && error.response.status === 401 && !original?.url?.startsWith('/auth/')) {
       // Token is invalid or expired
       useAuthStore.getState().logout();
       // Redirect to login page
@@ -1,18 +1,23 @@
 // FILE: ./src/hooks/useOfflineSync.js
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import { useFloorPlanStore } from '../store/floorPlanStore';
 import { adminApi } from '../api/adminApi';
 import toast from 'react-hot-toast';
 
+// Operations sent per request; a failed chunk is resumed, not restarted
+const CHUNK_SIZE = 100;
+
 export const useOfflineSync = () => {
   // --- FIX: Select state individually ---
   const offlineQueue = useFloorPlanStore((state) => state.offlineQueue);
-  const currentPlan = useFloorPlanStore((state) => state.currentPlan); // Use new state
+  const offlineSession = useFloorPlanStore((state) => state.offlineSession);
+  const ackOfflineOps = useFloorPlanStore((state) => state.ackOfflineOps);
   const clearOfflineQueue = useFloorPlanStore((state) => state.clearOfflineQueue);
   const fetchFloorPlanById = useFloorPlanStore((state) => state.fetchFloorPlanById);
   // --- END FIX ---
 
   const [isOnline, setIsOnline] = useState(navigator.onLine);
+  const isSyncing = useRef(false);
 
   useEffect(() => {
     const handleOnline = () => setIsOnline(true);
@@ -30,43 +35,75 @@ export const useOfflineSync = () => {
 
   useEffect(() => {
     const syncQueue = async () => {
-      // --- FIX: Use 'currentPlan' ---
-      if (isOnline && offlineQueue.length > 0 && currentPlan && currentPlan.id && currentPlan.last_modified_at) {
-        
-        console.log(`Syncing ${offlineQueue.length} offline changes...`);
-        const syncToast = toast.loading(`Syncing ${offlineQueue.length} offline changes...`);
-        
-        const payload = {
-          floor_plan_id: currentPlan.id,
-          client_last_modified_at: currentPlan.last_modified_at, 
-          room_updates: offlineQueue,
-        };
-        // --- END FIX ---
-
-        try {
-          await adminApi.syncOfflineChanges(payload);
+      if (!isOnline || isSyncing.current || offlineQueue.length === 0 || !offlineSession) {
+        return;
+      }
+      isSyncing.current = true;
 
-          toast.dismiss(syncToast);
-          toast.success('Offline changes synced successfully!');
-          clearOfflineQueue(); 
-          fetchFloorPlanById(currentPlan.id); // Refetch the plan
+      console.log(`Syncing ${offlineQueue.length} offline changes...`);
+      const syncToast = toast.loading(`Syncing ${offlineQueue.length} offline changes...`);
+      let pending = offlineQueue;
+      let rejected = 0;
 
-        } catch (err) {
-          toast.dismiss(syncToast);
-          if (err.response && err.response.status === 409) {
-            toast.error('Sync Conflict: Please review the updated plan.', { duration: 8000 });
-          } else {
-            toast.error('Sync Failed.', { duration: 8000 });
+      try {
+        while (pending.length > 0) {
+          const chunk = pending.slice(0, CHUNK_SIZE);
+          let ack;
+          try {
+            ack = await adminApi.syncOperations({
+              session_id: offlineSession.id,
+              floor_plan_id: offlineSession.floorPlanId,
+              client_last_modified_at: offlineSession.baseModifiedAt,
+              operations: chunk,
+            });
+            rejected += ack.acks.filter((a) => a.status === 'rejected').length;
+          } catch (err) {
+            const detail = err.response?.data?.detail || '';
+            if (err.response?.status === 409 && detail.startsWith('Out of order')) {
+              // The server is ahead of us (an earlier ack got lost): resume from its position
+              ack = await adminApi.getSyncSession(offlineSession.id);
+            } else {
+              throw err;
+            }
+          }
+          const remaining = pending.filter((op) => op.seq > ack.last_acked_seq);
+          if (remaining.length === pending.length) {
+            throw new Error('Sync made no progress.');
           }
+          ackOfflineOps(ack.last_acked_seq);
+          pending = remaining;
+        }
+
+        toast.dismiss(syncToast);
+        if (rejected > 0) {
+          toast.error(`${rejected} offline changes no longer applied and were skipped.`, { duration: 8000 });
+        } else {
+          toast.success('Offline changes synced successfully!');
+        }
+        clearOfflineQueue();
+        fetchFloorPlanById(offlineSession.floorPlanId); // Refetch the plan
+      } catch (err) {
+        toast.dismiss(syncToast);
+        if (err.response && err.response.status === 409) {
+          toast.error('Sync Conflict: Please review the updated plan.', { duration: 8000 });
           clearOfflineQueue();
-          fetchFloorPlanById(currentPlan.id); 
+          fetchFloorPlanById(offlineSession.floorPlanId);
+        } else if (err.response || err.message === 'Sync made no progress.') {
+          toast.error('Sync Failed.', { duration: 8000 });
+          clearOfflineQueue();
+          fetchFloorPlanById(offlineSession.floorPlanId);
+        } else {
+          // Network error: keep the remaining ops and resume when back online
+          toast.error('Sync interrupted. It will resume when the connection returns.', { duration: 8000 });
         }
+      } finally {
+        isSyncing.current = false;
       }
     };
-    
+
     syncQueue();
-    
-  }, [isOnline, offlineQueue, currentPlan, clearOfflineQueue, fetchFloorPlanById]);
+
+  }, [isOnline, offlineQueue, offlineSession, ackOfflineOps, clearOfflineQueue, fetchFloorPlanById]);
 
   return isOnline;
-};
\ No newline at end of file
+};
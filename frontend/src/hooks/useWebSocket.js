@@ -4,6 +4,7 @@ import { useAuthStore } from '../store/authStore';
 /**
  * @param {string} floorPlanId The ID of the floor plan, or "company" for a company-wide feed
  * @param {function} onMessageCallback A callback function that will receive the event type (e.g., "BOOKING_CHANGED")
+ *   and the full message, whose optional `changes` (per-room deltas) and `seq` let callers patch state without refetching
  * @param {string} role The role of the user, 'user' or 'admin'. Defaults to 'user'.
  */
 export const useWebSocket = (floorPlanId, onMessageCallback, role = 'user') => {
@@ -36,7 +37,7 @@ export const useWebSocket = (floorPlanId, onMessageCallback, role = 'user') => {
     ws.current.onmessage = (e) => {
       const data = JSON.parse(e.data);
       if (data.event) {
-        onMessageCallback(data.event);
+        onMessageCallback(data.event, data);
       }
     };
 
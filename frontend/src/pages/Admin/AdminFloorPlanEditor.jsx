@@ -209,6 +209,7 @@ const AdminFloorPlanEditor = () => {
     const result = await saveFloorPlanLayout({
       floor_plan_id: currentPlan.id,
       client_last_modified_at: currentPlan.last_modified_at,
+      base_version_id: currentPlan.current_version_id,
       room_updates: roomUpdates,
     });
 
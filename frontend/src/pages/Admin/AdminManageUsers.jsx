@@ -2,7 +2,7 @@
 import React, { useState, useEffect } from 'react';
 import { adminApi } from '../../api/adminApi';
 import toast from 'react-hot-toast';
-import { Loader2, AlertTriangle, Users, UserPlus, Mail, Lock, Shield } from 'lucide-react';
+import { Loader2, AlertTriangle, Users, UserPlus, Mail, Lock, Shield, Upload } from 'lucide-react';
 
 const AdminManageUsers = () => {
   // State for the user list
@@ -16,6 +16,10 @@ const AdminManageUsers = () => {
   const [role, setRole] = useState('standard');
   const [isSubmitting, setIsSubmitting] = useState(false);
 
+  // State for bulk import
+  const [isImporting, setIsImporting] = useState(false);
+  const [importReport, setImportReport] = useState(null);
+
   // Fetch users on component mount
   const fetchUsers = async () => {
     setIsLoading(true);
@@ -57,6 +61,24 @@ const AdminManageUsers = () => {
     }
   };
   
+  const handleImport = async (e) => {
+    const file = e.target.files[0];
+    e.target.value = '';
+    if (!file) return;
+    setIsImporting(true);
+    setImportReport(null);
+    try {
+      const report = await adminApi.importUsers(file);
+      setImportReport(report);
+      toast.success(`Imported ${report.created} users.`);
+      if (report.created > 0) fetchUsers();
+    } catch (err) {
+      toast.error(err.response?.data?.detail || 'Failed to import users.');
+    } finally {
+      setIsImporting(false);
+    }
+  };
+
   const formatDate = (isoString) => new Date(isoString).toLocaleDateString();
 
   return (
@@ -116,6 +138,38 @@ const AdminManageUsers = () => {
             </button>
           </form>
         </div>
+
+        {/* --- Bulk Import --- */}
+        <div className="p-6 mt-8 bg-brand-light rounded-lg shadow-xl">
+          <h2 className="text-2xl font-semibold text-brand-dark mb-2 flex items-center gap-2">
+            <Upload className="w-6 h-6 text-brand-primary" />
+            Import Users
+          </h2>
+          <p className="text-sm text-brand-gray mb-4">
+            CSV with an <code>email,password,role</code> header, or NDJSON with one user per line.
+          </p>
+          <label className={`w-full flex justify-center items-center gap-2 bg-brand-primary text-white font-semibold py-2.5 px-4 rounded-lg shadow-md hover:bg-brand-primary-dark cursor-pointer ${isImporting ? 'opacity-50 pointer-events-none' : ''}`}>
+            {isImporting ? <Loader2 className="w-5 h-5 animate-spin" /> : 'Choose File'}
+            <input type="file" accept=".csv,.ndjson,.jsonl" onChange={handleImport} className="hidden" />
+          </label>
+          {importReport && (
+            <div className="mt-4 text-sm">
+              <p className="text-brand-dark">
+                {importReport.created} created, {importReport.exists} already registered, {importReport.invalid} invalid.
+              </p>
+              {importReport.rows.filter((row) => row.status !== 'created').length > 0 && (
+                <ul className="mt-2 max-h-48 overflow-y-auto space-y-1">
+                  {importReport.rows.filter((row) => row.status !== 'created').map((row) => (
+                    <li key={row.line} className="flex items-start gap-2 text-brand-gray">
+                      <AlertTriangle className="w-4 h-4 text-yellow-500 flex-shrink-0 mt-0.5" />
+                      <span>Line {row.line}{row.email ? ` (${row.email})` : ''}: {row.detail}</span>
+                    </li>
+                  ))}
+                </ul>
+              )}
+            </div>
+          )}
+        </div>
       </div>
 
       {/* --- User List --- */}
@@ -8,6 +8,8 @@ import { Loader2, AlertTriangle, History, GitCommit, User, Clock, Map } from 'lu
 const VersionHistoryPage = () => {
   const { floorPlanId } = useParams(); // Get the ID from the URL
   const [versions, setVersions] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
   const [isLoading, setIsLoading] = useState(true);
   const [error, setError] = useState(null);
 
@@ -31,7 +33,8 @@ const VersionHistoryPage = () => {
       setError(null);
       try {
         const data = await adminApi.getFloorPlanVersions(floorPlanId);
-        setVersions(data);
+        setVersions(data.versions);
+        setNextCursor(data.next_cursor);
       } catch (err) {
         setError(err.response?.data?.detail || "Failed to fetch version history.");
       } finally {
@@ -42,6 +45,20 @@ const VersionHistoryPage = () => {
     fetchVersions();
   }, [floorPlanId, fetchFloorPlanList]); // fetchFloorPlanList is now a stable dependency
 
+  // Appends the next (older) page of versions
+  const loadOlderVersions = async () => {
+    setIsLoadingMore(true);
+    try {
+      const data = await adminApi.getFloorPlanVersions(floorPlanId, nextCursor);
+      setVersions((current) => [...current, ...data.versions]);
+      setNextCursor(data.next_cursor);
+    } catch (err) {
+      setError(err.response?.data?.detail || "Failed to fetch version history.");
+    } finally {
+      setIsLoadingMore(false);
+    }
+  };
+
   // --- Render Logic ---
   let content;
   if (isLoading) {
@@ -73,6 +90,18 @@ const VersionHistoryPage = () => {
             </li>
           ))}
         </ul>
+        {nextCursor && (
+          <div className="pt-8 text-center">
+            <button
+              onClick={loadOlderVersions}
+              disabled={isLoadingMore}
+              className="inline-flex items-center gap-2 px-4 py-2 text-sm font-medium text-brand-primary hover:bg-brand-secondary-light rounded-lg disabled:opacity-50"
+            >
+              {isLoadingMore && <Loader2 className="w-4 h-4 animate-spin" />}
+              Load older versions
+            </button>
+          </div>
+        )}
       </div>
     );
   } else {
@@ -26,7 +26,7 @@ const VersionHistoryPage = () => {
       setError(null);
       try {
         const data = await adminApi.getFloorPlanVersions(floorPlan.id);
-        setVersions(data);
+        setVersions(data.versions);
       } catch (err) {
         setError(err.response?.data?.detail || "Failed to fetch version history.");
       } finally {
@@ -12,10 +12,22 @@ const parseJwt = (token) => {
   }
 };
 
+// Decoded access token -> the user object kept in the store
+const userFromToken = (decoded, email) => ({
+  id: decoded.user_id,
+  role: decoded.role,
+  companyId: decoded.company_id,
+  email,
+});
+
+// Shared by concurrent 401s, so a refresh token is only spent once
+let refreshInFlight = null;
+
 export const useAuthStore = create(
   persist(
     (set, get) => ({
       token: null,
+      refreshToken: null,
       user: null, // Will be { id, email, role, companyId }
       isAuthenticated: false,
       isLoading: true, // For initial auth check
@@ -36,16 +48,18 @@ export const useAuthStore = create(
           const decoded = parseJwt(token);
           
           // --- NEW: Store all data from the multi-tenant token ---
-          const user = {
-            id: decoded.user_id,
-            role: decoded.role,
-            companyId: decoded.company_id,
-            email: email, 
-          };
+          const user = userFromToken(decoded, email);
 
           apiClient.defaults.headers.common['Authorization'] = `Bearer ${token}`;
           
-          set({ token, user, isAuthenticated: true, isLoading: false, error: null });
+          set({
+            token,
+            refreshToken: data.refresh_token,
+            user,
+            isAuthenticated: true,
+            isLoading: false,
+            error: null,
+          });
           return true;
         } catch (err) {
           const errorMsg = err.response?.data?.detail || "An error occurred. Please try again.";
@@ -74,27 +88,56 @@ export const useAuthStore = create(
         }
       },
 
+      // --- Swap the refresh token for a new token pair ---
+      // Resolves to the new access token, or null when the session is over.
+      refresh: () => {
+        const refreshToken = get().refreshToken;
+        if (!refreshToken) {
+          return Promise.resolve(null);
+        }
+        if (!refreshInFlight) {
+          refreshInFlight = apiClient
+            .post('/auth/refresh', { refresh_token: refreshToken })
+            .then(({ data }) => {
+              const token = data.access_token;
+              const user = userFromToken(parseJwt(token), get().user?.email);
+              apiClient.defaults.headers.common['Authorization'] = `Bearer ${token}`;
+              set({ token, refreshToken: data.refresh_token, user, isAuthenticated: true });
+              return token;
+            })
+            .catch(() => null)
+            .finally(() => {
+              refreshInFlight = null;
+            });
+        }
+        return refreshInFlight;
+      },
+
       // --- Action to log out ---
       logout: () => {
+        const refreshToken = get().refreshToken;
+        if (refreshToken) {
+          // Best effort: the refresh chain is revoked server-side
+          apiClient.post('/auth/logout', { refresh_token: refreshToken }).catch(() => {});
+        }
         delete apiClient.defaults.headers.common['Authorization'];
-        set({ token: null, user: null, isAuthenticated: false, error: null });
+        set({ token: null, refreshToken: null, user: null, isAuthenticated: false, error: null });
       },
 
       // --- UPDATED: Auth Initialization ---
-      initializeAuth: () => {
+      initializeAuth: async () => {
         const token = get().token;
         if (token) {
           const decoded = parseJwt(token);
           // Check for new token structure and expiration
           if (decoded && decoded.exp * 1000 > Date.now() && decoded.company_id) {
-            const user = {
-              id: decoded.user_id,
-              role: decoded.role,
-              companyId: decoded.company_id,
-              // Note: email is not in the token, but we have the essentials
-            };
+            // Note: email is not in the token, but we have the essentials
+            const user = userFromToken(decoded);
             apiClient.defaults.headers.common['Authorization'] = `Bearer ${token}`;
             set({ user, isAuthenticated: true, isLoading: false });
+          } else if (await get().refresh()) {
+            // Access tokens are short-lived; the refresh token keeps the session
+            set({ isLoading: false });
           } else {
             get().logout();
             set({ isLoading: false });
@@ -107,7 +150,7 @@ export const useAuthStore = create(
     {
       name: 'auth-storage', 
       storage: createJSONStorage(() => localStorage), 
-      partialize: (state) => ({ token: state.token }), 
+      partialize: (state) => ({ token: state.token, refreshToken: state.refreshToken }), 
     }
   )
 );
\ No newline at end of file
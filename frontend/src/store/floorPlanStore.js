@@ -3,6 +3,34 @@ import { create } from 'zustand';
 import { persist, createJSONStorage } from 'zustand/middleware';
 import { adminApi } from '../api/adminApi';
 
+const ROOM_FIELDS = ['name', 'capacity', 'features', 'x_coord', 'y_coord', 'width', 'height'];
+
+const newId = () => crypto.randomUUID();
+
+// Turns a full room layout into add/update/delete operations against the
+// previous layout, so only what changed goes into the offline log.
+const diffLayout = (previousRooms, roomUpdates) => {
+  const previous = new Map(previousRooms.map((room) => [room.id ?? room.room_id, room]));
+  const ops = [];
+  roomUpdates.forEach((room) => {
+    const before = previous.get(room.room_id);
+    const fields = Object.fromEntries(ROOM_FIELDS.map((f) => [f, room[f]]));
+    if (!before) {
+      ops.push({ op: 'add', room_id: room.room_id, ...fields });
+      return;
+    }
+    previous.delete(room.room_id);
+    const changed = Object.fromEntries(
+      ROOM_FIELDS.filter((f) => JSON.stringify(before[f]) !== JSON.stringify(room[f])).map((f) => [f, room[f]])
+    );
+    if (Object.keys(changed).length > 0) {
+      ops.push({ op: 'update', room_id: room.room_id, ...changed });
+    }
+  });
+  previous.forEach((_, roomId) => ops.push({ op: 'delete', room_id: roomId }));
+  return ops;
+};
+
 export const useFloorPlanStore = create(
   persist(
     (set, get) => ({
@@ -10,7 +38,10 @@ export const useFloorPlanStore = create(
       currentPlan: null,
       isLoadingList: false,
       isLoadingPlan: false,
+      // Offline operation log: ops carry op_id and seq and are dropped once acked
       offlineQueue: [],
+      // { id, floorPlanId, baseModifiedAt, rooms, nextSeq } while ops are pending
+      offlineSession: null,
       error: null,
 
       fetchFloorPlanList: async () => {
@@ -44,11 +75,30 @@ export const useFloorPlanStore = create(
         // backend is the source of truth for conflicts.
 
         if (!navigator.onLine) {
-          // This is a simple implementation.
-          // A real offline mode would queue the *entire* payload.
-          set((state) => ({
-            offlineQueue: [...state.offlineQueue, ...payload.room_updates],
+          // Log only what changed since the last layout saved offline
+          const state = get();
+          const session = state.offlineSession?.floorPlanId === payload.floor_plan_id
+            ? state.offlineSession
+            : {
+                id: newId(),
+                floorPlanId: payload.floor_plan_id,
+                baseModifiedAt: payload.client_last_modified_at,
+                rooms: state.currentPlan?.rooms || [],
+                nextSeq: 1,
+              };
+          const ops = diffLayout(session.rooms, payload.room_updates).map((op, i) => ({
+            ...op,
+            op_id: newId(),
+            seq: session.nextSeq + i,
           }));
+          set({
+            offlineQueue: [...(state.offlineSession === session ? state.offlineQueue : []), ...ops],
+            offlineSession: {
+              ...session,
+              rooms: payload.room_updates,
+              nextSeq: session.nextSeq + ops.length,
+            },
+          });
           return 'offline';
         }
 
@@ -78,7 +128,13 @@ export const useFloorPlanStore = create(
       },
       // --- END OF FIX ---
 
-      clearOfflineQueue: () => set({ offlineQueue: [] }),
+      // Drops every logged op the server has acknowledged
+      ackOfflineOps: (lastAckedSeq) =>
+        set((state) => ({
+          offlineQueue: state.offlineQueue.filter((op) => op.seq > lastAckedSeq),
+        })),
+
+      clearOfflineQueue: () => set({ offlineQueue: [], offlineSession: null }),
 
       setFloorPlanData: (data) =>
         set({
@@ -89,7 +145,7 @@ export const useFloorPlanStore = create(
     {
       name: 'floorplan-storage',
       storage: createJSONStorage(() => localStorage),
-      partialize: (s) => ({ offlineQueue: s.offlineQueue }),
+      partialize: (s) => ({ offlineQueue: s.offlineQueue, offlineSession: s.offlineSession }),
     }
   )
 );
\ No newline at end of file